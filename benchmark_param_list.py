@@ -0,0 +1,2294 @@
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, Iterable, List, Tuple
+
+import lxml.html
+import numpy as np
+import pandas as pd
+from bs4 import BeautifulSoup, element
+
+from numpy import inf, isnan, nan
+
+import instrumentation
+from param_catalog_cache import CatalogCache
+from param_name_index import ParamNameIndex, tier_exact, tier_prefix, tier_substring, tier_word
+from param_records import (ParamRecord, build_param_records, check_entry, invalid_inverted, invalid_precision,
+                           invalid_range, invalid_type, invalid_unknown, validator_default_max, validator_default_min,
+                           validator_default_prec)
+
+from full_param_list_html_parser import (build_param_df, min_max_incr_regex, name_type_regex, param_df_columns,
+                                         parse_html, parse_html_table)
+from load_critical_parameters import (CriticalParameterFormatError, parse_critical_parameters,
+                                      read_critical_parameters, render_critical_parameters, write_critical_parameters)
+from px4_fixtures import make_critical_parameters, make_param_reference_html
+
+
+def legacy_parse_html_table(table: element.Tag) -> pd.DataFrame:
+    # Two-pass, cell by cell implementation that parse_html_table replaced, kept as the reference for
+    # the equivalence check
+    n_columns = 0
+    n_rows = 0
+    column_names = []
+
+    for row in table.find_all('tr'):
+        td_tags = row.find_all('td')
+        if len(td_tags) > 0:
+            n_rows += 1
+            if n_columns == 0:
+                n_columns = len(td_tags)
+        th_tags = row.find_all('th')
+        if len(th_tags) > 0 and len(column_names) == 0:
+            for th in th_tags:
+                column_names.append(th.get_text())
+
+    if len(column_names) > 0 and len(column_names) != n_columns:
+        raise Exception("Column titles do not match the number of columns")
+
+    columns = column_names if len(column_names) > 0 else range(0, n_columns)
+    df = pd.DataFrame(columns=columns, index=range(0, n_rows))
+    row_marker = 0
+    for row in table.find_all('tr'):
+        column_marker = 0
+        columns = row.find_all('td')
+        for column in columns:
+            df.iat[row_marker, column_marker] = column.get_text()
+            column_marker += 1
+        if len(columns) > 0:
+            row_marker += 1
+
+    return df
+
+
+def legacy_build_param_df(tables: Iterable[pd.DataFrame]) -> pd.DataFrame:
+    # Per-table extraction with one pd.concat per parameter group, as extract_param_data did before build_param_df
+    param_data_df = pd.DataFrame(columns=param_df_columns)
+
+    for table in tables:
+        n_rows = table.shape[0]
+        name_type_df = table["Name"].str.extract(name_type_regex, expand=True)
+        min_max_incr_df = table["Min > Max (Incr.)"].str.extractall(min_max_incr_regex).unstack(level=-1)
+        min_max_incr_df = min_max_incr_df.reindex(range(n_rows))
+        while min_max_incr_df.shape[1] < 3:
+            min_max_incr_df[min_max_incr_df.shape[1]] = nan
+        two_null_subset = min_max_incr_df.isnull().sum(axis=1)[min_max_incr_df.isnull().sum(axis=1) == 2]
+        min_max_incr_df.iloc[two_null_subset.index.tolist(), [0, 2]] = \
+            min_max_incr_df.iloc[two_null_subset.index.tolist(), [2, 0]].values
+        min_max_incr_df.columns = ["Min", "Max", "Incr"]
+
+        tmp_table = pd.concat([name_type_df, min_max_incr_df, table[["Default", "Description"]]], axis=1)
+        param_data_df = pd.concat([param_data_df, tmp_table], axis=0, ignore_index=True)
+
+    param_data_df.set_index("Name", inplace=True, drop=False)
+    min_mask = param_data_df["Min"] == "?"
+    param_data_df.loc[min_mask, "Min"] = nan
+    max_mask = param_data_df["Max"] == "?"
+    param_data_df.loc[max_mask, "Max"] = nan
+    param_data_df[["Default", "Min", "Max", "Incr"]] = \
+        param_data_df[["Default", "Min", "Max", "Incr"]].apply(pd.to_numeric)
+    return param_data_df
+
+
+def best_of(func: Callable, repeat: int = 3) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+# ---------------------- parse_html_table ------------------------
+def check_parse_html_table():
+    html = make_param_reference_html(n_groups=20) + ("<table><tr><td>a</td><td>b</td></tr><tr><td>c</td></tr>"
+                                                     "<tr><td>x &gt; y<br/>z <!-- c --> w</td><td> \t </td></tr>"
+                                                     "<tr></tr></table><table><tr><th>x</th></tr></table>")
+    soup = BeautifulSoup(html, 'lxml')
+    document = lxml.html.document_fromstring(html)
+    for legacy_table, table in zip(soup.find_all('table'), document.iter('table')):
+        try:
+            expected = legacy_parse_html_table(legacy_table)
+        except Exception as legacy_error:
+            try:
+                parse_html_table(table)
+            except type(legacy_error):
+                continue
+            raise AssertionError("parse_html_table accepted a table the legacy parser rejects")
+        pd.testing.assert_frame_equal(parse_html_table(table), expected)
+
+
+def bench_parse_html_table(n_groups: int = 60):
+    html = make_param_reference_html(n_groups=n_groups)
+
+    def legacy():
+        soup = BeautifulSoup(html, 'lxml')
+        return [legacy_parse_html_table(table) for table in soup.find_all('table')]
+
+    def streaming():
+        return list(parse_html(html))
+
+    legacy_time = best_of(legacy)
+    streaming_time = best_of(streaming)
+    print(f"parse_html_table ({n_groups} groups): legacy {legacy_time * 1e3:.1f} ms, "
+          f"lxml single-pass {streaming_time * 1e3:.1f} ms ({legacy_time / streaming_time:.1f}x)")
+
+
+# ------------------------ build_param_df ------------------------
+def check_build_param_df():
+    tables = list(parse_html(make_param_reference_html(n_groups=20)))
+    pd.testing.assert_frame_equal(build_param_df(tables), legacy_build_param_df(tables))
+
+
+def bench_build_param_df(n_groups: int = 40, scale: int = 10):
+    # The same number of parameters per group, only the number of groups grows
+    small = list(parse_html(make_param_reference_html(n_groups=n_groups)))
+    large = list(parse_html(make_param_reference_html(n_groups=n_groups * scale)))
+    for label, build in (("legacy", legacy_build_param_df), ("single concat", build_param_df)):
+        small_time = best_of(lambda: build(small))
+        large_time = best_of(lambda: build(large), repeat=1)
+        print(f"build_param_df {label}: {n_groups} groups {small_time * 1e3:.1f} ms, "
+              f"{n_groups * scale} groups {large_time * 1e3:.1f} ms (x{large_time / small_time:.1f} for "
+              f"x{scale} groups)")
+
+
+# ------------------------- catalog load -------------------------
+_load_probe = """
+import json, sys, time
+def rss_kb():
+    # Private memory only, pages of the memory-mapped files are shared with the page cache
+    with open("/proc/self/status") as f:
+        return next(int(line.split()[1]) for line in f if line.startswith("RssAnon"))
+from param_catalog_cache import CatalogCache
+from param_records import (ParamRecord, build_param_records, validator_default_max, validator_default_min,
+                           validator_default_prec)
+cache = CatalogCache(sys.argv[1], 1)
+columnar = sys.argv[2] == "columnar"
+timings = []
+rss_before = rss_kb()
+catalogs = []
+for _ in range(5):
+    start = time.perf_counter()
+    catalogs.append(cache.open("bench", "bench", columnar))
+    name = catalogs[-1]["Name"].iloc[len(catalogs[-1]) // 2]
+    catalogs[-1].loc[name, "Description"]
+    timings.append(time.perf_counter() - start)
+    if len(catalogs) == 1:
+        rss_after = rss_kb()
+print(json.dumps({"cold": timings[0], "warm": min(timings[1:]), "rss_kb": rss_after - rss_before,
+                  "rss_per_catalog_kb": (rss_kb() - rss_after) / 4}))
+"""
+
+
+def bench_catalog_load(n_groups: int = 600):
+    # Each format is opened in a fresh interpreter: the first open is the cold load, the best of the next ones
+    # the warm load. Private memory is measured after the first catalog is opened and one description read (it
+    # includes what pandas allocates on first use), then per additional catalog kept open
+    param_data_df = build_param_df(parse_html(make_param_reference_html(n_groups=n_groups)))
+    with tempfile.TemporaryDirectory() as directory:
+        CatalogCache(directory, 1).store("bench", "bench", param_data_df)
+        for catalog_format in ("pickle", "columnar"):
+            output = subprocess.run([sys.executable, "-c", _load_probe, directory, catalog_format],
+                                    capture_output=True, text=True, check=True,
+                                    cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+            result = json.loads(output)
+            print(f"catalog load {catalog_format} ({len(param_data_df)} params): cold {result['cold'] * 1e3:.1f} ms, "
+                  f"warm {result['warm'] * 1e3:.1f} ms, private memory first load +{result['rss_kb'] / 1024:.1f} MiB, "
+                  f"each further catalog +{result['rss_per_catalog_kb'] / 1024:.1f} MiB")
+
+
+def check_columnar_catalog(n_groups: int = 24):
+    import columnar_catalog
+    from columnar_catalog import ColumnarCatalog, write_columnar_catalog
+    param_data_df = build_param_df(parse_html(make_param_reference_html(n_groups=n_groups)))
+    # Values a float32 does not hold, one that overflows it, a missing type and description
+    param_data_df.iloc[0, param_data_df.columns.get_loc("Min")] = 0.1
+    param_data_df.iloc[1, param_data_df.columns.get_loc("Max")] = 1e39
+    param_data_df.iloc[2, param_data_df.columns.get_loc("Type")] = nan
+    param_data_df.iloc[3, param_data_df.columns.get_loc("Description")] = nan
+    # A column of decimals stays float64 rather than being all patches
+    param_data_df["Incr"] = 0.01
+    with tempfile.TemporaryDirectory() as directory:
+        write_columnar_catalog(param_data_df, os.path.join(directory, "a"))
+        write_columnar_catalog(param_data_df.iloc[::-1], os.path.join(directory, "b"))
+        catalog = ColumnarCatalog(os.path.join(directory, "a"))
+        reversed_catalog = ColumnarCatalog(os.path.join(directory, "b"))
+
+        for column in param_df_columns:
+            values = catalog.column(column)
+            assert values.dtype == param_data_df[column].dtype, column
+            for value, expected in zip(values, param_data_df[column]):
+                assert value == expected or (pd.isna(value) and pd.isna(expected)), (column, value, expected)
+        for position, name in enumerate(param_data_df.index):
+            for column in param_df_columns:
+                value, expected = catalog.loc[name, column], param_data_df[column].iloc[position]
+                assert value == expected or (pd.isna(value) and pd.isna(expected)), (name, column, value, expected)
+        assert catalog._numeric["Min"].dtype == np.float32 and catalog._numeric["Incr"].dtype == np.float64
+        assert list(catalog._patch_positions["Min"][:1]) == [0] and 1 in catalog._patch_positions["Max"]
+        assert len(catalog._patch_positions["Incr"]) == 0
+        assert catalog._type_codes.dtype == np.uint8 and catalog["Type"].dtype == "category"
+        assert list(catalog["Type"].cat.categories) == ["FLOAT", "INT32"] and pd.isna(catalog["Type"].iloc[2])
+        pd.testing.assert_series_equal(catalog["Min"], param_data_df["Min"])
+        # The names of several catalogs are the same objects
+        assert all(name is other for name, other in zip(catalog._names, reversed_catalog._names[::-1]))
+
+        # Only the last description_cache_blocks blocks stay decompressed
+        footprint = reversed_catalog.memory_footprint()
+        assert footprint["description_cache"] == 0 and footprint["descriptions"] > 0, footprint
+        for name in param_data_df.index[::-1]:
+            catalog.loc[name, "Description"]
+        assert list(catalog._description_blocks) == list(range(columnar_catalog.description_cache_blocks))[::-1]
+        assert catalog.memory_footprint()["description_cache"] > 0
+
+        # A catalog cached in another format version is rebuilt
+        cache = CatalogCache(os.path.join(directory, "cache"), 1)
+        cache.store("page", "digest", param_data_df)
+        meta_path = os.path.join(cache.directory, cache._entries[cache._key("page", "digest")]["columnar"],
+                                 "meta.json")
+        with open(meta_path) as f:
+            meta = json.load(f)
+        with open(meta_path, 'w') as f:
+            json.dump(dict(meta, version=1), f)
+        assert cache.lookup("page", "digest", columnar=True) is None and cache.misses == 1
+
+
+def check_catalog_cache(n_groups: int = 2):
+    catalogs = [build_param_df(parse_html(make_param_reference_html(n_groups=n_groups, seed=seed)))
+                for seed in range(5)]
+    groups = [("a" * 64, 25 * n_groups)]
+    with tempfile.TemporaryDirectory() as directory:
+        def cached_files() -> List[str]:
+            return sorted(name for name in os.listdir(directory) if name != CatalogCache.index_file_name)
+
+        # Hits and misses, a new cache starts counting from zero
+        cache = CatalogCache(directory, 1, max_entries=3)
+        assert cache.lookup("page", "v0") is None and cache.lookup("page", "v0", columnar=True) is None
+        cache.store("page", "v0", catalogs[0], groups=groups)
+        pd.testing.assert_frame_equal(cache.lookup("page", "v0"), catalogs[0])
+        assert len(cache.lookup("page", "v0", columnar=True)) == len(catalogs[0])
+        assert cache.stats() == {"hits": 2, "misses": 2, "entries": 1}, cache.stats()
+        assert CatalogCache(directory, 1).stats() == {"hits": 0, "misses": 0, "entries": 1}
+
+        # Releases of one source and sources with the same content hash are kept side by side
+        cache.store("page", "v1", catalogs[1])
+        cache.store("other", "v0", catalogs[2])
+        for source, digest, catalog in (("page", "v0", catalogs[0]), ("page", "v1", catalogs[1]),
+                                        ("other", "v0", catalogs[2])):
+            pd.testing.assert_frame_equal(CatalogCache(directory, 1).lookup(source, digest), catalog)
+        assert cache.latest_entry("page")["content_hash"] == "v1"
+        assert len(cached_files()) == 3 * 2 + 1
+
+        # Past max_entries the least recently used entry is evicted with its files, page v1 was used last
+        cache.lookup("page", "v0")
+        cache.lookup("other", "v0")
+        evicted = cache._entries[cache._key("page", "v1")]
+        cache.store("page", "v2", catalogs[3])
+        assert cache.stats()["entries"] == 3 and cache.lookup("page", "v1") is None
+        assert evicted["file"] not in cached_files() and evicted["columnar"] not in cached_files()
+        assert len(cached_files()) == 3 * 2 + 1
+        reopened = CatalogCache(directory, 1, max_entries=3)
+        assert reopened.stats()["entries"] == 3 and reopened.lookup("page", "v1") is None
+        pd.testing.assert_frame_equal(reopened.lookup("page", "v2"), catalogs[3])
+
+        # A cache of another schema version drops the entries and their files, the index only keeps its own
+        cache = CatalogCache(directory, 2)
+        assert cache.stats()["entries"] == 0 and cached_files() == []
+        assert cache.lookup("page", "v0") is None
+        cache.store("page", "v0", catalogs[4])
+        with open(os.path.join(directory, CatalogCache.index_file_name)) as f:
+            index = json.load(f)
+        assert index["schema_version"] == 2 and len(index["entries"]) == 1
+        pd.testing.assert_frame_equal(CatalogCache(directory, 2).lookup("page", "v0"), catalogs[4])
+        assert CatalogCache(directory, 1).lookup("page", "v0") is None and cached_files() == []
+
+
+_cache_writer = """
+import sys
+sys.path.insert(0, sys.argv[1])
+from full_param_list_html_parser import build_param_df, parse_html
+from param_catalog_cache import CatalogCache
+from px4_fixtures import make_param_reference_html
+writer, n_releases = sys.argv[3], int(sys.argv[4])
+cache = CatalogCache(sys.argv[2], 1, max_entries=100)
+for release in range(n_releases):
+    catalog = build_param_df(parse_html(make_param_reference_html(n_groups=2, seed=release)))
+    cache.store(f"writer {writer}", f"v{release}", catalog)
+    cache.store("shared", f"v{release}", catalog)
+    assert cache.lookup("shared", f"v{release}") is not None
+"""
+
+
+def check_concurrent_cache_writers(n_releases: int = 12):
+    # Two processes storing into one cache directory at the same time, each its own releases and the same shared
+    # ones: every entry ends up in the index and loads, and no temporary file is left
+    directory = os.path.dirname(os.path.abspath(__file__))
+    with tempfile.TemporaryDirectory() as cache_directory:
+        writers = [subprocess.Popen([sys.executable, "-c", _cache_writer, directory, cache_directory, writer,
+                                     str(n_releases)], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+                   for writer in ("a", "b")]
+        for writer in writers:
+            _, stderr = writer.communicate()
+            assert writer.returncode == 0, stderr
+        cache = CatalogCache(cache_directory, 1, max_entries=100)
+        assert cache.stats()["entries"] == 3 * n_releases, cache.stats()
+        for release in range(n_releases):
+            catalog = build_param_df(parse_html(make_param_reference_html(n_groups=2, seed=release)))
+            for source in ("writer a", "writer b", "shared"):
+                pd.testing.assert_frame_equal(cache.lookup(source, f"v{release}"), catalog)
+                assert len(cache.lookup(source, f"v{release}", columnar=True)) == len(catalog)
+        assert len(os.listdir(cache_directory)) == 3 * n_releases * 2 + 1
+
+
+_memory_probe = """
+import json, os, sys, time
+def rss_kb():
+    with open("/proc/self/status") as f:
+        return next(int(line.split()[1]) for line in f if line.startswith("RssAnon"))
+import numpy, pandas
+from param_catalog_cache import CatalogCache
+cache = CatalogCache(sys.argv[1], 1)
+columnar = sys.argv[2] == "columnar"
+releases = json.loads(sys.argv[3])
+rss_before = rss_kb()
+catalogs = []
+lookups = []
+for release in releases:
+    catalogs.append(cache.open(release, release, columnar))
+    catalog = catalogs[-1]
+    names = list(catalog["Name"] if not columnar else catalog._names)
+    # Each name is far enough from the previous one to be in a block that is not cached, then read again
+    for name in names[::97]:
+        start = time.perf_counter()
+        catalog.loc[name, "Description"]
+        middle = time.perf_counter()
+        catalog.loc[name, "Description"]
+        lookups.append((middle - start, time.perf_counter() - middle))
+result = {"rss_kb": rss_kb() - rss_before, "lookup_first": sum(first for first, _ in lookups) / len(lookups),
+          "lookup_again": sum(again for _, again in lookups) / len(lookups)}
+if columnar:
+    result["footprint"] = [catalog.memory_footprint() for catalog in catalogs]
+print(json.dumps(result))
+"""
+
+
+def bench_catalog_memory(n_groups: int = 1200, n_releases: int = 4):
+    # Private memory of the catalogs of n_releases releases held at once, unpickled DataFrames against
+    # columnar catalogs, after a hundred descriptions of each were read. Each format is measured in a fresh
+    # interpreter, with pandas imported before the catalogs are opened
+    releases = [build_param_df(parse_html(make_param_reference_html(n_groups=n_groups)))]
+    for seed in range(1, n_releases):
+        releases.append(upgraded_catalog(releases[0], seed=seed)[0])
+    keys = [f"v1.{9 + i}.0" for i in range(n_releases)]
+    with tempfile.TemporaryDirectory() as directory:
+        cache = CatalogCache(directory, 1, max_entries=n_releases)
+        for key, param_data_df in zip(keys, releases):
+            cache.store(key, key, param_data_df)
+        columnar_size = sum(os.path.getsize(os.path.join(root, name)) for entry in cache._entries.values()
+                            for root, _, names in os.walk(os.path.join(directory, entry["columnar"]))
+                            for name in names)
+        results = dict()
+        for catalog_format in ("pickle", "columnar"):
+            output = subprocess.run([sys.executable, "-c", _memory_probe, directory, catalog_format, json.dumps(keys)],
+                                    capture_output=True, text=True, check=True,
+                                    cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+            results[catalog_format] = json.loads(output)
+    n_params = sum(len(param_data_df) for param_data_df in releases)
+    for catalog_format, result in results.items():
+        print(f"catalog memory {catalog_format} ({n_releases} releases, {n_params} params): private "
+              f"+{result['rss_kb'] / 1024:.1f} MiB ({result['rss_kb'] * 1024 / n_params:.0f} B/param), description "
+              f"{result['lookup_first'] * 1e6:.1f} us first read, {result['lookup_again'] * 1e6:.1f} us again")
+    parts = {part: sum(footprint[part] for footprint in results["columnar"]["footprint"])
+             for part in results["columnar"]["footprint"][0]}
+    print(f"columnar footprint: " + ", ".join(f"{part} {size / n_params:.0f} B/param" for part, size in parts.items())
+          + f", {columnar_size / n_params:.0f} B/param on disk, "
+          f"x{results['pickle']['rss_kb'] / max(1, results['columnar']['rss_kb']):.1f} less private memory")
+
+
+# ------------------------- GUI probes ---------------------------
+# The GUI paths are measured in fresh interpreters on the offscreen Qt platform, run from a directory holding the
+# fixture page so that the catalog cache starts empty
+_gui_probe_prelude = """
+import time
+start = time.perf_counter()
+import json, os, sys
+sys.path.insert(0, sys.argv[1])
+import full_param_list_html_parser
+full_param_list_html_parser.px4_param_list_url = os.path.abspath("page.html")
+from PySide2.QtCore import QEvent, QObject, QTimer
+from PySide2.QtWidgets import QApplication
+import generate_param_list
+
+app = QApplication([])
+
+def wait_for_catalog():
+    while generate_param_list._paramList is None:
+        app.processEvents()
+        time.sleep(0.01)
+"""
+
+
+def run_gui_probes(probe: str, n_groups: int, runs: int = 1, env: Dict[str, str] = None) -> List[dict]:
+    with tempfile.TemporaryDirectory() as directory:
+        with open(os.path.join(directory, "page.html"), 'w') as f:
+            f.write(make_param_reference_html(n_groups=n_groups))
+        results = []
+        for _ in range(runs):
+            output = subprocess.run([sys.executable, "-c", _gui_probe_prelude + probe,
+                                     os.path.dirname(os.path.abspath(__file__))],
+                                    capture_output=True, text=True, check=True, cwd=directory,
+                                    env=dict(os.environ, QT_QPA_PLATFORM="offscreen", **(env or {}))).stdout
+            results.append(json.loads(output.splitlines()[-1]))
+        return results
+
+
+_startup_probe = """
+times = dict()
+startup_heavy_modules = %r
+
+class FirstPaint(QObject):
+    def eventFilter(self, watched, event):
+        if event.type() == QEvent.Paint and "first_paint" not in times:
+            times["first_paint"] = time.perf_counter() - start
+        return False
+
+def poll():
+    if generate_param_list._paramList is not None and "first_paint" in times:
+        times["catalog_ready"] = time.perf_counter() - start
+        app.quit()
+
+window = generate_param_list.App()
+paint_filter = FirstPaint()
+window.installEventFilter(paint_filter)
+timer = QTimer()
+timer.timeout.connect(poll)
+timer.start(1)
+app.exec_()
+times["heavy_modules"] = [name for name in startup_heavy_modules if name in sys.modules]
+print(json.dumps(times))
+"""
+
+
+def check_startup_imports(n_groups: int = 40):
+    # Import time of the GUI entry point, in a fresh interpreter, and first paint of the window against their
+    # budgets. The catalog stack must not be imported before the window is shown, nor at all once the catalog is
+    # cached
+    directory = os.path.dirname(os.path.abspath(__file__))
+    with tempfile.TemporaryDirectory() as cwd:
+        result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import generate_param_list"],
+                                capture_output=True, text=True, check=True, cwd=cwd,
+                                env=dict(os.environ, PYTHONPATH=directory, QT_QPA_PLATFORM="offscreen"))
+    cumulative = dict()
+    for line in result.stderr.splitlines():
+        match = re.match(r"import time:\s+\d+ \|\s+(\d+) \| *(\S+)", line)
+        if match is not None:
+            cumulative[match.group(2)] = int(match.group(1)) / 1e6
+    heavy = [name for name in startup_heavy_modules + ("full_param_list_html_parser",) if name in cumulative]
+    assert len(heavy) == 0, heavy
+    assert cumulative["generate_param_list"] <= startup_import_budget_s, cumulative["generate_param_list"]
+
+    cold, warm = run_gui_probes(_startup_probe % (startup_heavy_modules,), n_groups, runs=2)
+    assert warm["heavy_modules"] == [], warm
+    first_paint = min(cold["first_paint"], warm["first_paint"])
+    assert first_paint <= startup_first_paint_budget_s, first_paint
+
+
+def check_catalog_loader(n_groups: int = 40, runs: int = 60):
+    # The catalog is loaded in the background while the window starts. A crash of the GUI from the loader thread is
+    # intermittent, the startup is repeated until it would have shown, the first run with an empty cache
+    results = run_gui_probes(_startup_probe % (startup_heavy_modules,), n_groups, runs=runs)
+    assert all("catalog_ready" in result for result in results), results
+
+
+def bench_gui_startup(n_groups: int = 600):
+    # Time from interpreter start to the first paint of the window and to the catalog being usable, with an
+    # empty cache (catalog built from the local page) and with the catalog already cached
+    for cache_state, result in zip(("cold cache", "warm cache"),
+                                   run_gui_probes(_startup_probe % (startup_heavy_modules,), n_groups, runs=2)):
+        print(f"GUI startup {cache_state} ({n_groups} groups): first paint {result['first_paint'] * 1e3:.0f} ms, "
+              f"catalog ready {result['catalog_ready'] * 1e3:.0f} ms")
+
+
+# Modules only needed to build a catalog or to download a page. With the catalog cached the GUI runs without them
+startup_heavy_modules = ("pandas", "lxml", "requests", "urllib3", "bs4")
+# Budgets of check_startup_imports, about twice the import time and first paint once the catalog stack was taken
+# off the startup path, and below what they cost before
+startup_import_budget_s = 0.5
+startup_first_paint_budget_s = 0.75
+
+
+# ----------------------- keystroke lookups ----------------------
+def legacy_keystroke_lookups(param_list, name: str):
+    # Catalog lookups updateDescription, updateSpinboxes and checkValid made for one keystroke before the
+    # ParamRecord index: a membership test per slot, then scalar .loc calls and isnan checks
+    if name in param_list["Name"]:
+        param_list.loc[name, "Description"]
+    if name in param_list["Name"]:
+        for label in ("Default", "Min", "Max"):
+            for column in ("Min", "Max", "Incr"):
+                if not isnan(param_list.loc[name, column]):
+                    param_list.loc[name, column]
+            if param_list.loc[name, "Type"] == "INT32":
+                if not isnan(param_list.loc[name, label]):
+                    f"{label}: {round(float(param_list.loc[name, label]))}"
+            else:
+                f"{label}: {param_list.loc[name, label]}"
+        f"Incr: {param_list.loc[name, 'Incr']}"
+    if name in param_list["Name"]:
+        for column in ("Min", "Max"):
+            if not isnan(param_list.loc[name, column]):
+                param_list.loc[name, column]
+
+
+def record_keystroke_lookups(param_list, records: Dict[str, ParamRecord], name: str):
+    record = records.get(name)
+    if record is not None:
+        param_list.loc[name, "Description"]
+        for label in ("Default", "Min", "Max"):
+            record.is_int, record.min_value, record.max_value, record.precision
+            f"{label}: {record.placeholder_texts[label]}"
+        f"Incr: {record.incr_text}"
+    record = records.get(name)
+    if record is not None:
+        record.min_value, record.max_value
+
+
+def check_param_records(n_groups: int = 20):
+    # Validator bounds, precision and placeholders must match what the slots derived from the catalog before
+    param_data_df = build_param_df(parse_html(make_param_reference_html(n_groups=n_groups)))
+    records = build_param_records(param_data_df)
+    for name, row in param_data_df.iterrows():
+        record = records[name]
+        assert record.min_value == (validator_default_min if isnan(row["Min"]) else row["Min"])
+        assert record.max_value == (validator_default_max if isnan(row["Max"]) else row["Max"])
+        precision = validator_default_prec
+        if not isnan(row["Incr"]):
+            precision = len(str(row["Incr"]).split(".")[1]) if "." in str(row["Incr"]) else 0
+        assert record.precision == precision and record.is_int == (row["Type"] == "INT32")
+        for label in ("Default", "Min", "Max"):
+            if row["Type"] == "INT32" and not isnan(row[label]):
+                assert record.placeholder_texts[label] == f"{round(float(row[label]))}"
+            else:
+                assert record.placeholder_texts[label] == f"{row[label]}"
+        assert record.incr_text == f"{row['Incr']}"
+
+
+def bench_keystroke_lookups(n_groups: int = 60, n_keystrokes: int = 2000):
+    param_data_df = build_param_df(parse_html(make_param_reference_html(n_groups=n_groups)))
+    records = build_param_records(param_data_df)
+    names = [param_data_df.index[i % len(param_data_df)] for i in range(0, n_keystrokes * 7, 7)]
+    legacy_time = best_of(lambda: [legacy_keystroke_lookups(param_data_df, name) for name in names])
+    record_time = best_of(lambda: [record_keystroke_lookups(param_data_df, records, name) for name in names])
+    print(f"keystroke lookups: DataFrame .loc {legacy_time / n_keystrokes * 1e6:.1f} us, "
+          f"ParamRecord {record_time / n_keystrokes * 1e6:.1f} us per keystroke")
+
+
+_keystroke_probe = """
+widget = generate_param_list.ParamWidget()
+wait_for_catalog()
+names = generate_param_list._paramList["Name"].tolist()[::7][:500]
+keystrokes = 0
+start = time.perf_counter()
+for name in names:
+    for end in range(len(name) - 3, len(name) + 1):
+        widget.paramLineEdit.setText(name[:end])
+        widget.flushParamUpdate()
+        keystrokes += 1
+print(json.dumps({"per_keystroke": (time.perf_counter() - start) / keystrokes}))
+"""
+
+
+def bench_gui_keystroke(n_groups: int = 60):
+    # End to end cost of one keystroke in paramLineEdit, the debounce timer is flushed so every keystroke is
+    # resolved
+    result = run_gui_probes(_keystroke_probe, n_groups)[0]
+    print(f"GUI keystroke ({n_groups} groups): {result['per_keystroke'] * 1e6:.0f} us per keystroke")
+
+
+_fanout_probe = """
+widget = generate_param_list.ParamWidget()
+wait_for_catalog()
+name = generate_param_list._paramList["Name"].tolist()[3]
+fanout = dict()
+
+# One keystroke completing a known name
+widget.handlerCalls.clear()
+widget.paramLineEdit.setText(name)
+widget.flushParamUpdate()
+fanout["keystroke"] = dict(widget.handlerCalls)
+
+# A burst of keystrokes faster than the debounce delay
+widget.handlerCalls.clear()
+for end in range(1, len(name) + 1):
+    widget.paramLineEdit.setText(name[:end])
+time.sleep(2 * widget.paramUpdateDelay / 1000)
+app.processEvents()
+fanout["burst"] = dict(widget.handlerCalls)
+print(json.dumps(fanout))
+"""
+
+
+def check_keystroke_fanout():
+    fanout = run_gui_probes(_fanout_probe, n_groups=2)[0]
+    for handler in ("updateParamName", "updateDescription", "updateSpinboxes", "disableRangeBoxes", "checkValid"):
+        assert fanout["keystroke"][handler] == 1, fanout["keystroke"]
+        assert fanout["burst"][handler] == 1, fanout["burst"]
+
+
+_row_index_probe = """
+import random
+from PySide2.QtCore import Qt
+from PySide2.QtWidgets import QMessageBox
+QMessageBox.question = lambda *args: QMessageBox.Yes
+widget = generate_param_list.ParamWidget()
+wait_for_catalog()
+names = generate_param_list._paramList["Name"].tolist()[:30]
+rng = random.Random(0)
+failures = []
+
+def check(operation):
+    model = widget.paramModel
+    names = [model.name(row) for row in range(model.rowCount())]
+    consistent = (widget.paramProxy.rowCount() == model.rowCount() and len(set(names)) == len(names)
+                  and all(widget.rowOf(name) == row for row, name in enumerate(names)))
+    if model.sortColumn() != -1 and model.rowCount() > 1:
+        keys = [model.sortKey(row) for row in range(model.rowCount())]
+        ascending = model.sortOrder() == Qt.AscendingOrder
+        consistent = consistent and keys == sorted(keys, reverse=not ascending)
+    if not consistent:
+        failures.append(operation)
+
+for step in range(400):
+    operation = rng.choice(["add", "add", "add", "remove", "sort", "export_load", "clear"])
+    if operation == "add":
+        widget.paramLineEdit.setText(rng.choice(names))
+        widget.flushParamUpdate()
+        widget.reqValLineEdit.setText(str(rng.randrange(2)))
+        widget.addEntry()
+    elif operation == "remove" and widget.paramModel.rowCount() > 0:
+        widget.paramTable.clearSelection()
+        widget.paramTable.selectRow(rng.randrange(widget.paramModel.rowCount()))
+        widget.removeEntry()
+    elif operation == "sort":
+        widget.paramTable.sortByColumn(rng.randrange(4), rng.choice([Qt.AscendingOrder, Qt.DescendingOrder]))
+    elif operation == "export_load" and widget.paramModel.rowCount() > 0:
+        exported = widget.paramModel.criticalParameters()
+        widget.exportParameters()
+        widget.paramModel.clear()
+        widget.loadParameters()
+        if widget.paramModel.criticalParameters() != exported:
+            failures.append("round trip")
+    elif operation == "clear" and rng.random() < 0.2:
+        widget.removeAllEntries()
+    check(operation)
+print(json.dumps({"failures": failures, "rows": widget.paramModel.rowCount()}))
+"""
+
+
+def check_row_index():
+    # The name -> row index must match the table, and the rows must stay sorted, after any sequence of adds,
+    # overwrites, removals, sorts and loads. Exported entries must load back unchanged
+    result = run_gui_probes(_row_index_probe, n_groups=2)[0]
+    assert len(result["failures"]) == 0, result
+
+
+_table_load_probe = """
+import ctypes, gc, random
+from PySide2.QtCore import Qt
+from PySide2.QtWidgets import QTableWidget, QTableWidgetItem
+from load_critical_parameters import read_critical_parameters, write_critical_parameters
+
+def legacy_load(table, hFileParameters):
+    # QTableWidget loop loadParameters ran before CriticalParamModel: a row inserted at the top and up to four
+    # items per entry, with sorting disabled around the loop. The header values were texts then
+    table.setSortingEnabled(False)
+    for paramName, specifiedValues in hFileParameters.items():
+        table.insertRow(0)
+        table.setItem(0, 0, QTableWidgetItem(paramName))
+        if len(specifiedValues) == 1:
+            table.setItem(0, 1, QTableWidgetItem(str(specifiedValues[0])))
+        else:
+            table.setItem(0, 1, QTableWidgetItem(""))
+            table.setItem(0, 2, QTableWidgetItem(str(specifiedValues[0])))
+            table.setItem(0, 3, QTableWidgetItem(str(specifiedValues[1])))
+    table.setSortingEnabled(True)
+
+def rss_kb():
+    with open("/proc/self/status") as f:
+        return next(int(line.split()[1]) for line in f if line.startswith("RssAnon"))
+
+n_entries = int(sys.argv[2])
+rng = random.Random(0)
+params = dict()
+for i in range(n_entries):
+    name = f"G{rng.randrange(10000):04d}_P{i:06d}"
+    kind = rng.randrange(3)
+    if kind == 0:
+        params[name] = [rng.randrange(-100, 100)]
+    elif kind == 1:
+        params[name] = [round(rng.uniform(-10, 0), 3), "INFINITY"]
+    else:
+        params[name] = ["-INFINITY" if rng.random() < 0.3 else rng.randrange(-100, 0), rng.randrange(0, 100)]
+write_critical_parameters(params)
+del params
+hFileParameters = read_critical_parameters()
+result = dict()
+
+# Each mode runs in its own interpreter. Memory is measured once freed memory has been handed back to the system,
+# what remains is what the table keeps
+if sys.argv[3] == "model":
+    table = generate_param_list.ParamWidget()
+    wait_for_catalog()
+    # The widget loaded the header when it was created
+    table.paramModel.clear()
+    load = lambda: table.paramModel.loadEntries(hFileParameters)
+    sort = lambda: table.paramTable.sortByColumn(2, Qt.DescendingOrder)
+    clear = table.paramModel.clear
+else:
+    table = QTableWidget(0, 4)
+    table.sortByColumn(0, Qt.AscendingOrder)
+    load = lambda: legacy_load(table, hFileParameters)
+    sort = lambda: table.sortByColumn(2, Qt.DescendingOrder)
+    clear = lambda: table.setRowCount(0)
+table.show()
+app.processEvents()
+
+def retained_rss_kb():
+    gc.collect()
+    ctypes.CDLL("libc.so.6").malloc_trim(0)
+    return rss_kb()
+
+rss_before = retained_rss_kb()
+for stage, run in (("load", load), ("sort", sort), ("clear", clear)):
+    start = time.perf_counter()
+    run()
+    app.processEvents()
+    result[stage] = time.perf_counter() - start
+    if stage == "load":
+        result["rss_kb"] = retained_rss_kb() - rss_before
+print(json.dumps(result))
+"""
+
+
+def bench_table_load(sizes=(10000, 100000), legacy_max: int = 10000):
+    # Bulk load of a synthetic header of each size into the critical parameter table shown offscreen, then a sort
+    # and Clear All. The QTableWidget loop CriticalParamModel replaced is quadratic, it is only run up to
+    # legacy_max entries
+    for n_entries in sizes:
+        line = f"table load ({n_entries} entries):"
+        for mode in ("model", "legacy") if n_entries <= legacy_max else ("model",):
+            with tempfile.TemporaryDirectory() as directory:
+                with open(os.path.join(directory, "page.html"), 'w') as f:
+                    f.write(make_param_reference_html(n_groups=2))
+                output = subprocess.run([sys.executable, "-c", _gui_probe_prelude + _table_load_probe,
+                                         os.path.dirname(os.path.abspath(__file__)), str(n_entries), mode],
+                                        capture_output=True, text=True, check=True, cwd=directory,
+                                        env=dict(os.environ, QT_QPA_PLATFORM="offscreen")).stdout
+            result = json.loads(output.splitlines()[-1])
+            line += (f" {'QTableWidget' if mode == 'legacy' else 'model'} load {result['load'] * 1e3:.0f} ms "
+                     f"(+{result['rss_kb'] / 1024:.1f} MiB), sort {result['sort'] * 1e3:.0f} ms, "
+                     f"clear {result['clear'] * 1e3:.1f} ms;")
+        print(line.rstrip(";"))
+
+
+# ----------------------- table validation -----------------------
+def random_table_values(names: List[str], seed: int = 0) -> np.ndarray:
+    # (n, 3) required values and range limits around the validator defaults and the catalog limits, NaN for empty
+    # cells: in range, out of range, inverted, fractional and over-precise values
+    rng = np.random.default_rng(seed)
+    values = np.full((len(names), 3), np.nan)
+    required = rng.random(len(names)) < 0.4
+    values[required, 0] = rng.choice([0, 1, 3.5, 0.123456789, -2e9, 2e9, 50], required.sum())
+    ranged = ~required
+    for column in (1, 2):
+        values[ranged, column] = rng.choice([np.nan, -100, -0.5, 0, 2, 7.25, 1e10, -1e10], ranged.sum())
+    return values
+
+
+def check_table_validation(n_groups: int = 20):
+    from param_records import ParamBounds, check_entries
+    records = build_param_records(build_param_df(parse_html(make_param_reference_html(n_groups=n_groups))))
+    bounds = ParamBounds(records)
+    names = list(records)[::2] + [f"UNKNOWN_{i}" for i in range(50)]
+    values = random_table_values(names)
+    flags = check_entries(bounds, names, values)
+    assert flags.shape == (len(names), 4) and flags.dtype == np.uint8
+    # The range checks are those of check_entry, row by row
+    for row, name in enumerate(names):
+        cells = [None if np.isnan(value) else float(value) for value in values[row]]
+        if cells[0] is not None:
+            cells[1] = cells[2] = None
+        expected = check_entry(records.get(name), *cells)
+        found = [not flags[row, column + 1] & (invalid_range | invalid_inverted) for column in range(3)]
+        if cells[0] is not None:
+            expected = expected[:1]
+            found = found[:1]
+        assert list(expected) == found, (name, values[row], expected, flags[row])
+        assert bool(flags[row, 0] & invalid_unknown) == (name not in records)
+        record = records.get(name)
+        for column, value in enumerate(cells):
+            if value is None or record is None:
+                assert not flags[row, column + 1] & (invalid_type | invalid_precision)
+                continue
+            assert bool(flags[row, column + 1] & invalid_type) == (record.is_int and value != int(value))
+            assert bool(flags[row, column + 1] & invalid_precision) == (
+                not record.is_int and round(value, record.precision) != value), (name, value, record.precision)
+    assert (flags[:, 1:] & invalid_range).any() and (flags[:, 1:] & invalid_inverted).any()
+    assert (flags[:, 1:] & invalid_type).any() and (flags[:, 1:] & invalid_precision).any()
+    # Without a catalog nothing is unknown and only the validator defaults apply
+    flags = check_entries(None, names, values)
+    assert not (flags & (invalid_unknown | invalid_type | invalid_precision)).any()
+    assert check_entries(bounds, [], np.empty((0, 3))).shape == (0, 4)
+
+    result = run_gui_probes(_table_validation_probe, n_groups=2)[0]
+    assert result["before_catalog"] == 1 and result["after_catalog"] == 3, result
+    assert result["highlighted"] and result["label_visible"] and "Maximum" in result["tooltip"], result
+    assert result["cancelled"] is None and not result["header_changed"], result
+    assert result["added"] == 4 and result["removed"] == 3 and result["exported"] is True, result
+    assert result["empty_exported"] is None and not result["empty_header_changed"], result
+    assert result["warnings"] == ["Export failed"], result
+
+
+_table_validation_probe = """
+from PySide2.QtCore import Qt
+from PySide2.QtWidgets import QMessageBox
+from load_critical_parameters import file_name, write_critical_parameters
+catalog = full_param_list_html_parser.load_param_df()
+bounded = catalog[catalog["Min"].notnull() & catalog["Max"].notnull() & (catalog["Type"] == "INT32")]
+name, low, high = bounded.index[0], int(bounded["Min"].iloc[0]), int(bounded["Max"].iloc[0])
+other = bounded.index[1]
+# Valid for the validator defaults, but not for the catalog: out of range, unknown, a fraction for an INT32
+write_critical_parameters({name: [low, high + 1], "NOT_A_PARAM": [1], other: [0.5], bounded.index[2]: [low]})
+# One entry is invalid even before the catalog is loaded
+with open(file_name) as f:
+    text = f.read()
+with open(file_name, "w") as f:
+    f.write(text.replace(f"{low}, {high + 1}", f"{high + 1}, {low}"))
+with open(file_name) as f:
+    header = f.read()
+widget = generate_param_list.ParamWidget()
+result = {"before_catalog": len(widget.paramModel.invalidRows())}
+wait_for_catalog()
+model = widget.paramModel
+result["after_catalog"] = len(model.invalidRows())
+row = model.rowOf(name)
+result["highlighted"] = model.data(model.index(row, 3), Qt.BackgroundRole) == model.invalidCellColor
+result["tooltip"] = model.data(model.index(row, 0), Qt.ToolTipRole)
+result["label_visible"] = not widget.invalidEntriesLabel.isHidden()
+QMessageBox.question = lambda *args: QMessageBox.No
+result["cancelled"] = widget.exportParameters()
+with open(file_name) as f:
+    result["header_changed"] = f.read() != header
+# An entry added from the line edits is checked too
+QMessageBox.question = lambda *args: QMessageBox.Yes
+widget.paramLineEdit.setText(bounded.index[3])
+widget.flushParamUpdate()
+widget.reqValLineEdit.setText(str(high + 1))
+widget.addEntry()
+result["added"] = len(model.invalidRows())
+widget.paramTable.selectRow(widget.paramProxy.mapFromSource(model.index(model.rowOf(bounded.index[3]), 0)).row())
+widget.removeEntry()
+result["removed"] = len(model.invalidRows())
+result["exported"] = widget.exportParameters()
+# An empty table is not exported, the header stays as it was
+warnings = []
+QMessageBox.warning = lambda *args: warnings.append(args[1])
+widget.removeAllEntries()
+with open(file_name) as f:
+    header = f.read()
+result["empty_exported"] = widget.exportParameters()
+with open(file_name) as f:
+    result["empty_header_changed"] = f.read() != header
+result["warnings"] = warnings
+print(json.dumps(result))
+"""
+
+
+def bench_table_validation(sizes=(10000, 100000), n_groups: int = 640):
+    # Check of a whole table against the catalog bounds, one check_entry per row against check_entries
+    from param_records import ParamBounds, check_entries
+    records = build_param_records(build_param_df(parse_html(make_param_reference_html(n_groups=n_groups))))
+    bounds = ParamBounds(records)
+    catalog_names = list(records)
+    for n_rows in sizes:
+        names = [catalog_names[i % len(catalog_names)] if i < len(catalog_names) else f"EXTRA_{i}"
+                 for i in range(n_rows)]
+        values = random_table_values(names)
+
+        def legacy():
+            invalid = []
+            for name, (required, low, high) in zip(names, values.tolist()):
+                if required == required:
+                    valid = check_entry(records.get(name), required)
+                else:
+                    valid = check_entry(records.get(name), None, None if low != low else low,
+                                        None if high != high else high)
+                invalid.append(not all(valid))
+            return invalid
+        legacy_time = best_of(legacy, 1)
+        vectorized_time = best_of(lambda: check_entries(bounds, names, values))
+        print(f"table validation ({n_rows} rows, {len(records)} params): check_entry per row "
+              f"{legacy_time * 1e3:.0f} ms, check_entries {vectorized_time * 1e3:.1f} ms")
+
+
+# ------------------------- undo / redo --------------------------
+_undo_probe = """
+import random
+from PySide2.QtWidgets import QMessageBox
+from load_critical_parameters import write_critical_parameters
+from critical_param_model import parse_entries
+QMessageBox.question = lambda *args: QMessageBox.Yes
+widget = generate_param_list.ParamWidget()
+wait_for_catalog()
+model = widget.paramModel
+stack = widget.undoStack
+names = generate_param_list._paramList["Name"].tolist()
+rng = random.Random(0)
+failures = []
+changed = []
+widget.changedStatus.connect(changed.append)
+resets = []
+removals = []
+model.modelReset.connect(lambda: resets.append(1))
+model.rowsRemoved.connect(lambda *args: removals.append(1))
+
+def add(name, *values):
+    widget.paramLineEdit.setText(name)
+    widget.flushParamUpdate()
+    for lineEdit, value in zip((widget.reqValLineEdit, widget.rangeLowLineEdit, widget.rangeHighLineEdit), values):
+        lineEdit.setText(value)
+    widget.addEntry()
+
+# A history of every kind of edit, with the table after each one
+states = [model.criticalParameters()]
+for name in names[:20]:
+    add(name, str(rng.randrange(5)))
+    states.append(model.criticalParameters())
+add(names[3], "", "1", "2")
+states.append(model.criticalParameters())
+add(names[4], "", "", "")
+states.append(model.criticalParameters())
+widget.paramTable.selectAll()
+widget.paramTable.clearSelection()
+for row in (2, 5, 6, 7):
+    widget.paramTable.selectRow(row)
+widget.removeEntry()
+states.append(model.criticalParameters())
+write_critical_parameters({name: [1] for name in names[10:400]}, "import.h")
+del resets[:], removals[:]
+widget.importParameters("import.h")
+result = {"import_resets": len(resets), "import_removals": len(removals)}
+states.append(model.criticalParameters())
+del resets[:], removals[:]
+widget.removeAllEntries()
+result.update(clear_resets=len(resets), clear_removals=len(removals), cleared=model.rowCount())
+states.append(model.criticalParameters())
+
+result["commands"] = stack.count()
+for state in reversed(states[:-1]):
+    stack.undo()
+    if model.criticalParameters() != state:
+        failures.append(("undo", stack.index()))
+for state in states[1:]:
+    stack.redo()
+    if model.criticalParameters() != state:
+        failures.append(("redo", stack.index()))
+
+# The clean state follows the export, of the table before Clear All
+stack.undo()
+widget.exportParameters()
+result["clean_after_export"] = stack.isClean() and changed[-1] is False
+stack.undo()
+result["dirty_after_undo"] = not stack.isClean() and changed[-1] is True
+stack.redo()
+result["clean_after_redo"] = stack.isClean() and changed[-1] is False
+
+# The history is capped and each command only holds the rows it changed
+for step in range(generate_param_list.ParamWidget.undoLimit + 500):
+    add(names[step % 200], str(step))
+commands = [stack.command(index) for index in range(stack.count())]
+result["history"] = stack.count()
+result["max_command_bytes"] = max(command.nbytes() for command in commands)
+result["failures"] = failures
+print(json.dumps(result))
+"""
+
+
+def check_undo_redo():
+    result = run_gui_probes(_undo_probe, n_groups=20)[0]
+    assert len(result["failures"]) == 0, result["failures"]
+    assert result["commands"] == 25, result
+    assert result["import_resets"] == 1 and result["import_removals"] == 0, result
+    assert result["clear_resets"] == 1 and result["clear_removals"] == 0 and result["cleared"] == 0, result
+    assert result["clean_after_export"] and result["dirty_after_undo"] and result["clean_after_redo"], result
+    from generate_param_list import ParamWidget
+    assert result["history"] == ParamWidget.undoLimit, result
+    # One row typed and the row it overwrote
+    assert result["max_command_bytes"] <= 2 * (3 * 8 + 3 + 8), result
+
+
+_undo_bench_probe = """
+import tracemalloc
+from critical_param_commands import RemoveEntriesCommand, SetEntriesCommand
+from critical_param_model import parse_entry
+from px4_fixtures import make_critical_parameters
+widget = generate_param_list.ParamWidget()
+wait_for_catalog()
+model = widget.paramModel
+stack = widget.undoStack
+n_entries = int(sys.argv[2])
+result = dict()
+model.loadEntries(make_critical_parameters(n_entries))
+app.processEvents()
+
+def timed(name, run):
+    start = time.perf_counter()
+    run()
+    app.processEvents()
+    result[name] = time.perf_counter() - start
+
+timed("clear", lambda: stack.push(RemoveEntriesCommand(model, range(model.rowCount()), "Clear all")))
+result["clear_bytes"] = stack.command(stack.count() - 1).nbytes()
+timed("undo_clear", stack.undo)
+timed("redo_clear", stack.redo)
+stack.undo()
+# Clear All as the table did before, one row after the other, on a tenth of the rows
+model.removeEntries(range(n_entries // 10, n_entries))
+timed("per_row_clear", lambda: [model.removeEntries([0]) for _ in range(model.rowCount())])
+model.loadEntries(make_critical_parameters(n_entries))
+stack.clear()
+
+# History of single edits: what the commands hold against a snapshot of the table per step
+n_steps = 2000
+names = [model.name(row) for row in range(0, n_entries, max(1, n_entries // n_steps))][:n_steps]
+tracemalloc.start()
+before = tracemalloc.get_traced_memory()[0]
+for step, name in enumerate(names):
+    values, isInt = parse_entry(str(step))
+    stack.push(SetEntriesCommand(model, [name], values[None], isInt[None], f"Overwrite {name}"))
+result["history_kib"] = (tracemalloc.get_traced_memory()[0] - before) / 1024
+tracemalloc.stop()
+result["snapshot_kib"] = n_steps * (model._values.nbytes + model._isInt.nbytes + 8 * model.rowCount()) / 1024
+result["n_steps"] = len(names)
+print(json.dumps(result))
+"""
+
+
+def bench_undo_redo(n_entries: int = 100000):
+    # Clear All of a large table as one command, its undo and redo, against removing the rows one at a time. Then
+    # the memory of a history of single edits against one snapshot of the table per step
+    with tempfile.TemporaryDirectory() as directory:
+        with open(os.path.join(directory, "page.html"), 'w') as f:
+            f.write(make_param_reference_html(n_groups=2))
+        output = subprocess.run([sys.executable, "-c", _gui_probe_prelude + _undo_bench_probe,
+                                 os.path.dirname(os.path.abspath(__file__)), str(n_entries)],
+                                capture_output=True, text=True, check=True, cwd=directory,
+                                env=dict(os.environ, QT_QPA_PLATFORM="offscreen")).stdout
+    result = json.loads(output.splitlines()[-1])
+    print(f"undo/redo ({n_entries} entries): Clear All command {result['clear'] * 1e3:.0f} ms "
+          f"({result['clear_bytes'] / 2 ** 20:.1f} MiB), undo {result['undo_clear'] * 1e3:.0f} ms, "
+          f"redo {result['redo_clear'] * 1e3:.0f} ms; one row at a time {result['per_row_clear'] * 1e3:.0f} ms "
+          f"for {n_entries // 10} rows; history of {result['n_steps']} edits {result['history_kib']:.0f} KiB "
+          f"against {result['snapshot_kib'] / 1024:.0f} MiB of snapshots")
+
+
+# ----------------------- name completion ------------------------
+def brute_force_search(names: List[str], query: str, limit: int) -> List[str]:
+    # Exact, prefix and substring tiers of ParamNameIndex.search by scanning every name
+    key = query.strip().upper()
+    ranked = []
+    for name in set(names):
+        found = name.upper().find(key)
+        if found == 0:
+            tier = tier_exact if len(name) == len(key) else tier_prefix
+        elif found > 0 and len(key) >= 2:
+            tier = tier_word if "_" + key in name.upper() else tier_substring
+        else:
+            continue
+        ranked.append((tier, len(name), name.upper(), name))
+    return [name for *_, name in sorted(ranked)[:limit]]
+
+
+def completion_queries(names: List[str], n_queries: int, seed: int = 0) -> Dict[str, List[str]]:
+    # Queries an operator could type: the start of a name, a fragment from its middle, a name with one typo
+    rng = random.Random(seed)
+    queries = {"prefix": [], "substring": [], "typo": []}
+    for _ in range(n_queries):
+        name = rng.choice(names)
+        queries["prefix"].append(name[:rng.randrange(1, len(name) + 1)].lower())
+        start = rng.randrange(1, len(name) - 2)
+        queries["substring"].append(name[start:start + rng.randrange(2, 6)])
+        typo = rng.randrange(len(name))
+        queries["typo"].append(name[:typo] + rng.choice("AEIOU_") + name[typo + 1:])
+    return queries
+
+
+def check_param_name_index(n_groups: int = 40):
+    names = build_param_df(parse_html(make_param_reference_html(n_groups=n_groups)))["Name"].tolist()
+    names += ["MC_ROLLRATE_P", "MC_ROLL_P", "mc_roll_tc", "RATE"]
+    index = ParamNameIndex(names)
+    for kind, queries in completion_queries(names, 300).items():
+        for query in queries + ["R", "_", "zz", "", "roll", "_P_"]:
+            for limit in (1, 10, 50):
+                expected = brute_force_search(names, query, limit) if len(query.strip()) > 0 else []
+                found = index.search(query, limit, fuzzy=False)
+                assert found == expected, (query, limit, found, expected)
+                # Fuzzy matches only come after every exact, prefix and substring match
+                found = index.search(query, limit)
+                assert found[:len(expected)] == expected and len(found) <= limit, (query, found)
+    assert index.search("MC_ROLRATE_P", 5)[0] == "MC_ROLLRATE_P"
+
+
+def bench_param_name_index(n_groups: int = 640, n_queries: int = 500, limit: int = 50):
+    # Catalog of 16k parameters, about ten times PX4's. Latency of each query kind, p50 and p99 over n_queries
+    names = build_param_df(parse_html(make_param_reference_html(n_groups=n_groups)))["Name"].tolist()
+    start = time.perf_counter()
+    index = ParamNameIndex(names)
+    build_time = time.perf_counter() - start
+    print(f"name index ({len(names)} names): build {build_time * 1e3:.0f} ms")
+    for kind, queries in completion_queries(names, n_queries).items():
+        latencies = []
+        for query in queries:
+            start = time.perf_counter()
+            index.search(query, limit)
+            latencies.append(time.perf_counter() - start)
+        latencies.sort()
+        print(f"name index {kind} query: p50 {latencies[len(latencies) // 2] * 1e6:.0f} us, "
+              f"p99 {latencies[int(len(latencies) * 0.99)] * 1e6:.0f} us")
+
+
+_completer_probe = """
+import random
+from PySide2.QtCore import QStringListModel, Qt
+from PySide2.QtWidgets import QCompleter
+widget = generate_param_list.ParamWidget()
+wait_for_catalog()
+names = generate_param_list._paramList["Name"].tolist()
+rng = random.Random(0)
+queries = [name[:rng.randrange(1, len(name) + 1)] for name in rng.sample(names, 300)]
+
+# Default completer over every name, as before ParamNameIndex: the prefix is matched against the whole list
+nameList = QStringListModel(names)
+completer = QCompleter()
+completer.setModel(nameList)
+completer.setCaseSensitivity(Qt.CaseInsensitive)
+start = time.perf_counter()
+for query in queries:
+    completer.setCompletionPrefix(query)
+    completer.completionCount()
+legacy = (time.perf_counter() - start) / len(queries)
+
+completer = widget.paramLineEdit.completer()
+start = time.perf_counter()
+for query in queries:
+    widget.updateCompletions(query)
+    completer.setCompletionPrefix(query)
+    completer.completionCount()
+indexed = (time.perf_counter() - start) / len(queries)
+print(json.dumps({"legacy": legacy, "indexed": indexed}))
+"""
+
+
+def bench_completer(n_groups: int = 640):
+    # Completer update for one keystroke in the GUI. Prefix queries only, the default completer matched nothing else
+    result = run_gui_probes(_completer_probe, n_groups)[0]
+    print(f"completer keystroke ({n_groups} groups): QStringListModel {result['legacy'] * 1e6:.0f} us, "
+          f"ParamCompletionModel {result['indexed'] * 1e6:.0f} us")
+
+
+# ------------------------- header writer ------------------------
+def legacy_write_critical_parameters(params: Dict[str, List[float]], path: str):
+    # One write per entry straight into the header, what write_critical_parameters did before it rendered the
+    # header in memory. Kept as the reference for the output format
+    with open(path, 'w') as f:
+        f.write("//=========================================================="
+                "\n// THIS FILE WAS AUTO-GENERATED BY generate_param_list.py"
+                "\n// Do not edit this file as incorrect format will crash PX4"
+                "\n//==========================================================")
+        f.write("\n\n#ifndef PX4_AVY_PARAMETER_CHECK_LIST_H"
+                "\n#define PX4_AVY_PARAMETER_CHECK_LIST_H")
+        f.write("\n\n#define PCHK_CRIT_PARAM_LIST \\")
+        params_items = iter(params.items())
+        first_name, first_value = next(params_items)
+        for name, value in params_items:
+            f.write("\n" + " " * 29 + f"paramInfo {{param_find(\"{name}\"), {', '.join(map(str, value))}}}, \\")
+        else:
+            f.write("\n" + " " * 29 + f"paramInfo {{param_find(\"{first_name}\"), {', '.join(map(str, first_value))}}}")
+        f.write("\n\n#endif //PX4_AVY_PARAMETER_CHECK_LIST_H")
+
+
+def check_header_writer():
+    params = make_critical_parameters(500)
+    with tempfile.TemporaryDirectory() as directory:
+        header = os.path.join(directory, "avy_parameter_check_list.h")
+        legacy_write_critical_parameters(params, os.path.join(directory, "legacy.h"))
+        assert write_critical_parameters(params, header)
+        with open(header) as f, open(os.path.join(directory, "legacy.h")) as g:
+            assert f.read() == g.read()
+
+        # Same content: no write, the mtime is kept
+        os.utime(header, ns=(0, 0))
+        assert not write_critical_parameters(dict(params), header)
+        assert os.stat(header).st_mtime_ns == 0
+        params["PARAM_000000"] = [12345]
+        assert write_critical_parameters(params, header)
+        assert read_critical_parameters(header)["PARAM_000000"] == [12345]
+
+        # A write that fails before the rename leaves the previous header whole, and no temporary file
+        with open(header) as f:
+            before = f.read()
+        fsync = os.fsync
+
+        def failing_fsync(descriptor):
+            raise OSError("disk full")
+        os.fsync = failing_fsync
+        try:
+            write_critical_parameters(make_critical_parameters(10), header)
+            assert False, "the write did not fail"
+        except OSError:
+            pass
+        finally:
+            os.fsync = fsync
+        with open(header) as f:
+            assert f.read() == before
+        assert sorted(os.listdir(directory)) == ["avy_parameter_check_list.h", "legacy.h"]
+
+
+def bench_header_writer(n_entries: int = 10000):
+    params = make_critical_parameters(n_entries)
+    with tempfile.TemporaryDirectory() as directory:
+        header = os.path.join(directory, "avy_parameter_check_list.h")
+        legacy_time = best_of(lambda: legacy_write_critical_parameters(params, header))
+
+        def rewrite():
+            os.remove(header)
+            write_critical_parameters(params, header)
+        write_time = best_of(rewrite)
+        unchanged_time = best_of(lambda: write_critical_parameters(params, header))
+    print(f"header writer ({n_entries} entries): legacy {legacy_time * 1e3:.1f} ms, atomic write "
+          f"{write_time * 1e3:.1f} ms (fsync included), unchanged {unchanged_time * 1e3:.1f} ms")
+
+
+# ------------------------- header reader ------------------------
+def legacy_read_critical_parameters(path: str) -> Dict[str, List[str]]:
+    # Line by line reader parse_critical_parameters replaced, values are returned as texts and the first line that
+    # is not an entry ends the list
+    params = dict()
+    with open(path, 'r') as f:
+        list_begin_found = False
+        for line in f:
+            if not list_begin_found:
+                if re.search(r"#define PCHK_CRIT_PARAM_LIST", line):
+                    list_begin_found = True
+            else:
+                pattern = r"(?:.*{)(.*)(?:}.*)"
+                try:
+                    match = re.match(pattern, line)[1].split(',')
+                    match[0] = match[0][12:].strip("\") ")
+                    params[match[0]] = match[1:]
+                except TypeError:
+                    break
+    return params
+
+
+def check_header_reader():
+    params = make_critical_parameters(500)
+    with tempfile.TemporaryDirectory() as directory:
+        header = os.path.join(directory, "avy_parameter_check_list.h")
+        write_critical_parameters(params, header)
+        parsed = read_critical_parameters(header)
+        expected = {name: [{"-INFINITY": -inf, "INFINITY": inf}.get(value, value) for value in values]
+                    for name, values in params.items()}
+        assert parsed == expected
+        assert all(type(value) is type(typed) for name in parsed for value, typed in zip(parsed[name], expected[name]))
+        # The writer puts the first entry last, it is the one without a line continuation
+        assert list(parsed) == list(params)[1:] + list(params)[:1]
+        legacy = legacy_read_critical_parameters(header)
+        assert {name: [value.strip() for value in values] for name, values in legacy.items()} == \
+               {name: [str(value) for value in values] for name, values in params.items()}
+
+    # Layouts the line by line reader truncated: comments, blank continued lines, wrapped entries, tabs, CRLF
+    text = ("// leading comment\n#ifndef X\n# define PCHK_CRIT_PARAM_LIST \\\n"
+            "    /* block comment */ \\\n"
+            "    paramInfo{param_find(\"A\"), 1}, // trailing comment \\\n"
+            " \\\n"
+            "\tparamInfo {\\\n        param_find( \"B\" ),\\\n        -INFINITY, +2.5e3}, \\\r\n"
+            "    paramInfo {param_find(\"C\"), - 0.5f , INFINITY} /* multi\nline */, \\\n"
+            "    paramInfo {param_find(\"D\"), 7} // last entry\n\n#endif\n")
+    assert parse_critical_parameters(text) == {"A": [1], "B": [-inf, 2500.0], "C": [-0.5, inf], "D": [7]}
+    assert parse_critical_parameters("#define OTHER 1\n") == dict()
+    assert parse_critical_parameters("#define PCHK_CRIT_PARAM_LIST\n") == dict()
+
+    # Malformed lists fail on the line of the fault
+    base = "#define PCHK_CRIT_PARAM_LIST \\\n    paramInfo {param_find(\"A\"), 1}, \\\n"
+    for broken, line, message in (
+            ("\n    paramInfo {param_find(\"B\"), 2}\n", 4, "entry outside PCHK_CRIT_PARAM_LIST"),
+            ("    paramInfo {param_find(\"B\"), 2} \\\n    paramInfo {param_find(\"C\"), 3}\n", 4,
+             "expected ',' after the entry of B"),
+            ("    paramInfo {param_find(\"B\"), x}\n", 3, "expected a required value or a minimum"),
+            ("    paramInfo {param_find(\"B\"), 1, 2, 3}\n", 3, "expected '}'"),
+            ("    paramInfo {param_find(B), 1}\n", 3, "expected 'param_find(\"NAME\")'"),
+            ("    \\\n    paramInfo {param_find(\"B\"), \\\n 1,\n 2}\n", 5, "expected '}'")):
+        try:
+            parse_critical_parameters(base + broken, "h")
+            assert False, broken
+        except CriticalParameterFormatError as e:
+            assert e.line == line and message in str(e) and str(e).startswith(f"h:{line}: "), (str(e), broken)
+
+
+def bench_header_reader(n_entries: int = 100000):
+    params = make_critical_parameters(n_entries)
+    with tempfile.TemporaryDirectory() as directory:
+        header = os.path.join(directory, "avy_parameter_check_list.h")
+        write_critical_parameters(params, header)
+        legacy_time = best_of(lambda: legacy_read_critical_parameters(header))
+        parse_time = best_of(lambda: read_critical_parameters(header))
+    print(f"header reader ({n_entries} entries): line by line {legacy_time * 1e3:.0f} ms (texts), "
+          f"tokenizing {parse_time * 1e3:.0f} ms (typed values)")
+
+
+# ---------------------- headless generation ---------------------
+_header_cli = os.path.join(os.path.dirname(os.path.abspath(__file__)), "generate_param_header.py")
+
+
+def run_header_cli(directory: str, *args: str) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, _header_cli, *args], capture_output=True, text=True, cwd=directory)
+
+
+def check_header_cli(n_groups: int = 4):
+    param_data_df = build_param_df(parse_html(make_param_reference_html(n_groups=n_groups)))
+    bounded = param_data_df[param_data_df["Min"].notnull() & param_data_df["Max"].notnull()]
+    with tempfile.TemporaryDirectory() as directory:
+        with open(os.path.join(directory, "page.html"), 'w') as f:
+            f.write(make_param_reference_html(n_groups=n_groups))
+        spec = [{"name": bounded.index[0], "required": bounded["Min"].iloc[0]},
+                {"name": bounded.index[1], "min": bounded["Min"].iloc[1]},
+                {"name": bounded.index[2], "max": bounded["Max"].iloc[2]},
+                {"name": bounded.index[3], "min": bounded["Min"].iloc[3], "max": bounded["Max"].iloc[3]}]
+        with open(os.path.join(directory, "spec.json"), 'w') as f:
+            json.dump(spec, f)
+        with open(os.path.join(directory, "spec.csv"), 'w') as f:
+            f.write("name,required,min,max\n" + "\n".join(
+                f"{entry['name']},{entry.get('required', '')},{entry.get('min', '')},{entry.get('max', '')}"
+                for entry in spec))
+        expected = {entry["name"]: [entry["required"]] if "required" in entry else
+                    [entry.get("min", -inf), entry.get("max", inf)] for entry in spec}
+        for spec_file in ("spec.json", "spec.csv"):
+            result = run_header_cli(directory, spec_file, "--catalog", "page.html", "-o", spec_file + ".h")
+            assert result.returncode == 0, result.stderr
+            header = read_critical_parameters(os.path.join(directory, spec_file + ".h"))
+            assert header == expected, header
+
+        # Values outside the catalog limits and unknown names fail unless allowed, like the GUI asks to confirm
+        spec.append({"name": bounded.index[4], "required": bounded["Max"].iloc[4] + 1})
+        spec.append({"name": "NOT_A_PARAM", "min": 0})
+        with open(os.path.join(directory, "spec.json"), 'w') as f:
+            json.dump(spec, f)
+        result = run_header_cli(directory, "spec.json", "--catalog", "page.html", "-o", "invalid.h")
+        assert result.returncode == 1 and not os.path.exists(os.path.join(directory, "invalid.h")), result.stderr
+        assert bounded.index[4] in result.stderr and "NOT_A_PARAM" in result.stderr, result.stderr
+        result = run_header_cli(directory, "spec.json", "--catalog", "page.html", "-o", "invalid.h",
+                                "--allow-invalid", "--allow-unknown")
+        assert result.returncode == 0, result.stderr
+
+    # Neither path imports Qt
+    for argv in (["spec.json", "--no-catalog"], ["spec.json", "--catalog", "page.html"]):
+        probe = (f"import sys; sys.path.insert(0, {os.path.dirname(_header_cli)!r}); import generate_param_header; "
+                 f"generate_param_header.main({argv + ['-o', 'probe.h', '--allow-invalid', '--allow-unknown']!r}); "
+                 f"print(sorted(m for m in sys.modules if m.startswith('PySide2')))")
+        with tempfile.TemporaryDirectory() as directory:
+            with open(os.path.join(directory, "page.html"), 'w') as f:
+                f.write(make_param_reference_html(n_groups=n_groups))
+            with open(os.path.join(directory, "spec.json"), 'w') as f:
+                json.dump(spec, f)
+            output = subprocess.run([sys.executable, "-c", probe], capture_output=True, text=True, check=True,
+                                    cwd=directory).stdout
+        assert output.splitlines()[-1] == "[]", output
+
+
+def check_shared_catalog_cache(n_groups: int = 20, n_processes: int = 24, rounds: int = 3):
+    # Header CLIs run side by side on one cache directory, all of them building the catalog of an empty cache, then
+    # loading it from the warm cache, which leaves index.json alone
+    param_data_df = build_param_df(parse_html(make_param_reference_html(n_groups=n_groups)))
+    with tempfile.TemporaryDirectory() as directory:
+        with open(os.path.join(directory, "page.html"), 'w') as f:
+            f.write(make_param_reference_html(n_groups=n_groups))
+        with open(os.path.join(directory, "spec.json"), 'w') as f:
+            json.dump([{"name": param_data_df.index[0], "required": param_data_df["Default"].iloc[0]}], f)
+        index_path = os.path.join(directory, "param_catalog_cache", "index.json")
+        for round_index in range(rounds + 1):
+            processes = [subprocess.Popen([sys.executable, _header_cli, "spec.json", "--catalog", "page.html",
+                                           "-o", f"header_{process}.h"], cwd=directory, stdout=subprocess.PIPE,
+                                          stderr=subprocess.PIPE, text=True) for process in range(n_processes)]
+            for process in processes:
+                _, stderr = process.communicate()
+                assert process.returncode == 0, stderr
+            if round_index == 0:
+                index_mtime = os.stat(index_path).st_mtime_ns
+        assert os.stat(index_path).st_mtime_ns == index_mtime
+        # One entry and its files, no temporary file or lock left behind
+        with open(index_path) as f:
+            (entry,) = json.load(f)["entries"].values()
+        assert sorted(os.listdir(os.path.dirname(index_path))) == \
+            sorted([entry["file"], entry["columnar"], entry["groups"], "index.json"])
+
+
+def bench_header_cli(n_groups: int = 640, n_entries: int = 200, runs: int = 5):
+    # Wall time of one header generation from the command line, the interpreter start included: without the
+    # catalog checks, and against a catalog already in the cache. Importing PySide2's widgets is shown for reference,
+    # it is what the GUI paid before any header could be written
+    param_data_df = build_param_df(parse_html(make_param_reference_html(n_groups=n_groups)))
+    spec = [{"name": name, "required": value} for name, value in
+            zip(param_data_df.index[:n_entries], param_data_df["Default"].iloc[:n_entries])]
+    with tempfile.TemporaryDirectory() as directory:
+        with open(os.path.join(directory, "page.html"), 'w') as f:
+            f.write(make_param_reference_html(n_groups=n_groups))
+        with open(os.path.join(directory, "spec.json"), 'w') as f:
+            json.dump(spec, f)
+        run_header_cli(directory, "spec.json", "--catalog", "page.html", "--allow-invalid", "-o", "warm.h")
+
+        def wall_time(command: List[str]) -> float:
+            timings = []
+            for _ in range(runs):
+                start = time.perf_counter()
+                subprocess.run(command, capture_output=True, check=True, cwd=directory)
+                timings.append(time.perf_counter() - start)
+            return sorted(timings)[len(timings) // 2]
+
+        times = {"python -c pass": wall_time([sys.executable, "-c", "pass"]),
+                 "--no-catalog": wall_time([sys.executable, _header_cli, "spec.json", "--no-catalog"]),
+                 "cached catalog": wall_time([sys.executable, _header_cli, "spec.json", "--catalog", "page.html",
+                                              "--allow-invalid"]),
+                 "import PySide2.QtWidgets": wall_time([sys.executable, "-c", "import PySide2.QtWidgets"])}
+        importtime = subprocess.run([sys.executable, "-X", "importtime", "-c", "import generate_param_header"],
+                                    capture_output=True, text=True, check=True,
+                                    cwd=os.path.dirname(_header_cli)).stderr
+        cumulative = next(int(line.split("|")[1]) for line in importtime.splitlines()
+                          if line.rstrip().endswith(" generate_param_header"))
+    print(f"header CLI ({n_entries} entries, {len(param_data_df)} params): "
+          + ", ".join(f"{label} {duration * 1e3:.0f} ms" for label, duration in times.items())
+          + f"; import generate_param_header {cumulative / 1e3:.1f} ms")
+
+
+# ---------------------- fleet generation ---------------------
+_fleet_cli = os.path.join(os.path.dirname(os.path.abspath(__file__)), "generate_airframe_headers.py")
+
+
+def write_airframe_specs(directory: str, param_data_df: pd.DataFrame, n_specs: int, n_entries: int,
+                         seed: int = 0) -> List[str]:
+    # Specs of n_specs airframes, each a random selection of n_entries parameters with a mix of required values
+    # and ranges
+    rng = random.Random(seed)
+    bounded = param_data_df[param_data_df["Min"].notnull() & param_data_df["Max"].notnull()]
+    os.makedirs(directory, exist_ok=True)
+    specs = []
+    for i in range(n_specs):
+        spec = []
+        for position in sorted(rng.sample(range(len(bounded)), min(n_entries, len(bounded)))):
+            low, high = bounded["Min"].iloc[position], bounded["Max"].iloc[position]
+            if rng.random() < 0.5:
+                spec.append({"name": bounded.index[position], "required": low})
+            else:
+                spec.append({"name": bounded.index[position], "min": low, "max": high})
+        specs.append(os.path.join(directory, f"airframe_{i:04d}.json"))
+        with open(specs[-1], 'w') as f:
+            json.dump(spec, f)
+    return specs
+
+
+def check_airframe_headers(n_groups: int = 4, n_specs: int = 6):
+    param_data_df = build_param_df(parse_html(make_param_reference_html(n_groups=n_groups)))
+    with tempfile.TemporaryDirectory() as directory:
+        with open(os.path.join(directory, "page.html"), 'w') as f:
+            f.write(make_param_reference_html(n_groups=n_groups))
+        specs = write_airframe_specs(os.path.join(directory, "specs"), param_data_df, n_specs, 10)
+        # One spec with an unknown parameter, its header is not written and the others are
+        with open(specs[0]) as f:
+            invalid = json.load(f) + [{"name": "NOT_A_PARAM", "min": 0}]
+        with open(specs[0], 'w') as f:
+            json.dump(invalid, f)
+        result = subprocess.run([sys.executable, _fleet_cli, "specs", "-d", "out", "-j", "2", "--catalog",
+                                 "page.html", "--report", "report.json"], capture_output=True, text=True,
+                                cwd=directory)
+        assert result.returncode == 1 and "NOT_A_PARAM" in result.stderr, result.stderr
+        with open(os.path.join(directory, "report.json")) as f:
+            report = json.load(f)
+        assert report["totals"]["specs"] == n_specs and report["totals"]["written"] == n_specs - 1, report["totals"]
+        assert [entry["status"] for entry in report["specs"]] == ["invalid"] + ["written"] * (n_specs - 1)
+
+        # Each header is the one generate_param_header.py writes for the spec, and no temporary file is left
+        for spec in specs[1:]:
+            airframe = os.path.splitext(os.path.basename(spec))[0]
+            single = run_header_cli(directory, spec, "--catalog", "page.html", "-o", airframe + ".h")
+            assert single.returncode == 0, single.stderr
+            with open(os.path.join(directory, airframe + ".h")) as f, \
+                    open(os.path.join(directory, "out", airframe, "avy_parameter_check_list.h")) as g:
+                assert f.read() == g.read(), airframe
+        assert not os.path.exists(os.path.join(directory, "out", "airframe_0000", "avy_parameter_check_list.h"))
+        leftovers = [name for _, _, names in os.walk(os.path.join(directory, "out")) for name in names
+                     if name.endswith(".tmp")]
+        assert len(leftovers) == 0, leftovers
+
+        # A second run finds every header up to date and leaves them alone
+        header = os.path.join(directory, "out", "airframe_0001", "avy_parameter_check_list.h")
+        mtime = os.stat(header).st_mtime_ns
+        result = subprocess.run([sys.executable, _fleet_cli, *specs[1:], "-d", "out", "--catalog", "page.html",
+                                 "--report", "report.json"], capture_output=True, text=True, cwd=directory)
+        assert result.returncode == 0, result.stderr
+        with open(os.path.join(directory, "report.json")) as f:
+            report = json.load(f)
+        assert report["totals"]["unchanged"] == n_specs - 1 and report["totals"]["written"] == 0, report["totals"]
+        assert os.stat(header).st_mtime_ns == mtime
+
+
+def bench_airframe_headers(n_groups: int = 640, n_specs: int = 300, n_entries: int = 200):
+    # Scaling of the fleet generation from one worker to one per core, the catalog load excluded: it is paid once
+    # whatever the number of workers
+    from generate_airframe_headers import generate_headers
+    param_data_df = build_param_df(parse_html(make_param_reference_html(n_groups=n_groups)))
+    records = build_param_records(param_data_df)
+    cores = os.cpu_count() or 1
+    worker_counts = sorted(set([1] + [2 ** i for i in range(1, cores.bit_length()) if 2 ** i <= cores] + [cores]))
+    with tempfile.TemporaryDirectory() as directory:
+        specs = write_airframe_specs(os.path.join(directory, "specs"), param_data_df, n_specs, n_entries)
+        timings = []
+        for workers in worker_counts:
+            # A new output directory for each run, headers that are already up to date are not rewritten
+            jobs = []
+            for spec in specs:
+                output = os.path.join(directory, f"out{workers}", os.path.splitext(os.path.basename(spec))[0],
+                                      "avy_parameter_check_list.h")
+                os.makedirs(os.path.dirname(output), exist_ok=True)
+                jobs.append((spec, output))
+            start = time.perf_counter()
+            results = generate_headers(jobs, records, workers)
+            timings.append((workers, time.perf_counter() - start))
+            assert all(result.status == "written" for result in results)
+    base = timings[0][1]
+    print(f"airframe headers ({n_specs} specs x {n_entries} entries, {len(records)} params, {cores} core(s)): "
+          + ", ".join(f"{workers} worker(s) {duration:.2f} s ({n_specs / duration:.0f} specs/s, "
+                      f"x{base / duration:.1f})" for workers, duration in timings))
+
+
+# ------------------------ release fetching -----------------------
+def check_release_fetch(n_groups: int = 4):
+    import full_param_list_html_parser
+    import px4_release_fetcher
+    from full_param_list_html_parser import load_param_df, load_release_catalogs
+    from px4_fixtures import FixtureServer
+    from px4_release_fetcher import ReleaseFetcher
+
+    pages = {f"v1.{minor}.0": make_param_reference_html(n_groups=n_groups, seed=minor) for minor in range(9, 12)}
+    saved = (full_param_list_html_parser.catalog_cache, full_param_list_html_parser.release_fetcher,
+             full_param_list_html_parser.revalidate_after, px4_release_fetcher.release_url_template)
+    with tempfile.TemporaryDirectory() as directory, FixtureServer(pages, fail_first=1) as server:
+        full_param_list_html_parser.catalog_cache = CatalogCache(directory, 1)
+        full_param_list_html_parser.release_fetcher = ReleaseFetcher(max_workers=4, retries=2, backoff=0.01)
+        px4_release_fetcher.release_url_template = server.url_template()
+        try:
+            def assert_catalogs(catalogs):
+                for release, catalog in catalogs.items():
+                    pd.testing.assert_frame_equal(catalog, build_param_df(parse_html(pages[release])))
+
+            # First load: every page downloaded, after one 503 each
+            catalogs, errors = load_release_catalogs(pages)
+            assert len(errors) == 0 and set(catalogs) == set(pages), errors
+            assert_catalogs(catalogs)
+            assert server.counts == {200: 3, 304: 0, 404: 0, 503: 3}, server.counts
+
+            # Recently checked catalogs are not fetched again. Using them does not count as checking them, a
+            # catalog used every day is still revalidated once revalidate_after has passed
+            entries = full_param_list_html_parser.catalog_cache._entries
+            checked = {key: entry["checked"] for key, entry in entries.items()}
+            catalogs, errors = load_release_catalogs(pages)
+            assert len(errors) == 0 and server.counts[200] == 3 and server.counts[304] == 0, server.counts
+            assert checked == {key: entry["checked"] for key, entry in entries.items()}
+
+            # Revalidation: unchanged pages answer 304, a changed page is downloaded and its catalog rebuilt
+            full_param_list_html_parser.revalidate_after = 0
+            pages["v1.10.0"] = make_param_reference_html(n_groups=n_groups, seed=100)
+            server.set_page("v1.10.0", pages["v1.10.0"])
+            catalogs, errors = load_release_catalogs(pages)
+            assert len(errors) == 0, errors
+            assert_catalogs(catalogs)
+            assert server.counts[304] == 2 and server.counts[200] == 4, server.counts
+            pd.testing.assert_frame_equal(load_param_df(server.url("v1.9.0")), catalogs["v1.9.0"])
+            assert server.counts[304] == 3, server.counts
+
+            # Offline: the cached catalogs are used, a release never fetched is an error
+            server.stop()
+            catalogs, errors = load_release_catalogs(list(pages) + ["v2.0.0"])
+            assert set(errors) == {"v2.0.0"} and set(catalogs) == set(pages), errors
+            assert_catalogs(catalogs)
+        finally:
+            full_param_list_html_parser.release_fetcher.close()
+            (full_param_list_html_parser.catalog_cache, full_param_list_html_parser.release_fetcher,
+             full_param_list_html_parser.revalidate_after, px4_release_fetcher.release_url_template) = saved
+
+
+def bench_release_fetch(n_releases: int = 8, n_groups: int = 200, latency: float = 0.1):
+    # Downloads of n_releases pages from the local stand-in, each response delayed by latency to stand for the
+    # round trip to docs.px4.io: one requests.get after the other as parse_url did, then concurrently through the
+    # pooled session, then the conditional requests of a revalidation
+    import requests
+    from px4_fixtures import FixtureServer
+    from px4_release_fetcher import ReleaseFetcher
+
+    pages = {f"v1.{minor}.0": make_param_reference_html(n_groups=n_groups, seed=minor) for minor in range(n_releases)}
+    with FixtureServer(pages, latency=latency) as server, ReleaseFetcher() as fetcher:
+        urls = [server.url(release) for release in pages]
+        start = time.perf_counter()
+        for url in urls:
+            requests.get(url).text
+        legacy_time = time.perf_counter() - start
+        start = time.perf_counter()
+        results = fetcher.fetch_all([(url, None, None) for url in urls])
+        pooled_time = time.perf_counter() - start
+        assert all(result.status == "downloaded" for result in results)
+        start = time.perf_counter()
+        revalidated = fetcher.fetch_all([(result.url, result.etag, result.last_modified) for result in results])
+        conditional_time = time.perf_counter() - start
+        assert all(result.status == "not modified" for result in revalidated)
+    size = sum(len(html) for html in pages.values())
+    print(f"release fetch ({n_releases} pages, {size / 2 ** 20:.1f} MiB, {latency * 1e3:.0f} ms latency): sequential "
+          f"requests.get {legacy_time:.2f} s, pooled concurrent {pooled_time:.2f} s, "
+          f"conditional revalidation {conditional_time:.2f} s")
+
+
+# ------------------------- catalog diff --------------------------
+def upgraded_catalog(param_data_df: pd.DataFrame, seed: int = 0):
+    # The next release of a catalog: some parameters removed, renamed, retyped or with new limits, some added.
+    # Returns the new catalog and the name of the parameters of each kind
+    rng = random.Random(seed)
+    names = list(param_data_df.index)
+    rng.shuffle(names)
+    step = max(1, len(names) // 50)
+    removed, renamed, retyped, limited = (names[i * step:(i + 1) * step] for i in range(4))
+    new = param_data_df.drop(index=removed)
+    new.loc[retyped, "Type"] = ["FLOAT" if value != "FLOAT" else "INT32" for value in new.loc[retyped, "Type"]]
+    new.loc[limited, "Max"] = new.loc[limited, "Max"].fillna(0) - 1
+    # A rename keeps Type and Description, they are unique in the fixture
+    new = new.rename(index={name: name + "_V2" for name in renamed})
+    new["Name"] = new.index
+    added = param_data_df.iloc[:step].copy()
+    added.index = [f"NEW_PARAM_{i}" for i in range(len(added))]
+    added["Name"] = added.index
+    added["Description"] = [f"new parameter {i}" for i in range(len(added))]
+    new = pd.concat([new, added]).sample(frac=1, random_state=seed)
+    new.index.name = "Name"
+    return new, {"removed": removed, "renamed": renamed, "retyped": retyped, "limited": limited,
+                 "added": list(added.index)}
+
+
+def check_catalog_diff(n_groups: int = 8):
+    from catalog_diff import affected_entries, diff_catalogs, diff_releases
+    old = build_param_df(parse_html(make_param_reference_html(n_groups=n_groups)))
+    new, kinds = upgraded_catalog(old)
+    limited = [name for name in kinds["limited"] if pd.notnull(old.loc[name, "Max"])]
+    diff = diff_catalogs(old, new)
+    assert diff.index.is_monotonic_increasing and len(diff) == len(old) + len(kinds["added"]) + len(kinds["renamed"])
+    for status in ("removed", "added"):
+        assert sorted(diff.index[diff["status"] == status]) == sorted(kinds[status]), status
+    assert sorted(diff.index[diff["status"] == "renamed"]) == sorted(kinds["renamed"]
+                                                                     + [name + "_V2" for name in kinds["renamed"]])
+    assert list(diff.loc[kinds["renamed"], "renamed_to"]) == [name + "_V2" for name in kinds["renamed"]]
+    assert list(diff.loc[[name + "_V2" for name in kinds["renamed"]], "renamed_from"]) == kinds["renamed"]
+    assert diff.loc[kinds["retyped"], "Type_changed"].all()
+    assert (diff.loc[kinds["retyped"], "status"] == "changed").all()
+    assert diff.loc[limited, "Max_changed"].all() and not diff.loc[limited, "Min_changed"].any()
+    unchanged = diff["status"] == "unchanged"
+    assert unchanged.sum() == len(old) - sum(len(kinds[kind]) for kind in ("removed", "renamed", "retyped", "limited"))
+    # Missing values compare equal, the same catalog has no difference
+    assert (diff_catalogs(old, old)["status"] == "unchanged").all()
+
+    # Header entries: one per kind, one whose required value is above the new Max, one with an unbounded minimum
+    # under a changed Max that still fits, one untouched and one unknown to both catalogs
+    stable = [name for name in diff.index[unchanged] if pd.notnull(old.loc[name, "Max"])]
+    critical_params = {kinds["removed"][0]: [1], kinds["renamed"][0]: [0, 1],
+                       kinds["retyped"][0]: ["-INFINITY", "INFINITY"],
+                       stable[0]: [old.loc[stable[0], "Max"] + 1], stable[1]: ["-INFINITY", old.loc[stable[1], "Max"]],
+                       limited[0]: ["-INFINITY", new.loc[limited[0], "Max"]], stable[2]: [inf, inf],
+                       "NOT_A_PARAM": [0]}
+    affected = affected_entries(diff, critical_params)
+    assert list(affected.index) == [kinds["removed"][0], kinds["renamed"][0], kinds["retyped"][0], stable[0],
+                                    limited[0]], affected
+    assert list(affected["status"]) == ["removed", "renamed", "changed", "unchanged", "changed"]
+    assert list(affected["out_of_range"]) == [False, False, False, True, False]
+    assert affected.loc[kinds["renamed"][0], "renamed_to"] == kinds["renamed"][0] + "_V2"
+    assert "Type" in affected.loc[kinds["retyped"][0], "changed"] and affected.loc[limited[0], "changed"] == "Max"
+
+    # Three releases: the diff of each step, unchanged parameters left out
+    newer, newer_kinds = upgraded_catalog(new, seed=1)
+    differences = diff_releases({"v1": old, "v2": new, "v3": newer})
+    assert list(differences.groupby(["from", "to"], sort=False).groups) == [("v1", "v2"), ("v2", "v3")]
+    assert (differences["status"] != "unchanged").all()
+    assert sorted(differences[differences["to"] == "v3"].index[differences[differences["to"] == "v3"]["status"]
+                                                              == "removed"]) == sorted(newer_kinds["removed"])
+
+    # The command line, with only the middle release cached: the steps follow the order of the releases
+    import contextlib
+    import io
+    import catalog_diff
+    import full_param_list_html_parser
+    import px4_release_fetcher
+    from full_param_list_html_parser import load_release_catalogs
+    from px4_fixtures import FixtureServer, change_param_groups
+    from px4_release_fetcher import ReleaseFetcher
+    pages = {"v1": make_param_reference_html(n_groups=n_groups)}
+    pages["v2"] = change_param_groups(pages["v1"], [1])
+    pages["v3"] = change_param_groups(pages["v2"], [2, 3], seed=2)
+    expected = diff_releases({release: build_param_df(parse_html(page)) for release, page in pages.items()})
+    saved = (full_param_list_html_parser.catalog_cache, full_param_list_html_parser.release_fetcher,
+             px4_release_fetcher.release_url_template)
+    with tempfile.TemporaryDirectory() as directory, FixtureServer(pages) as server:
+        full_param_list_html_parser.catalog_cache = CatalogCache(directory, 1)
+        full_param_list_html_parser.release_fetcher = ReleaseFetcher()
+        px4_release_fetcher.release_url_template = server.url_template()
+        try:
+            load_release_catalogs(["v2"])
+            catalogs, errors = load_release_catalogs(["v1", "v2", "v3"])
+            assert list(catalogs) == ["v1", "v2", "v3"] and len(errors) == 0, (list(catalogs), errors)
+            output = io.StringIO()
+            with contextlib.redirect_stdout(output):
+                catalog_diff.main(["v1", "v2", "v3", "--header", os.path.join(directory, "missing.h")])
+        finally:
+            full_param_list_html_parser.release_fetcher.close()
+            (full_param_list_html_parser.catalog_cache, full_param_list_html_parser.release_fetcher,
+             px4_release_fetcher.release_url_template) = saved
+    for (old_release, new_release), step in expected.groupby(["from", "to"], sort=False):
+        counts = step["status"].value_counts()
+        line = f"{old_release} -> {new_release}: " + ", ".join(
+            f"{counts.get(status, 0)} {status}" for status in ("changed", "renamed", "removed", "added"))
+        assert line in output.getvalue().splitlines(), (line, output.getvalue())
+
+
+def bench_catalog_diff(n_groups: int = 1200, n_entries: int = 2000):
+    # Diff of two releases of n_groups * 25 parameters and the header entries affected, against a diff that walks
+    # the catalogs one name at a time
+    from catalog_diff import affected_entries, diff_catalogs
+    old = build_param_df(parse_html(make_param_reference_html(n_groups=n_groups)))
+    new, _ = upgraded_catalog(old)
+    critical_params = {name: [0] if i % 2 == 0 else ["-INFINITY", 10] for i, name in enumerate(old.index[:n_entries])}
+
+    def legacy_diff():
+        changed = dict()
+        for name in old.index:
+            if name not in new.index:
+                changed[name] = "removed"
+                continue
+            for column in ("Type", "Min", "Max", "Incr", "Default"):
+                old_value, new_value = old.at[name, column], new.at[name, column]
+                if old_value != new_value and not (pd.isnull(old_value) and pd.isnull(new_value)):
+                    changed[name] = "changed"
+                    break
+        return [name for name in critical_params if name in changed]
+
+    start = time.perf_counter()
+    legacy = legacy_diff()
+    legacy_time = time.perf_counter() - start
+    diff_time = best_of(lambda: diff_catalogs(old, new))
+    diff = diff_catalogs(old, new)
+    affected_time = best_of(lambda: affected_entries(diff, critical_params))
+    affected = affected_entries(diff, critical_params)
+    assert set(legacy) <= set(affected.index)
+    print(f"catalog diff ({len(old)} -> {len(new)} params, {len(critical_params)} header entries): per-name loop "
+          f"{legacy_time:.2f} s, vectorized diff {diff_time * 1e3:.0f} ms + affected entries "
+          f"{affected_time * 1e3:.1f} ms")
+
+
+# ---------------------- fleet compliance -------------------------
+_dump_cli = os.path.join(os.path.dirname(os.path.abspath(__file__)), "check_param_dumps.py")
+
+
+def write_vehicle_dumps(directory: str, critical_params: Dict[str, List], n_dumps: int, n_params: int,
+                        violation_rate: float = 0.01, seed: int = 0) -> (List[str], List[Dict[str, str]]):
+    # Dumps of n_dumps vehicles with n_params parameters, the critical ones among them. Each critical parameter is
+    # missing, has a wrong required value or falls outside its range with probability violation_rate. Returns the
+    # dumps and, for each, the kind of violation of each failing parameter
+    from px4_fixtures import make_param_dump
+    rng = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+    dumps = []
+    expected = []
+    others = [f"OTHER_{i:05d}" for i in range(max(0, n_params - len(critical_params)))]
+    for i in range(n_dumps):
+        values = dict()
+        violations = dict()
+        for name, specified in critical_params.items():
+            low, high = (float(specified[0]), float(specified[0])) if len(specified) == 1 else \
+                (float(specified[0]), float(specified[1]))
+            if rng.random() < violation_rate:
+                kind = rng.choice(["missing", "required" if len(specified) == 1 else "range"])
+                violations[name] = kind
+                if kind == "missing":
+                    continue
+                value = high + 1 if np.isfinite(high) else low - 1
+            else:
+                value = rng.uniform(max(low, -1e3), min(high, 1e3)) if low != high else low
+            values[name] = int(value) if isinstance(specified[0], int) and len(specified) == 1 else value
+        for name in others:
+            values[name] = rng.randrange(1000) if rng.random() < 0.5 else rng.uniform(-100, 100)
+        names = list(values)
+        rng.shuffle(names)
+        dumps.append(os.path.join(directory, f"vehicle_{i:05d}.params"))
+        with open(dumps[-1], 'w') as f:
+            f.write(make_param_dump({name: values[name] for name in names}, vehicle_id=i + 1))
+        expected.append(violations)
+    return dumps, expected
+
+
+def check_param_dumps(n_dumps: int = 12):
+    from check_param_dumps import check_dumps, check_lines, critical_checks, DumpResult
+    from px4_fixtures import make_param_dump
+    # The entries as read back from a header, with -inf and inf for the unbounded limits
+    critical_params = parse_critical_parameters(render_critical_parameters(make_critical_parameters(40, seed=3)))
+
+    # Semantics of avy_param_check.cpp: single precision on both sides, limits included, INFINITY unbounded
+    checks = critical_checks({"REQ_F": [0.1], "REQ_I": [4], "RANGE": [-1.5, 2.25], "LOW": [-inf, 3],
+                              "HIGH": ["-INFINITY", "INFINITY"], "MISSING": [1], "NAN": [0, 1]})
+    dump = make_param_dump({"REQ_F": float(np.float32(0.1)), "REQ_I": 4, "RANGE": 2.25, "LOW": -3.4e38,
+                            "HIGH": 1e30, "OTHER": 7}) + "1\t1\tNAN\tnan\t9\n\n# comment\n"
+    result = check_lines(dump.splitlines(), checks, DumpResult("inline"))
+    assert result.errors == [] and result.parameters == 7 and result.vehicles == ["1"], result.as_dict()
+    assert [violation[:2] for violation in result.violations] == [["MISSING", "missing"], ["NAN", "range"]], \
+        result.violations
+    dump = make_param_dump({"REQ_F": 0.1000001, "REQ_I": 5, "RANGE": 2.2500002, "LOW": 3.0000002, "HIGH": -inf,
+                            "MISSING": 1, "NAN": 1})
+    result = check_lines(dump.splitlines() + ["1 1 BROKEN"], checks, DumpResult("inline"))
+    assert [violation[:2] for violation in result.violations] == [["LOW", "range"], ["RANGE", "range"],
+                                                                  ["REQ_F", "required"], ["REQ_I", "required"]], \
+        result.violations
+    assert len(result.errors) == 1 and ":16:" in result.errors[0], result.errors
+
+    with tempfile.TemporaryDirectory() as directory:
+        dumps, expected = write_vehicle_dumps(os.path.join(directory, "dumps"), critical_params, n_dumps, 100,
+                                              violation_rate=0.1)
+        serial = list(check_dumps(dumps, critical_params, workers=1))
+        pooled = list(check_dumps(dumps, critical_params, workers=2))
+        for result, other, violations in zip(serial, pooled, expected):
+            assert result.violations == other.violations and result.dump == other.dump
+            assert {name: kind for name, kind, _, _ in result.violations} == violations, (result.dump, violations)
+            assert result.status == ("violations" if violations else "compliant")
+            assert result.parameters == 100 - list(violations.values()).count("missing")
+
+        # The command line: one report per vehicle, exit status 1 with violations, 2 with an unreadable dump
+        write_critical_parameters(critical_params, os.path.join(directory, "header.h"))
+        run = subprocess.run([sys.executable, _dump_cli, "dumps", "--header", "header.h", "-j", "2", "--report",
+                              "report.json"], capture_output=True, text=True, cwd=directory)
+        failing = sum(len(violations) > 0 for violations in expected)
+        assert run.returncode == (1 if failing else 0), run.stderr
+        with open(os.path.join(directory, "report.json")) as f:
+            report = json.load(f)
+        assert report["totals"]["dumps"] == n_dumps and report["totals"]["violations"] == failing, report["totals"]
+        assert [vehicle["vehicles"] for vehicle in report["vehicles"]] == [[str(i + 1)] for i in range(n_dumps)]
+        with open(os.path.join(directory, "dumps", "broken.params"), 'w') as f:
+            f.write("1\t1\tONLY_FOUR\t1\n")
+        run = subprocess.run([sys.executable, _dump_cli, "dumps", "--header", "header.h", "-q"],
+                             capture_output=True, text=True, cwd=directory)
+        assert run.returncode == 2 and "broken.params:1" in run.stderr, run.stderr
+
+
+def bench_param_dumps(n_dumps: int = 2000, n_params: int = 1000, n_entries: int = 200):
+    # Throughput of the fleet check from one worker to one per core, against reading each dump whole with pandas
+    # and checking it with a table lookup. The header is parsed before the clock starts, once whatever the workers
+    from check_param_dumps import check_dumps, critical_checks
+    critical_params = parse_critical_parameters(render_critical_parameters(make_critical_parameters(n_entries)))
+    cores = os.cpu_count() or 1
+    worker_counts = sorted(set([1] + [2 ** i for i in range(1, cores.bit_length()) if 2 ** i <= cores] + [cores]))
+    with tempfile.TemporaryDirectory() as directory:
+        dumps, expected = write_vehicle_dumps(directory, critical_params, n_dumps, n_params)
+        size = sum(os.path.getsize(dump) for dump in dumps)
+        failing = sum(len(violations) > 0 for violations in expected)
+
+        def pandas_check(dump: str) -> int:
+            table = pd.read_csv(dump, sep="\t", comment="#", header=None,
+                                names=["vehicle", "component", "name", "value", "type"], index_col="name")
+            values = table["value"].reindex(list(checks)).to_numpy(dtype=np.float32).astype(np.float64)
+            required, low, high = np.array(list(checks.values())).T
+            failed = np.where(np.isnan(required), ~((low <= values) & (values <= high)), values != required)
+            return int(failed.sum())
+
+        checks = critical_checks(critical_params)
+        sample = dumps[:max(1, n_dumps // 10)]
+        start = time.perf_counter()
+        pandas_failing = sum(pandas_check(dump) > 0 for dump in sample)
+        pandas_time = (time.perf_counter() - start) * n_dumps / len(sample)
+        assert pandas_failing == sum(len(violations) > 0 for violations in expected[:len(sample)])
+
+        timings = []
+        for workers in worker_counts:
+            start = time.perf_counter()
+            results = list(check_dumps(dumps, critical_params, workers))
+            timings.append((workers, time.perf_counter() - start))
+            assert sum(result.status == "violations" for result in results) == failing
+    base = timings[0][1]
+    print(f"param dumps ({n_dumps} dumps x {n_params} params, {size / 2 ** 20:.0f} MiB, {n_entries} header entries, "
+          f"{cores} core(s)): pandas per dump {pandas_time:.2f} s ({n_dumps / pandas_time:.0f} dumps/s); "
+          + ", ".join(f"{workers} worker(s) {duration:.2f} s ({n_dumps / duration:.0f} dumps/s, "
+                      f"{size / 2 ** 20 / duration:.0f} MiB/s, x{base / duration:.1f})"
+                      for workers, duration in timings))
+
+
+# ----------------------- parameter metadata ----------------------
+def write_metadata_files(directory: str, metadata: List[dict]) -> Dict[str, str]:
+    # The metadata of a release in every format the catalog reads, by label
+    import gzip
+    import lzma
+    from px4_fixtures import make_metadata_reference_html, make_parameters_json, make_parameters_xml
+    texts = {"page": make_metadata_reference_html(metadata), "xml": make_parameters_xml(metadata),
+             "json": make_parameters_json(metadata)}
+    paths = {label: os.path.join(directory, name) for label, name in (
+        ("page", "page.html"), ("xml", "parameters.xml"), ("json", "parameters.json"),
+        ("json.xz", "parameters.json.xz"), ("xml.gz", "parameters.xml.gz"))}
+    for label in texts:
+        with open(paths[label], 'w', encoding="utf-8") as f:
+            f.write(texts[label])
+    with lzma.open(paths["json.xz"], 'wt', encoding="utf-8") as f:
+        f.write(texts["json"])
+    with gzip.open(paths["xml.gz"], 'wt', encoding="utf-8") as f:
+        f.write(texts["xml"])
+    return paths
+
+
+def check_metadata_catalog(n_groups: int = 6):
+    import io
+    import full_param_list_html_parser
+    from full_param_list_html_parser import load_param_df
+    from param_metadata import iter_json_array, load_metadata_df
+    from px4_fixtures import make_param_metadata
+    metadata = make_param_metadata(n_groups=n_groups)
+    # Characters of several UTF-8 bytes, cut by the chunks of the JSON reader
+    metadata[3]["shortDesc"] += " °/s Δt ≤ 1"
+    metadata[4]["values"] = [{"value": 10, "description": "ten"}, {"value": 2, "description": "two"}]
+    # Text that looks like markup, escaped by the page and the XML file
+    metadata[5]["shortDesc"] = "Gain <b> for 0 < x & y > 1 &amp;"
+    metadata[4]["values"][0]["description"] = "ten <x>"
+    saved = full_param_list_html_parser.catalog_cache
+    with tempfile.TemporaryDirectory() as directory:
+        full_param_list_html_parser.catalog_cache = CatalogCache(os.path.join(directory, "cache"), 1)
+        try:
+            paths = write_metadata_files(directory, metadata)
+            # Every format gives the catalog the page of the same release gives
+            expected = build_param_df(parse_html(read_page(paths["page"])))
+            for label in ("xml", "json", "json.xz", "xml.gz"):
+                pd.testing.assert_frame_equal(load_metadata_df(paths[label]), expected, obj=label)
+
+            # Through load_param_df, cached like a page and opened columnar on the next load
+            catalog = load_param_df(paths["xml"])
+            pd.testing.assert_frame_equal(catalog, expected)
+            columnar = load_param_df(paths["xml"], columnar=True)
+            assert full_param_list_html_parser.catalog_cache.stats()["hits"] == 1
+            assert list(columnar["Name"]) == list(expected["Name"])
+            assert columnar.loc[expected.index[3], "Description"] == expected["Description"].iloc[3]
+        finally:
+            full_param_list_html_parser.catalog_cache = saved
+
+    # The JSON reader: any chunk size, other top-level values skipped in any order, errors for truncated files
+    text = json.dumps({"uid": [1, {"parameters": 2}], "parameters": [{"a": "Δ"}, 12345, [], "x"], "n": 1.5})
+    for chunk_size in (1, 2, 3, 7, 1 << 20):
+        items = list(iter_json_array(io.BytesIO(text.encode("utf-8")), "parameters", chunk_size))
+        assert items == [{"a": "Δ"}, 12345, [], "x"], (chunk_size, items)
+    assert list(iter_json_array(io.BytesIO(b'{"parameters": []}'), "parameters")) == []
+    assert list(iter_json_array(io.BytesIO(b' {} '), "parameters")) == []
+    for broken in (text[:-1], text[:40], '{"parameters": [1 2]}'):
+        try:
+            list(iter_json_array(io.BytesIO(broken.encode("utf-8")), "parameters", 5))
+        except json.JSONDecodeError:
+            pass
+        else:
+            raise AssertionError(broken)
+
+
+def read_page(path: str) -> str:
+    # Read from disk, like the metadata files it is compared with
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+
+def bench_metadata_catalog(n_groups: int = 1200):
+    # The catalog of one release of n_groups * 25 parameters built from its reference page and from its metadata
+    # files, read from disk each time. Peak traced memory shows what each path holds at once
+    import tracemalloc
+    from param_metadata import load_metadata_df
+    from px4_fixtures import make_param_metadata
+    metadata = make_param_metadata(n_groups=n_groups)
+    with tempfile.TemporaryDirectory() as directory:
+        paths = write_metadata_files(directory, metadata)
+        builds = {"page": lambda: build_param_df(parse_html(read_page(paths["page"])))}
+        builds.update((label, lambda path=paths[label]: load_metadata_df(path))
+                      for label in ("xml", "json", "json.xz"))
+        timings = dict()
+        for label, build in builds.items():
+            timings[label] = best_of(build, repeat=2)
+            tracemalloc.start()
+            build()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            timings[label] = (timings[label], peak, os.path.getsize(paths[label]))
+    print(f"catalog from metadata ({len(metadata)} params): "
+          + ", ".join(f"{label} {duration:.2f} s ({size / 2 ** 20:.1f} MiB file, peak {peak / 2 ** 20:.0f} MiB"
+                      + (f", x{timings['page'][0] / duration:.1f})" if label != "page" else ")")
+                      for label, (duration, peak, size) in timings.items()))
+
+
+# ----------------------- incremental refresh ---------------------
+def check_incremental_refresh(n_groups: int = 12):
+    import full_param_list_html_parser
+    from full_param_list_html_parser import build_page_catalog, extract_param_data, load_param_df, split_tables
+    from px4_fixtures import change_param_groups
+    saved = full_param_list_html_parser.catalog_cache
+    with tempfile.TemporaryDirectory() as directory:
+        full_param_list_html_parser.catalog_cache = CatalogCache(os.path.join(directory, "cache"), 1)
+        page_path = os.path.join(directory, "page.html")
+        try:
+            def load(html: str) -> pd.DataFrame:
+                with open(page_path, 'w') as f:
+                    f.write(html)
+                param_data_df = load_param_df(page_path)
+                pd.testing.assert_frame_equal(param_data_df, build_param_df(parse_html(html)))
+                pd.testing.assert_frame_equal(load_param_df(page_path, columnar=True).to_frame(),
+                                              param_data_df.astype({"Type": "category"}))
+                return param_data_df
+
+            def refresh() -> Tuple[int, int]:
+                return full_param_list_html_parser.last_refresh["reused"], \
+                       full_param_list_html_parser.last_refresh["parsed"]
+
+            html = make_param_reference_html(n_groups=n_groups)
+            load(html)
+            assert refresh() == (0, n_groups), full_param_list_html_parser.last_refresh
+
+            # Two groups changed, with a parameter more each
+            html = change_param_groups(html, [2, n_groups - 1])
+            assert len(load(html)) == n_groups * 25 + 2
+            assert refresh() == (n_groups - 2, 2), full_param_list_html_parser.last_refresh
+
+            # The same page again is a cache hit, nothing is rebuilt
+            full_param_list_html_parser.last_refresh = None
+            load(html)
+            assert full_param_list_html_parser.last_refresh is None
+
+            # Groups removed, moved and duplicated are reused from wherever they were
+            group_of = lambda index: html[html.index(f"<h2 id=\"group-{index}\">"):
+                                          html.index("</tbody></table>", html.index(f"<h2 id=\"group-{index}\">"))
+                                          + len("</tbody></table>")]
+            moved = html.replace(group_of(0), "").replace(group_of(5), group_of(5) + "\n" + group_of(0))
+            moved = moved.replace(group_of(7), group_of(7) + "\n" + group_of(7))
+            load(moved)
+            assert refresh() == (n_groups + 1, 0), full_param_list_html_parser.last_refresh
+
+            # A forced rebuild parses every group
+            extract_param_data(page_path)
+            assert refresh() == (0, n_groups + 1), full_param_list_html_parser.last_refresh
+        finally:
+            full_param_list_html_parser.catalog_cache = saved
+
+    # Without the groups of a previous catalog, or with a page whose groups all changed
+    html = make_param_reference_html(n_groups=n_groups)
+    param_data_df, groups, reused = build_page_catalog(html)
+    assert reused == 0 and [n_rows for _, n_rows in groups] == [25] * n_groups
+    other = make_param_reference_html(n_groups=n_groups, seed=3)
+    other_df, _, reused = build_page_catalog(other, (param_data_df, groups))
+    assert reused == 0
+    pd.testing.assert_frame_equal(other_df, build_param_df(parse_html(other)))
+    empty_df, empty_groups, reused = build_page_catalog("<html><body></body></html>", (param_data_df, groups))
+    assert len(empty_df) == 0 and empty_groups == [] and reused == 0
+
+    # Tags in any case, tables in comments and scripts and <tables> tags are split as lxml reads them. Pages with
+    # an unclosed table are built whole
+    body = html[html.index("<body>") + len("<body>"):html.index("</body>")]
+    first = body[body.index("<table"):body.index("</table>")]
+    mixed = first.replace("<table", "<TABLE") + "</Table >" + body.replace(first + "</table>", "", 1)
+    extra = "<tables>x</tables><!-- <table><tr><td>A</td></tr></table> --><script>'<table>'</script>"
+    for page, n_split in ((mixed + extra, n_groups), (extra + body + first, None)):
+        page = "<html><body>" + page + "</body></html>"
+        page_df, page_groups, _ = build_page_catalog(page, (param_data_df, groups))
+        assert (len(page_groups) if page_groups is not None else None) == n_split
+        pd.testing.assert_frame_equal(page_df, build_param_df(parse_html(page)))
+    assert split_tables("<table><tr><td><table></table></td></tr></table>") is None
+
+
+def bench_incremental_refresh(n_groups: int = 1200, changed=(0, 1, 12, 120, 600, 1200)):
+    # Refresh of a catalog of n_groups groups after a new version of the page changed some of them, against the
+    # full build of the new page. The build itself, the catalog is then stored as before
+    from full_param_list_html_parser import build_page_catalog
+    from px4_fixtures import change_param_groups
+    html = make_param_reference_html(n_groups=n_groups)
+    previous = build_page_catalog(html)[:2]
+    rng = random.Random(0)
+    results = []
+    for n_changed in changed:
+        new_html = change_param_groups(html, rng.sample(range(n_groups), n_changed))
+        refresh_time = best_of(lambda: build_page_catalog(new_html, previous), repeat=3 if n_changed < 600 else 1)
+        results.append((n_changed, refresh_time))
+    full_time = best_of(lambda: build_param_df(parse_html(html)), repeat=1)
+    print(f"incremental refresh ({n_groups} groups, full build {full_time * 1e3:.0f} ms): "
+          + ", ".join(f"{n_changed} changed {refresh_time * 1e3:.0f} ms" for n_changed, refresh_time in results))
+
+
+# ------------------------ instrumentation ------------------------
+_instrumentation_probe = """
+import instrumentation
+from generate_param_list import ParamWidget
+result = {"enabled": instrumentation.enabled, "slots": list(ParamWidget.instrumentedSlots),
+          "wrapped": [name for name in ParamWidget.instrumentedSlots
+                      if getattr(getattr(ParamWidget, name), "instrumented", False)]}
+widget = generate_param_list.ParamWidget()
+wait_for_catalog()
+for name in generate_param_list._paramList["Name"].tolist()[:3]:
+    widget.paramLineEdit.setText(name)
+    widget.flushParamUpdate()
+    widget.reqValLineEdit.setText("1")
+    widget.addEntry()
+widget.exportParameters()
+# Typed values reach checkValid through textChanged(str), PySide2 only prints the exceptions of a slot
+slot_errors = []
+sys.excepthook = lambda kind, error, traceback: slot_errors.append(f"{kind.__name__}: {error}")
+calls = widget.handlerCalls["checkValid"]
+widget.reqValLineEdit.setText("")
+widget.rangeLowLineEdit.setText("5")
+widget.rangeHighLineEdit.setText("1")
+result["slot_errors"] = slot_errors
+result["typed_checks"] = widget.handlerCalls["checkValid"] - calls
+result["inverted_range_valid"] = widget.rangeLowLineEdit.isInputValid and widget.rangeHighLineEdit.isInputValid
+if instrumentation.enabled:
+    instrumentation.write_report("profile.json")
+    instrumentation.write_report("trace.json", "chrome")
+    with open("profile.json") as f:
+        result["histograms"] = json.load(f)["histograms"]
+    with open("trace.json") as f:
+        trace = json.load(f)
+    result["trace_names"] = sorted({event["name"] for event in trace["traceEvents"]})
+    result["trace_phases"] = sorted({event["ph"] for event in trace["traceEvents"]})
+    result["profile_stats"] = os.path.getsize("profile.json.prof")
+print(json.dumps(result))
+"""
+
+
+def check_instrumentation():
+    # Off by default: nothing is wrapped and spans are the shared no-op context
+    assert not instrumentation.enabled
+    assert instrumentation.span("catalog.load") is instrumentation.span("catalog.fetch")
+    disabled = run_gui_probes(_instrumentation_probe, n_groups=2)[0]
+    assert not disabled["enabled"] and disabled["wrapped"] == [], disabled
+    assert disabled["slot_errors"] == [] and disabled["typed_checks"] == 3, disabled
+    assert not disabled["inverted_range_valid"], disabled
+
+    enabled = run_gui_probes(_instrumentation_probe, n_groups=2,
+                             env={"PARAM_CHECK_PROFILE": "exit.json", "PARAM_CHECK_PROFILE_SLOT": "updateParamName"})[0]
+    assert enabled["enabled"] and enabled["wrapped"] == enabled["slots"], enabled["wrapped"]
+    # The wrapped slots take the arguments of the plain ones, highlighting works the same
+    assert enabled["slot_errors"] == [] and enabled["typed_checks"] == 3, enabled
+    assert not enabled["inverted_range_valid"], enabled
+    histograms = enabled["histograms"]
+    for name in ("catalog.load", "catalog.fetch", "catalog.parse.groups",
+                 "catalog.parse.tables", "catalog.regex", "catalog.numeric", "catalog.cache.lookup",
+                 "catalog.cache.store", "slot.updateParamName", "slot.updateDescription", "slot.updateSpinboxes",
+                 "slot.checkValid", "slot.addRow", "slot.loadParameters", "slot.exportParameters"):
+        assert name in histograms, (name, sorted(histograms))
+    assert histograms["slot.addRow"]["count"] == 3 and histograms["slot.exportParameters"]["count"] == 1
+    for histogram in histograms.values():
+        assert sum(histogram["buckets_us"].values()) == histogram["count"], histogram
+        assert histogram["min_ms"] <= histogram["p50_ms"] <= histogram["p99_ms"] <= histogram["max_ms"], histogram
+    assert enabled["trace_names"] == sorted(histograms) and enabled["trace_phases"] == ["X"]
+    assert enabled["profile_stats"] > 0
+
+    histogram = instrumentation.Histogram()
+    for seconds in (0.5e-6, 3e-6, 3e-6, 1e-3):
+        histogram.add(seconds)
+    assert histogram.as_dict()["buckets_us"] == {"<1": 1, "<4": 2, "<1024": 1}, histogram.as_dict()
+    assert histogram.percentile(0.5) == 4e-6 and histogram.percentile(1.0) == 1e-3
+
+
+def bench_instrumentation_overhead(n_calls: int = 200000, n_groups: int = 400):
+    # Cost of a span and of a slot call, off (the plain method) and on (wrapped by timed), and of the spans of a
+    # catalog build
+    tables = list(parse_html(make_param_reference_html(n_groups=n_groups)))
+
+    def empty():
+        pass
+    timings = dict()
+    with tempfile.TemporaryDirectory() as directory:
+        for state in ("off", "on"):
+            instrumentation.configure(os.path.join(directory, "profile.json") if state == "on" else None)
+            slot = instrumentation.timed("bench.slot")(empty) if state == "on" else empty
+            start = time.perf_counter()
+            for _ in range(n_calls):
+                with instrumentation.span("bench.span"):
+                    pass
+            span_time = (time.perf_counter() - start) / n_calls
+            start = time.perf_counter()
+            for _ in range(n_calls):
+                slot()
+            slot_time = (time.perf_counter() - start) / n_calls
+            timings[state] = (span_time, slot_time, best_of(lambda: build_param_df(tables)))
+        instrumentation.configure(None)
+        instrumentation.reset()
+    print(f"instrumentation ({n_groups} groups): "
+          + ", ".join(f"{state}: span {span_time * 1e9:.0f} ns, slot call {slot_time * 1e9:.0f} ns, "
+                      f"build_param_df {build_time * 1e3:.1f} ms"
+                      for state, (span_time, slot_time, build_time) in timings.items()))
+
+
+# ------------------------ benchmark suite ------------------------
+def check_benchmark_suite():
+    import benchmark_suite
+    results = benchmark_suite.run_suite(["header"], n_entries=200, repeat=1)
+    results = json.loads(json.dumps(results))
+    assert set(results["stages"]) == {"header render", "header write", "header write unchanged", "header read"}
+    for stage in results["stages"].values():
+        assert stage["wall_s"] > 0 and stage["alloc_peak_kib"] > 0, stage
+    assert benchmark_suite.compare(results, results, max_slowdown=1.0) == []
+
+
+if __name__ == "__main__":
+    check_parse_html_table()
+    check_build_param_df()
+    check_columnar_catalog()
+    check_catalog_cache()
+    check_concurrent_cache_writers()
+    check_param_records()
+    check_keystroke_fanout()
+    check_startup_imports()
+    check_catalog_loader()
+    check_row_index()
+    check_table_validation()
+    check_undo_redo()
+    check_param_name_index()
+    check_header_writer()
+    check_header_reader()
+    check_header_cli()
+    check_shared_catalog_cache()
+    check_airframe_headers()
+    check_benchmark_suite()
+    check_release_fetch()
+    check_catalog_diff()
+    check_param_dumps()
+    check_metadata_catalog()
+    check_incremental_refresh()
+    check_instrumentation()
+    bench_parse_html_table()
+    bench_build_param_df()
+    bench_catalog_load()
+    bench_catalog_memory()
+    bench_gui_startup()
+    bench_keystroke_lookups()
+    bench_gui_keystroke()
+    bench_table_load()
+    bench_table_validation()
+    bench_undo_redo()
+    bench_param_name_index()
+    bench_completer()
+    bench_header_writer()
+    bench_header_reader()
+    bench_header_cli()
+    bench_airframe_headers()
+    bench_release_fetch()
+    bench_catalog_diff()
+    bench_param_dumps()
+    bench_metadata_catalog()
+    bench_incremental_refresh()
+    bench_instrumentation_overhead()
@@ -0,0 +1,296 @@
+import argparse
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+# Benchmark suite of the catalog build, the header I/O and the GUI hot paths, run offline against the generated
+# PX4 parameter reference page and synthetic headers of px4_fixtures. benchmark_param_list.py compares each
+# optimisation with the code it replaced, this suite follows the current code from run to run. Every stage reports:
+# - wall time: the best of --repeat runs, and per operation for stages repeating a small one (keystrokes)
+# - allocations: the peak and the retained size of what Python allocated during one run under tracemalloc, and the
+#   number of memory blocks still allocated after it. lxml, numpy buffers and Qt allocate outside of Python's
+#   allocator, their memory only shows in the peak memory
+# - peak memory: the rise of the resident set high-water mark during one run without tracemalloc (Linux only).
+#   Memory freed by the earlier runs of the stage is reused first, so this is what the stage needs beyond it
+# The GUI stages run in a fresh interpreter on the offscreen Qt platform. Results are written as JSON, --compare
+# prints the ratios to an earlier result file
+#
+#   python benchmark_suite.py -o results.json --compare baseline.json
+
+stage_groups = ("catalog", "header", "gui")
+
+
+def _status_kb(field: str) -> Optional[int]:
+    try:
+        with open("/proc/self/status") as f:
+            return next(int(line.split()[1]) for line in f if line.startswith(field + ":"))
+    except (OSError, StopIteration):
+        return None
+
+
+def _reset_rss_peak() -> Optional[int]:
+    # Resets VmHWM to the current resident set, returns the resident set or None where this is not supported
+    try:
+        with open("/proc/self/clear_refs", 'w') as f:
+            f.write("5")
+    except OSError:
+        return None
+    return _status_kb("VmRSS")
+
+
+def measure(func: Callable, repeat: int = 3, operations: int = 1, setup: Callable = None) -> dict:
+    # setup, if given, runs untimed before each run of func
+    timings = []
+    rss_base = rss_peak = None
+    for run in range(repeat):
+        if setup is not None:
+            setup()
+        gc.collect()
+        if run == repeat - 1:
+            rss_base = _reset_rss_peak()
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    if rss_base is not None:
+        rss_peak = _status_kb("VmHWM") - rss_base
+
+    if setup is not None:
+        setup()
+    gc.collect()
+    blocks = sys.getallocatedblocks()
+    tracemalloc.start()
+    result = func()
+    del result
+    gc.collect()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    stage = {"wall_s": min(timings), "alloc_peak_kib": peak / 1024, "alloc_retained_kib": retained / 1024,
+             "blocks_retained": sys.getallocatedblocks() - blocks, "rss_peak_kib": rss_peak}
+    if operations > 1:
+        stage["per_operation_us"] = min(timings) / operations * 1e6
+        stage["operations"] = operations
+    return stage
+
+
+# ----------------------------- stages ----------------------------
+def catalog_stages(directory: str, n_groups: int, repeat: int) -> Dict[str, dict]:
+    import full_param_list_html_parser
+    from full_param_list_html_parser import build_param_df, extract_param_data, load_param_df, parse_html
+    from param_catalog_cache import CatalogCache
+    from param_name_index import ParamNameIndex
+    from param_records import build_param_records
+    from px4_fixtures import make_param_reference_html
+
+    html = make_param_reference_html(n_groups=n_groups)
+    page = os.path.join(directory, "page.html")
+    with open(page, 'w', encoding="utf-8") as f:
+        f.write(html)
+    # The stages must not touch the cache of the working directory
+    full_param_list_html_parser.catalog_cache = CatalogCache(os.path.join(directory, "cache"),
+                                                             full_param_list_html_parser.catalog_schema_version)
+    tables = list(parse_html(html))
+    param_data_df = build_param_df(tables)
+    stages = dict()
+    stages["catalog parse_html"] = measure(lambda: list(parse_html(html)), repeat)
+    stages["catalog build_param_df"] = measure(lambda: build_param_df(tables), repeat)
+    stages["catalog extract_param_data"] = measure(lambda: extract_param_data(page), repeat)
+    stages["catalog load_param_df cached"] = measure(lambda: load_param_df(page), repeat)
+    stages["catalog load_param_df cached columnar"] = measure(lambda: load_param_df(page, columnar=True), repeat)
+    stages["catalog build_param_records"] = measure(lambda: build_param_records(param_data_df), repeat)
+    stages["catalog ParamNameIndex"] = measure(lambda: ParamNameIndex(param_data_df["Name"]), repeat)
+    return stages
+
+
+def header_stages(directory: str, n_entries: int, repeat: int) -> Dict[str, dict]:
+    from load_critical_parameters import read_critical_parameters, render_critical_parameters, \
+        write_critical_parameters
+    from px4_fixtures import make_critical_parameters
+
+    params = make_critical_parameters(n_entries)
+    header = os.path.join(directory, "avy_parameter_check_list.h")
+
+    def remove_header():
+        if os.path.exists(header):
+            os.remove(header)
+    stages = dict()
+    stages["header render"] = measure(lambda: render_critical_parameters(params), repeat)
+    stages["header write"] = measure(lambda: write_critical_parameters(params, header), repeat, setup=remove_header)
+    stages["header write unchanged"] = measure(lambda: write_critical_parameters(params, header), repeat)
+    stages["header read"] = measure(lambda: read_critical_parameters(header), repeat)
+    return stages
+
+
+_gui_stages_probe = """
+from PySide2.QtWidgets import QMessageBox
+from load_critical_parameters import file_name, write_critical_parameters
+from px4_fixtures import make_critical_parameters
+from benchmark_suite import measure
+repeat = int(sys.argv[2])
+n_entries = int(sys.argv[3])
+stages = dict()
+widgets = []
+
+def start_widget():
+    # The catalog is in the cache after the first run, each run waits for the loader thread to open it
+    generate_param_list._paramList = None
+    widgets.append(generate_param_list.ParamWidget())
+    wait_for_catalog()
+stages["gui ParamWidget startup cached catalog"] = measure(start_widget, repeat)
+widget = widgets[-1]
+widget.show()
+app.processEvents()
+
+names = generate_param_list._paramList["Name"].tolist()[::7][:200]
+keystrokes = [name[:end] for name in names for end in range(len(name) - 3, len(name) + 1)]
+
+def type_names():
+    for text in keystrokes:
+        widget.paramLineEdit.setText(text)
+        widget.flushParamUpdate()
+stages["gui keystroke"] = measure(type_names, repeat, len(keystrokes))
+
+completer = widget.paramLineEdit.completer()
+
+def complete():
+    for text in keystrokes:
+        widget.updateCompletions(text)
+        completer.setCompletionPrefix(text)
+        completer.completionCount()
+stages["gui completer update"] = measure(complete, repeat, len(keystrokes))
+
+write_critical_parameters(make_critical_parameters(n_entries))
+
+def load():
+    widget.loadParameters()
+    app.processEvents()
+stages["gui table load"] = measure(load, repeat, setup=widget.paramModel.clear)
+
+def sort():
+    for column in range(4):
+        widget.paramTable.sortByColumn(column, Qt.DescendingOrder)
+        widget.paramTable.sortByColumn(column, Qt.AscendingOrder)
+    app.processEvents()
+stages["gui table sort"] = measure(sort, repeat, 8)
+
+def remove_header():
+    if os.path.exists(file_name):
+        os.remove(file_name)
+# The synthetic entries are not in the catalog, the export is confirmed
+QMessageBox.question = lambda *args: QMessageBox.Yes
+stages["gui export"] = measure(widget.exportParameters, repeat, setup=remove_header)
+print(json.dumps(stages))
+"""
+
+
+def gui_stages(directory: str, n_groups: int, n_entries: int, repeat: int) -> Dict[str, dict]:
+    from benchmark_param_list import _gui_probe_prelude
+    from px4_fixtures import make_param_reference_html
+
+    gui_directory = os.path.join(directory, "gui")
+    os.makedirs(gui_directory)
+    with open(os.path.join(gui_directory, "page.html"), 'w', encoding="utf-8") as f:
+        f.write(make_param_reference_html(n_groups=n_groups))
+    probe = _gui_probe_prelude + "from PySide2.QtCore import Qt\n" + _gui_stages_probe
+    output = subprocess.run([sys.executable, "-c", probe, os.path.dirname(os.path.abspath(__file__)), str(repeat),
+                             str(n_entries)], capture_output=True, text=True, check=True, cwd=gui_directory,
+                            env=dict(os.environ, QT_QPA_PLATFORM="offscreen")).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+# ---------------------------- results ----------------------------
+def run_suite(groups=stage_groups, n_groups: int = 640, n_entries: int = 100000, repeat: int = 3) -> dict:
+    stages = dict()
+    with tempfile.TemporaryDirectory() as directory:
+        if "catalog" in groups:
+            stages.update(catalog_stages(directory, n_groups, repeat))
+        if "header" in groups:
+            stages.update(header_stages(directory, n_entries, repeat))
+        if "gui" in groups:
+            stages.update(gui_stages(directory, n_groups, n_entries, repeat))
+    return {"meta": run_metadata(n_groups, n_entries, repeat), "stages": stages}
+
+
+def run_metadata(n_groups: int, n_entries: int, repeat: int) -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {"date": datetime.now(timezone.utc).isoformat(timespec="seconds"), "commit": commit,
+            "python": platform.python_version(), "platform": platform.platform(), "cpu_count": os.cpu_count(),
+            "n_groups": n_groups, "n_entries": n_entries, "repeat": repeat}
+
+
+def format_stage(name: str, stage: dict) -> str:
+    line = f"{name}: {stage['wall_s'] * 1e3:.1f} ms"
+    if "per_operation_us" in stage:
+        line += f" ({stage['per_operation_us']:.0f} us per operation)"
+    line += (f", alloc peak {stage['alloc_peak_kib'] / 1024:.1f} MiB, retained "
+             f"{stage['alloc_retained_kib'] / 1024:.2f} MiB ({stage['blocks_retained']} blocks)")
+    if stage["rss_peak_kib"] is not None:
+        line += f", RSS peak +{stage['rss_peak_kib'] / 1024:.1f} MiB"
+    return line
+
+
+def compare(results: dict, baseline: dict, max_slowdown: float = None) -> List[str]:
+    # Prints the wall time and peak allocation ratios of each stage to the baseline, returns the stages slower than
+    # max_slowdown times the baseline
+    slower = []
+    print(f"compared with {baseline['meta'].get('commit') or 'baseline'} of {baseline['meta'].get('date')}:")
+    for name, stage in results["stages"].items():
+        base = baseline["stages"].get(name)
+        if base is None:
+            print(f"  {name}: new stage")
+            continue
+        wall_ratio = stage["wall_s"] / base["wall_s"] if base["wall_s"] > 0 else float("inf")
+        alloc_ratio = stage["alloc_peak_kib"] / base["alloc_peak_kib"] if base["alloc_peak_kib"] > 0 else 1.0
+        flag = ""
+        if max_slowdown is not None and wall_ratio > max_slowdown:
+            slower.append(name)
+            flag = "  <- slower"
+        print(f"  {name}: wall x{wall_ratio:.2f}, alloc peak x{alloc_ratio:.2f}{flag}")
+    return slower
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the catalog build, header I/O and GUI hot paths.")
+    parser.add_argument("-o", "--output", default=None, help="write the results to this JSON file")
+    parser.add_argument("--compare", default=None, help="JSON results of an earlier run to compare with")
+    parser.add_argument("--max-slowdown", type=float, default=None,
+                        help="exit with status 1 if a stage is more than this many times slower than --compare")
+    parser.add_argument("--stages", default=",".join(stage_groups),
+                        help=f"comma separated stage groups to run (default {','.join(stage_groups)})")
+    parser.add_argument("--groups", type=int, default=640,
+                        help="parameter groups of 25 parameters in the fixture page (default 640)")
+    parser.add_argument("--entries", type=int, default=100000, help="entries of the synthetic header (default 100000)")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per stage, the best is kept (default 3)")
+    args = parser.parse_args(argv)
+
+    groups = [group.strip() for group in args.stages.split(",") if group.strip()]
+    unknown = set(groups) - set(stage_groups)
+    if len(unknown) > 0:
+        parser.error(f"unknown stage group(s) {', '.join(sorted(unknown))}, expected {', '.join(stage_groups)}")
+    results = run_suite(groups, args.groups, args.entries, args.repeat)
+    for name, stage in results["stages"].items():
+        print(format_stage(name, stage))
+    if args.output is not None:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.compare is not None:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if len(compare(results, baseline, args.max_slowdown)) > 0:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,212 @@
+import argparse
+import sys
+from typing import Dict, List, Union
+
+import numpy as np
+import pandas as pd
+
+from columnar_catalog import ColumnarCatalog
+
+# Differences between the catalogs of PX4 releases, for moving the critical parameter list to a new release. The
+# catalogs are aligned by name with one index join and every column is compared at once with numpy:
+# - removed: the name is not in the new catalog
+# - renamed: a removed parameter whose Type and Description are found on exactly one added parameter, and the
+#   other way around, both names have the status. The Description is the only thing that survives a rename in the
+#   reference pages
+# - added: the name is only in the new catalog
+# - changed: Type, Min, Max, Incr or Default differ, missing values compare equal to each other
+# Entries of avy_parameter_check_list.h are affected when their parameter was removed, renamed or changed, or when
+# their value no longer fits the limits of the new catalog
+
+compared_columns = ("Type", "Min", "Max", "Incr", "Default")
+numeric_columns = ("Min", "Max", "Incr", "Default")
+
+status_unchanged = "unchanged"
+status_changed = "changed"
+status_added = "added"
+status_removed = "removed"
+status_renamed = "renamed"
+
+
+def catalog_frame(catalog: Union[pd.DataFrame, ColumnarCatalog]) -> pd.DataFrame:
+    # The columns the diff needs, indexed by name, from a catalog DataFrame or a ColumnarCatalog
+    frame = pd.DataFrame({column: catalog[column] for column in (*compared_columns, "Description")})
+    frame.index = pd.Index(catalog["Name"], dtype=object, name="Name")
+    return frame[~frame.index.duplicated()]
+
+
+def diff_catalogs(old: Union[pd.DataFrame, ColumnarCatalog], new: Union[pd.DataFrame, ColumnarCatalog]) -> pd.DataFrame:
+    # One row per name of either catalog, sorted by name: the status, the name a removed parameter was renamed to
+    # (renamed_from on the added side), a <column>_changed flag and the <column>_old and <column>_new values of
+    # every compared column
+    old = catalog_frame(old)
+    new = catalog_frame(new)
+    joined = old.join(new, how="outer", lsuffix="_old", rsuffix="_new", sort=True)
+    in_old = joined.index.isin(old.index)
+    in_new = joined.index.isin(new.index)
+    both = in_old & in_new
+
+    diff = pd.DataFrame(index=joined.index)
+    changed = np.zeros(len(joined), dtype=bool)
+    for column in compared_columns:
+        old_values = joined[column + "_old"].to_numpy()
+        new_values = joined[column + "_new"].to_numpy()
+        if column in numeric_columns:
+            old_values = old_values.astype(np.float64)
+            new_values = new_values.astype(np.float64)
+            same = (old_values == new_values) | (np.isnan(old_values) & np.isnan(new_values))
+        else:
+            old_missing = pd.isna(old_values)
+            new_missing = pd.isna(new_values)
+            same = (old_values == new_values) | (old_missing & new_missing)
+        column_changed = both & ~same
+        diff[column + "_changed"] = column_changed
+        diff[column + "_old"] = old_values
+        diff[column + "_new"] = new_values
+        changed |= column_changed
+
+    renamed_to = _renames(old[~old.index.isin(new.index)], new[~new.index.isin(old.index)])
+    diff["renamed_to"] = renamed_to.reindex(joined.index).to_numpy(dtype=object)
+    diff["renamed_from"] = pd.Series(renamed_to.index, index=renamed_to.to_numpy(), dtype=object) \
+        .reindex(joined.index).to_numpy(dtype=object)
+    is_renamed = (pd.notna(diff["renamed_to"]) | pd.notna(diff["renamed_from"])).to_numpy()
+    diff.insert(0, "status", np.select([is_renamed, ~in_new, ~in_old, changed],
+                                       [status_renamed, status_removed, status_added, status_changed],
+                                       status_unchanged))
+    return diff
+
+
+def _renames(removed: pd.DataFrame, added: pd.DataFrame) -> pd.Series:
+    # Removed name -> added name, for the pairs matched one to one by Type and Description
+    keys = ["Type", "Description"]
+    removed = removed[keys].dropna().reset_index()
+    added = added[keys].dropna().reset_index()
+    removed = removed[~removed.duplicated(keys, keep=False)]
+    added = added[~added.duplicated(keys, keep=False)]
+    pairs = removed.merge(added, on=keys, suffixes=("_old", "_new"))
+    return pd.Series(pairs["Name_new"].to_numpy(dtype=object), index=pd.Index(pairs["Name_old"], dtype=object),
+                     dtype=object)
+
+
+def diff_releases(catalogs: Dict[str, Union[pd.DataFrame, ColumnarCatalog]]) -> pd.DataFrame:
+    # Diffs of each release with the next one, in the order given, with the releases in the from and to columns.
+    # Unchanged parameters are left out
+    releases = list(catalogs)
+    diffs = []
+    for old_release, new_release in zip(releases[:-1], releases[1:]):
+        diff = diff_catalogs(catalogs[old_release], catalogs[new_release])
+        diff = diff[diff["status"] != status_unchanged]
+        diff.insert(0, "to", new_release)
+        diff.insert(0, "from", old_release)
+        diffs.append(diff)
+    if len(diffs) == 0:
+        return pd.DataFrame(columns=["from", "to", "status"])
+    return pd.concat(diffs)
+
+
+def affected_entries(diff: pd.DataFrame, critical_params: Dict[str, List]) -> pd.DataFrame:
+    # Header entries, in the format of read_critical_parameters, affected by a diff of diff_catalogs: one row per
+    # entry with the status of its parameter, the compared columns that changed and whether its required value or
+    # a finite range limit falls outside the new Min and Max. Entries of parameters in neither catalog are left to
+    # the validation against the catalog
+    names = list(critical_params)
+    # Required value in the first column, range limits in the second and third, NaN where there is none
+    values = np.full((len(names), 3), np.nan)
+    for row, specified in enumerate(critical_params.values()):
+        if len(specified) == 1:
+            values[row, 0] = _number(specified[0])
+        else:
+            values[row, 1:] = _number(specified[0]), _number(specified[1])
+    rows = diff.index.get_indexer(names)
+    known = rows >= 0
+    rows = np.where(known, rows, 0)
+
+    status = np.where(known, diff["status"].to_numpy(dtype=object)[rows], None)
+    low = np.where(known, diff["Min_new"].to_numpy(dtype=np.float64)[rows], np.nan)
+    high = np.where(known, diff["Max_new"].to_numpy(dtype=np.float64)[rows], np.nan)
+    # Comparisons with NaN are False: missing values and missing limits never fall outside
+    finite = np.isfinite(values)
+    out_of_range = (finite & ((values < low[:, None]) | (values > high[:, None]))).any(axis=1)
+    changes = np.stack([diff[column + "_changed"].to_numpy(dtype=bool)[rows] for column in compared_columns], axis=1)
+
+    affected = known & ((status != status_unchanged) | out_of_range)
+    columns = np.array(compared_columns, dtype=object)
+    result = pd.DataFrame({"status": status, "out_of_range": out_of_range,
+                           "renamed_to": np.where(known, diff["renamed_to"].to_numpy(dtype=object)[rows], None),
+                           "required": values[:, 0], "low": values[:, 1], "high": values[:, 2],
+                           "Min_new": low, "Max_new": high}, index=pd.Index(names, dtype=object, name="Name"))[affected]
+    result.insert(1, "changed", [", ".join(columns[row]) for row in changes[affected]])
+    return result
+
+
+def _number(value) -> float:
+    if isinstance(value, str):
+        value = value.strip()
+        if value.endswith("INFINITY"):
+            return -np.inf if value.startswith("-") else np.inf
+    return float(value)
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Compare the parameter catalogs of PX4 releases and list the "
+                                                 "critical parameters affected.")
+    parser.add_argument("releases", nargs="+",
+                        help="two or more releases in upgrade order: documentation versions (v1.9.0), URLs, "
+                             "local copies of the parameter reference page or the parameters.xml or "
+                             "parameters.json(.xz) of a PX4 build")
+    parser.add_argument("--header", default=None,
+                        help="critical parameter header to check against the last release (default: the one the "
+                             "GUI writes)")
+    parser.add_argument("--csv", default=None, help="write every difference to this CSV file")
+    parser.add_argument("--fail-on-affected", action="store_true",
+                        help="exit with status 1 if an entry of the header is affected")
+    args = parser.parse_args(argv)
+    if len(args.releases) < 2:
+        parser.error("at least two releases are needed")
+
+    from full_param_list_html_parser import load_release_catalogs
+    from load_critical_parameters import CriticalParameterFormatError, read_critical_parameters
+    catalogs, errors = load_release_catalogs(args.releases, columnar=True)
+    for release, error in errors.items():
+        print(f"error: {release} could not be loaded ({error})", file=sys.stderr)
+    if len(errors) > 0:
+        return 2
+
+    differences = diff_releases(catalogs)
+    for old_release, new_release in zip(args.releases[:-1], args.releases[1:]):
+        step = differences[(differences["from"] == old_release) & (differences["to"] == new_release)]
+        counts = step["status"].value_counts()
+        print(f"{old_release} -> {new_release}: " + ", ".join(
+            f"{counts.get(status, 0)} {status}" for status in (status_changed, status_renamed, status_removed,
+                                                              status_added)))
+    if args.csv is not None:
+        differences.to_csv(args.csv)
+
+    try:
+        critical_params = read_critical_parameters(args.header)
+    except CriticalParameterFormatError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+    # Changes across every step of the upgrade, the limits of the last release
+    affected = []
+    for release_pair, diff in differences.groupby(["from", "to"], sort=False):
+        entries = affected_entries(diff.drop(columns=["from", "to"]), critical_params)
+        entries.insert(0, "releases", " -> ".join(release_pair))
+        affected.append(entries)
+    last = affected_entries(diff_catalogs(catalogs[args.releases[-2]], catalogs[args.releases[-1]]), critical_params)
+    for name, entry in pd.concat(affected).iterrows() if len(affected) > 0 else []:
+        detail = entry["status"]
+        if entry["status"] == status_changed:
+            detail += f" ({entry['changed']})"
+        elif entry["status"] == status_renamed:
+            detail += f" to {entry['renamed_to']}"
+        print(f"{name}: {detail} in {entry['releases']}")
+    for name, entry in last[last["out_of_range"]].iterrows():
+        print(f"{name}: outside [{entry['Min_new']}, {entry['Max_new']}] in {args.releases[-1]}")
+    n_affected = len(set(name for entries in affected for name in entries.index) | set(last.index))
+    print(f"{n_affected} of {len(critical_params)} critical parameters affected")
+    return 1 if args.fail_on_affected and n_affected > 0 else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,241 @@
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from math import isnan
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from load_critical_parameters import CriticalParameterFormatError, file_name, read_critical_parameters
+
+# Checks the parameter dumps of a fleet of vehicles, as QGroundControl saves them (.params), against the critical
+# parameter header before flight day, without the vehicles. A dump is one parameter per line after # comments:
+#
+#   # Vehicle-Id Component-Id Name Value Type
+#   1	1	BAT_N_CELLS	4	6
+#
+# The entries are checked as avy_param_check.cpp checks them on the vehicle: a parameter missing from the dump
+# fails, a required value must be equal and a range includes its limits, -INFINITY and INFINITY leaving a side
+# unbounded. PX4 stores parameters as 32-bit values and the limits of the header as floats, so both sides are
+# compared in single precision: a dump written with more digits than the float holds is not a violation
+#
+# The header is parsed once by the parent process, the dumps are spread over a process pool and each is read line
+# by line, only the values of critical parameters are converted. Nothing here imports PySide2
+
+dump_extensions = (".params", ".txt")
+
+# Checks of the worker, set in the parent before the pool starts or by _init_worker
+_checks: Optional[Dict[str, Tuple[float, float, float]]] = None
+
+
+class DumpResult:
+
+    __slots__ = ("dump", "vehicles", "status", "parameters", "violations", "errors", "seconds", "worker")
+
+    # status is "compliant", "violations" when an entry of the header fails, or "error" when the dump could not be
+    # read. violations are [name, kind, value, expected] with kind "missing", "required" or "range"
+    def __init__(self, dump: str):
+        self.dump = dump
+        self.vehicles = []
+        self.status = "error"
+        self.parameters = 0
+        self.violations = []
+        self.errors = []
+        self.seconds = 0.0
+        self.worker = os.getpid()
+
+    def as_dict(self) -> dict:
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+
+def critical_checks(critical_params: Dict[str, List]) -> Dict[str, Tuple[float, float, float]]:
+    # Entries of read_critical_parameters as (required, low, high) rounded to single precision, required NaN for
+    # a range. Limits written -INFINITY or INFINITY are read as -inf and inf
+    checks = dict()
+    for name, specified in critical_params.items():
+        values = [_limit(value) for value in specified]
+        if len(values) == 1:
+            checks[name] = (values[0], -np.inf, np.inf)
+        else:
+            checks[name] = (np.nan, values[0], values[1])
+    return checks
+
+
+def _limit(value) -> float:
+    if isinstance(value, str) and value.strip().endswith("INFINITY"):
+        return -np.inf if value.strip().startswith("-") else np.inf
+    return float(np.float32(value))
+
+
+def check_lines(lines: Iterable[str], checks: Dict[str, Tuple[float, float, float]],
+                result: DumpResult) -> DumpResult:
+    # Fills result from the lines of a dump. A parameter listed more than once, by several components, is checked
+    # every time
+    seen = set()
+    vehicles = set()
+    float32 = np.float32
+    for number, line in enumerate(lines, 1):
+        fields = line.split()
+        if len(fields) != 5:
+            # Blank lines and comments are only looked at when the line is not a parameter
+            if len(fields) == 0 or fields[0][0] == "#":
+                continue
+            result.errors.append(f"{result.dump}:{number}: expected Vehicle-Id Component-Id Name Value Type, "
+                                 f"found {line.strip()[:40]!r}")
+            continue
+        result.parameters += 1
+        vehicles.add(fields[0])
+        check = checks.get(fields[2])
+        if check is None:
+            continue
+        name = fields[2]
+        seen.add(name)
+        try:
+            value = float(float32(fields[3]))
+        except ValueError:
+            result.errors.append(f"{result.dump}:{number}: the value {fields[3]!r} of {name} is not a number")
+            continue
+        required, low, high = check
+        if isnan(required):
+            # NaN falls outside every range, as on the vehicle
+            if not low <= value <= high:
+                result.violations.append([name, "range", value, [low, high]])
+        elif value != required:
+            result.violations.append([name, "required", value, required])
+    for name in checks.keys() - seen:
+        result.violations.append([name, "missing", None, None])
+    result.violations.sort(key=lambda violation: violation[0])
+    result.vehicles = sorted(vehicles, key=lambda vehicle: (len(vehicle), vehicle))
+    return result
+
+
+def check_dump(dump: str) -> DumpResult:
+    start = time.perf_counter()
+    result = DumpResult(dump)
+    try:
+        with open(dump, 'r', encoding="utf-8", errors="replace") as f:
+            check_lines(f, _checks, result)
+    except OSError as e:
+        result.errors.append(f"{dump}: {e}")
+    else:
+        if result.parameters == 0:
+            result.errors.append(f"{dump} has no parameters")
+        if len(result.errors) == 0:
+            result.status = "violations" if len(result.violations) > 0 else "compliant"
+    result.seconds = time.perf_counter() - start
+    return result
+
+
+def _init_worker(checks: Dict[str, Tuple[float, float, float]]):
+    global _checks
+    _checks = checks
+
+
+def check_dumps(dumps: List[str], critical_params: Dict[str, List], workers: int = None) -> Iterator[DumpResult]:
+    # Results of the dumps in the order given, yielded as they are ready so that a fleet can be reported while it
+    # is checked. The checks are built once and sent to each worker when it starts
+    checks = critical_checks(critical_params)
+    workers = min(workers or os.cpu_count() or 1, len(dumps))
+    if workers <= 1:
+        _init_worker(checks)
+        yield from map(check_dump, dumps)
+        return
+    with multiprocessing.Pool(workers, initializer=_init_worker, initargs=(checks,)) as pool:
+        # A few chunks per worker, each chunk is one round trip
+        yield from pool.imap(check_dump, dumps, chunksize=max(1, min(64, len(dumps) // (workers * 4))))
+
+
+def find_dumps(paths: List[str]) -> List[str]:
+    # Dump files, the dumps of a directory in name order
+    dumps = []
+    for path in paths:
+        if os.path.isdir(path):
+            dumps.extend(os.path.join(path, name) for name in sorted(os.listdir(path))
+                         if os.path.splitext(name)[1].lower() in dump_extensions)
+        else:
+            dumps.append(path)
+    return dumps
+
+
+def violation_text(name: str, kind: str, value: Optional[float], expected) -> str:
+    if kind == "missing":
+        return f"{name}: missing"
+    if kind == "required":
+        return f"{name}: {_number_text(value)}, required {_number_text(expected)}"
+    return f"{name}: {_number_text(value)} outside [{_number_text(expected[0])}, {_number_text(expected[1])}]"
+
+
+def _number_text(value: float) -> str:
+    # Shortest text that reads back as the same float, with the limits written as in the header
+    if np.isinf(value):
+        return "INFINITY" if value > 0 else "-INFINITY"
+    value = np.float32(value)
+    return str(int(value)) if value.is_integer() else np.format_float_positional(value, trim="-")
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Check vehicle parameter dumps (QGroundControl .params files) "
+                                                 "against the critical parameter header.")
+    parser.add_argument("dumps", nargs="+", help="dump files or directories of dumps (.params, .txt)")
+    parser.add_argument("--header", default=None,
+                        help=f"critical parameter header to check against (default {file_name})")
+    parser.add_argument("-j", "--jobs", type=int, default=None,
+                        help="number of worker processes (default: one per core)")
+    parser.add_argument("--report", default=None, help="write the per-vehicle results and the totals to a JSON file")
+    parser.add_argument("-q", "--quiet", action="store_true", help="only print the failing vehicles and the totals")
+    args = parser.parse_args(argv)
+
+    dumps = find_dumps(args.dumps)
+    if len(dumps) == 0:
+        print("error: no dump files found", file=sys.stderr)
+        return 2
+    try:
+        critical_params = read_critical_parameters(args.header)
+    except (OSError, CriticalParameterFormatError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+    if len(critical_params) == 0:
+        print(f"error: {args.header or file_name} has no critical parameters", file=sys.stderr)
+        return 2
+
+    workers = min(args.jobs or os.cpu_count() or 1, len(dumps))
+    start = time.perf_counter()
+    results = []
+    for result in check_dumps(dumps, critical_params, workers):
+        results.append(result)
+        for error in result.errors:
+            print(f"error: {error}", file=sys.stderr)
+        if result.status == "compliant" and args.quiet:
+            continue
+        vehicles = ", ".join(result.vehicles) or "?"
+        print(f"{result.dump} (vehicle {vehicles}): {result.status}, {len(result.violations)} violation(s) in "
+              f"{result.parameters} parameters")
+        for violation in result.violations:
+            print("  " + violation_text(*violation))
+    wall_seconds = time.perf_counter() - start
+
+    compliant = sum(result.status == "compliant" for result in results)
+    failed = sum(result.status == "violations" for result in results)
+    parameters = sum(result.parameters for result in results)
+    totals = {"dumps": len(results), "compliant": compliant, "violations": failed,
+              "errors": len(results) - compliant - failed, "entries": len(critical_params),
+              "parameters": parameters, "workers": workers, "wall_seconds": wall_seconds,
+              "dump_seconds": sum(result.seconds for result in results),
+              "dumps_per_second": len(results) / wall_seconds if wall_seconds > 0 else 0.0}
+    print(f"{compliant}/{len(results)} vehicles compliant, {failed} with violations, {totals['errors']} unreadable "
+          f"({len(critical_params)} critical parameters, {parameters} parameters read) in {wall_seconds:.2f} s with "
+          f"{workers} worker(s), {totals['dumps_per_second']:.0f} dumps/s")
+    if args.report is not None:
+        with open(args.report, 'w') as f:
+            json.dump({"totals": totals, "vehicles": [result.as_dict() for result in results]}, f, indent=2)
+
+    if totals["errors"] > 0:
+        return 2
+    return 0 if failed == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,287 @@
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import zlib
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Dict, List
+
+import numpy as np
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# On-disk layout of a catalog directory:
+#   <column>.npy                    float32 array of each numeric column, opened memory-mapped. float64 for the
+#                                   columns where more than a third of the values would need a patch
+#   <column>.patch_positions.npy    int32 positions of the values a float32 does not hold exactly (0.1, 0.01)
+#   <column>.patch_values.npy       float64 values at those positions
+#   Name.blob                       UTF-8 names, each one followed by a NUL byte
+#   Type.codes.npy                  uint8 index of the type of each parameter in the type categories of meta.json,
+#                                   the number of categories where the catalog had no type
+#   Description.blob                zlib-compressed blocks of description_block_size descriptions, each one followed
+#                                   by a NUL byte in its block
+#   Description.blocks.npy          int64 array of n_blocks + 1 offsets of the compressed blocks in the blob
+#   <column>.missing.npy            bool array of the Name and Description columns, True where the catalog had no
+#                                   value (NaN)
+#   meta.json                       format version, number of parameters, type categories and description block size
+# Names are decoded and interned when the catalog is opened, so that the catalogs of several releases share their
+# names. Descriptions are only decompressed when asked for, one block at a time, the last description_cache_blocks
+# blocks stay decompressed. Opening and reading a catalog only needs numpy, pandas is imported when a column is
+# asked for as a Series
+#
+# Memory footprint of an open catalog, see ColumnarCatalog.memory_footprint, per parameter:
+# - name: the str (49 bytes + its length), a list slot and a dict entry, about 115 bytes, the str shared between
+#   catalogs
+# - type: 1 byte
+# - Min, Max, Incr and Default: 4 bytes each and 12 more per value held as a float64 patch, 8 in a float64 column
+# - description: its compressed size, about a fifth of the text, and the decompressed blocks of the cache
+# About 180 bytes of private memory per parameter for the catalogs of several releases, against 450 for the
+# unpickled DataFrames of build_param_df (bench_catalog_memory)
+
+numeric_columns = ["Min", "Max", "Incr", "Default"]
+columnar_format_version = 2
+description_block_size = 64
+description_cache_blocks = 8
+
+
+def write_columnar_catalog(param_data_df: "pd.DataFrame", directory: str):
+    # A catalog of the current format already at directory is kept, readers may have it open. It holds the same
+    # catalog, written by an earlier build or by a concurrent writer: the cache names the directory after the source
+    # and the hash of its content. The catalog is written to a temporary directory of its own and renamed in place
+    if _is_current(directory):
+        return
+    parent, name = os.path.split(os.path.abspath(directory))
+    os.makedirs(parent, exist_ok=True)
+    tmp_directory = tempfile.mkdtemp(prefix=f".{name}.", suffix=".tmp", dir=parent)
+    try:
+        _write_columns(param_data_df, tmp_directory)
+        try:
+            os.replace(tmp_directory, directory)
+            return
+        except OSError:
+            if _is_current(directory):
+                return
+        # A catalog of another format version, moved aside first as a directory is only renamed over an empty one
+        stale_directory = tmp_directory + ".stale"
+        os.replace(directory, stale_directory)
+        shutil.rmtree(stale_directory, ignore_errors=True)
+        os.replace(tmp_directory, directory)
+    finally:
+        shutil.rmtree(tmp_directory, ignore_errors=True)
+
+
+def _is_current(directory: str) -> bool:
+    # meta.json is written last, a directory that has it was renamed in place whole
+    try:
+        with open(os.path.join(directory, "meta.json"), 'r') as f:
+            return json.load(f).get("version") == columnar_format_version
+    except (OSError, ValueError):
+        return False
+
+
+def _write_columns(param_data_df: "pd.DataFrame", tmp_directory: str):
+    for column in numeric_columns:
+        values = param_data_df[column].to_numpy(dtype=np.float64)
+        with np.errstate(over="ignore"):
+            singles = values.astype(np.float32)
+        patched = np.flatnonzero((singles != values) & ~np.isnan(values)).astype(np.int32)
+        # A patch costs 12 bytes, past a third of the values float64 is smaller
+        if 3 * len(patched) > len(values):
+            singles = values
+            patched = patched[:0]
+        np.save(os.path.join(tmp_directory, column + ".npy"), singles)
+        np.save(os.path.join(tmp_directory, column + ".patch_positions.npy"), patched)
+        np.save(os.path.join(tmp_directory, column + ".patch_values.npy"), values[patched])
+
+    names, missing = _encoded_strings(param_data_df["Name"])
+    with open(os.path.join(tmp_directory, "Name.blob"), 'wb') as f:
+        f.write(b"".join(names))
+    np.save(os.path.join(tmp_directory, "Name.missing.npy"), missing)
+
+    types = param_data_df["Type"]
+    type_missing = types.isna().to_numpy()
+    categories = sorted(set(types[~type_missing]))
+    if len(categories) >= 255:
+        raise ValueError(f"A catalog holds at most 254 parameter types, found {len(categories)}")
+    codes = np.full(len(types), len(categories), dtype=np.uint8)
+    codes[~type_missing] = [categories.index(value) for value in types[~type_missing]]
+    np.save(os.path.join(tmp_directory, "Type.codes.npy"), codes)
+
+    descriptions, missing = _encoded_strings(param_data_df["Description"])
+    blocks = [zlib.compress(b"".join(descriptions[start:start + description_block_size]))
+              for start in range(0, len(descriptions), description_block_size)]
+    block_offsets = np.zeros(len(blocks) + 1, dtype=np.int64)
+    np.cumsum([len(block) for block in blocks], out=block_offsets[1:])
+    with open(os.path.join(tmp_directory, "Description.blob"), 'wb') as f:
+        f.write(b"".join(blocks))
+    np.save(os.path.join(tmp_directory, "Description.blocks.npy"), block_offsets)
+    np.save(os.path.join(tmp_directory, "Description.missing.npy"), missing)
+
+    with open(os.path.join(tmp_directory, "meta.json"), 'w') as f:
+        json.dump({"version": columnar_format_version, "n_params": len(param_data_df),
+                   "type_categories": [str(category) for category in categories],
+                   "description_block_size": description_block_size}, f)
+
+
+def _encoded_strings(series: "pd.Series") -> (List[bytes], np.ndarray):
+    missing = series.isna().to_numpy()
+    return [b"\0" if is_missing else str(value).replace("\0", "").encode("utf-8") + b"\0"
+            for value, is_missing in zip(series, missing)], missing
+
+
+class _CatalogLocIndexer:
+    # catalog.loc[name, column], the only kind of .loc access the GUI makes on a catalog DataFrame
+
+    def __init__(self, catalog: "ColumnarCatalog"):
+        self._catalog = catalog
+
+    def __getitem__(self, key):
+        name, column = key
+        return self._catalog.value(self._catalog.position(name), column)
+
+
+class ColumnarCatalog:
+    # Read-only catalog opened from a directory written by write_columnar_catalog. It answers the same
+    # catalog[column] and catalog.loc[name, column] lookups as the DataFrame built by build_param_df, Type comes
+    # as a categorical Series
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        with open(os.path.join(directory, "meta.json"), 'r') as f:
+            meta = json.load(f)
+        if meta["version"] != columnar_format_version:
+            raise ValueError(f"Unsupported columnar catalog version {meta['version']}")
+        self.n_params = meta["n_params"]
+
+        self._numeric = {column: np.load(os.path.join(directory, column + ".npy"), mmap_mode='r')
+                         for column in numeric_columns}
+        self._patch_positions = {column: np.load(os.path.join(directory, column + ".patch_positions.npy"))
+                                 for column in numeric_columns}
+        self._patch_values = {column: np.load(os.path.join(directory, column + ".patch_values.npy"))
+                              for column in numeric_columns}
+
+        self._type_categories = [sys.intern(category) for category in meta["type_categories"]]
+        # The code past the last category is a missing type
+        self._type_values = [*self._type_categories, np.nan]
+        self._type_codes = np.load(os.path.join(directory, "Type.codes.npy"))
+
+        self._missing = {column: np.load(os.path.join(directory, column + ".missing.npy"))
+                         for column in ("Name", "Description")}
+        with open(os.path.join(directory, "Name.blob"), 'rb') as f:
+            self._names = self._decode_names(f.read())
+        self._positions = {name: position for position, name in enumerate(self._names)}
+
+        self._block_size = meta["description_block_size"]
+        self._block_offsets = np.load(os.path.join(directory, "Description.blocks.npy"))
+        with open(os.path.join(directory, "Description.blob"), 'rb') as f:
+            self._compressed_descriptions = f.read()
+        self._description_blocks = OrderedDict()
+        # The cache is shared by the threads reading descriptions
+        self._description_lock = threading.Lock()
+
+        self._series = dict()
+        self.loc = _CatalogLocIndexer(self)
+
+    def _decode_names(self, blob: bytes) -> List[str]:
+        # Decoding the blob at once and splitting it on the separators is much faster than slicing every string
+        names = [sys.intern(name) for name in blob.decode("utf-8").split("\0")[:-1]]
+        for position in np.flatnonzero(self._missing["Name"]):
+            names[position] = np.nan
+        return names
+
+    def _decoded_block(self, block: int) -> List[str]:
+        start, end = self._block_offsets[block], self._block_offsets[block + 1]
+        return zlib.decompress(self._compressed_descriptions[start:end]).decode("utf-8").split("\0")[:-1]
+
+    def _description_block(self, block: int) -> List[str]:
+        with self._description_lock:
+            descriptions = self._description_blocks.get(block)
+            if descriptions is not None:
+                self._description_blocks.move_to_end(block)
+                return descriptions
+        descriptions = self._decoded_block(block)
+        with self._description_lock:
+            self._description_blocks[block] = descriptions
+            while len(self._description_blocks) > description_cache_blocks:
+                self._description_blocks.popitem(last=False)
+        return descriptions
+
+    def __len__(self) -> int:
+        return self.n_params
+
+    def position(self, name: str) -> int:
+        return self._positions[name]
+
+    def value(self, position: int, column: str):
+        if column in self._numeric:
+            patch_positions = self._patch_positions[column]
+            patch = np.searchsorted(patch_positions, position)
+            if patch < len(patch_positions) and patch_positions[patch] == position:
+                return float(self._patch_values[column][patch])
+            return float(self._numeric[column][position])
+        if column == "Name":
+            return self._names[position]
+        if column == "Type":
+            return self._type_values[self._type_codes[position]]
+        if self._missing[column][position]:
+            return np.nan
+        return self._description_block(position // self._block_size)[position % self._block_size]
+
+    def column(self, column: str) -> np.ndarray:
+        # Whole column as an array, without the pandas Series of catalog[column]
+        if column in self._numeric:
+            values = self._numeric[column].astype(np.float64)
+            values[self._patch_positions[column]] = self._patch_values[column]
+            return values
+        if column == "Name":
+            return np.array(self._names, dtype=object)
+        if column == "Type":
+            return np.array(self._type_values, dtype=object)[self._type_codes]
+        # The whole column is decompressed without going through the cache of single descriptions
+        values = np.array([description for block in range(len(self._block_offsets) - 1)
+                           for description in self._decoded_block(block)], dtype=object)
+        values[self._missing[column]] = np.nan
+        return values
+
+    def __getitem__(self, column: str) -> "pd.Series":
+        # Whole columns are materialised on first access, like the DataFrame they are indexed by name
+        if column not in self._series:
+            import pandas as pd
+            index = pd.Index(self._names, dtype=object, name="Name")
+            if column == "Type":
+                codes = np.where(self._type_codes < len(self._type_categories), self._type_codes, -1)
+                values = pd.Categorical.from_codes(codes, self._type_categories)
+                self._series[column] = pd.Series(values, index=index, name=column)
+            else:
+                values = self.column(column)
+                self._series[column] = pd.Series(values, index=index, name=column, dtype=values.dtype)
+        return self._series[column]
+
+    def to_frame(self) -> "pd.DataFrame":
+        import pandas as pd
+        return pd.DataFrame({column: self[column] for column in ("Name", "Type", *numeric_columns, "Description")})
+
+    def memory_footprint(self) -> Dict[str, int]:
+        # Bytes held by the open catalog, by part. The names are counted whole even when they are shared with the
+        # catalogs of other releases, the Series of catalog[column] are not counted
+        with self._description_lock:
+            cached = list(self._description_blocks.values())
+        return {"names": sys.getsizeof(self._names) + sys.getsizeof(self._positions)
+                + sum(sys.getsizeof(name) for name in self._names),
+                "types": self._type_codes.nbytes + sum(sys.getsizeof(value) for value in self._type_categories),
+                "numeric": sum(self._numeric[column].nbytes + self._patch_positions[column].nbytes
+                               + self._patch_values[column].nbytes for column in numeric_columns),
+                "descriptions": len(self._compressed_descriptions) + self._block_offsets.nbytes
+                + self._missing["Description"].nbytes,
+                "description_cache": sum(sys.getsizeof(descriptions) + sum(sys.getsizeof(text) for text in descriptions)
+                                         for descriptions in cached)}
+
+
+def catalog_column(catalog, column: str) -> np.ndarray:
+    # Whole column of a catalog DataFrame or ColumnarCatalog as an array, without pandas for a ColumnarCatalog
+    if isinstance(catalog, ColumnarCatalog):
+        return catalog.column(column)
+    return catalog[column].to_numpy()
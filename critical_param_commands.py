@@ -0,0 +1,57 @@
+from typing import Iterable, List
+
+import numpy as np
+from PySide2.QtWidgets import QUndoCommand
+
+from critical_param_model import CriticalParamModel
+
+# Undoable edits of the critical parameter table, pushed on the QUndoStack of ParamWidget. A command keeps only the
+# rows it changes, as the names, (n, 3) values and integer flags CriticalParamModel.entries returns, never a copy of
+# the whole table. Several rows are applied with one model reset, whatever their number
+
+
+class SetEntriesCommand(QUndoCommand):
+    # Rows added, or overwriting the rows with the same name: one entry typed in the line edits or a whole header
+    # imported. Undo removes the added rows and puts back the rows they overwrote
+
+    def __init__(self, model: CriticalParamModel, names: List[str], values: np.ndarray, isInt: np.ndarray,
+                 text: str):
+        super(SetEntriesCommand, self).__init__(text)
+        self.model = model
+        self.rows = (list(names), values, isInt)
+        self.replaced = model.entries(row for row in map(model.rowOf, names) if row != -1)
+
+    def redo(self):
+        self.model.setEntries(*self.rows)
+
+    def undo(self):
+        self.model.removeNames(self.rows[0])
+        self.model.setEntries(*self.replaced)
+
+    def nbytes(self) -> int:
+        return _nbytes(self.rows) + _nbytes(self.replaced)
+
+
+class RemoveEntriesCommand(QUndoCommand):
+    # Rows removed, a selection or the whole table for Clear All. Undo puts them back
+
+    def __init__(self, model: CriticalParamModel, rows: Iterable[int], text: str):
+        super(RemoveEntriesCommand, self).__init__(text)
+        self.model = model
+        self.removed = model.entries(sorted(set(rows)))
+
+    def redo(self):
+        self.model.removeNames(self.removed[0])
+
+    def undo(self):
+        self.model.setEntries(*self.removed)
+
+    def nbytes(self) -> int:
+        return _nbytes(self.removed)
+
+
+def _nbytes(rows) -> int:
+    # Memory of the arrays and of the list of names, the name strings are shared with the table while their rows
+    # are in it
+    names, values, isInt = rows
+    return values.nbytes + isInt.nbytes + 8 * len(names)
@@ -0,0 +1,372 @@
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+from PySide2.QtCore import QAbstractTableModel, QModelIndex, QSortFilterProxyModel, Qt, Signal
+from PySide2.QtGui import QColor
+
+from param_records import ParamBounds, check_entries, describe_invalid, to_numeric
+
+
+def parse_value(text) -> Tuple[float, bool]:
+    # Value of a table cell as (number, is_int), NaN for an empty cell. Texts come from the line edits or from
+    # criticalParameters, where an unbounded range limit is written -INFINITY or INFINITY
+    if text is None:
+        return np.nan, False
+    if not isinstance(text, str):
+        return float(text), isinstance(text, int)
+    text = text.strip()
+    if len(text.strip(" -")) == 0 or text.endswith("INFINITY"):
+        return np.nan, False
+    num = to_numeric(text)
+    return float(num), isinstance(num, int)
+
+
+def parse_values(texts: List) -> Tuple[np.ndarray, np.ndarray]:
+    # parse_value over a column of texts, with "" for empty cells. The whole column is converted by numpy, whose
+    # float cast skips whitespace and reads +-INFINITY as +-inf. Integers are the finite values written without a
+    # decimal point or an exponent
+    texts = np.array(texts, dtype=str)
+    values = np.where(texts == "", "nan", texts).astype(np.float64)
+    codes = texts.view(np.uint32).reshape(len(texts), texts.itemsize // 4)
+    isInt = np.isfinite(values) & ~np.isin(codes, _nonIntCodes).any(axis=1)
+    values[~np.isfinite(values)] = np.nan
+    return values, isInt
+
+
+def number_values(numbers: List) -> Tuple[np.ndarray, np.ndarray]:
+    # parse_values over a column of values read as numbers, with None for empty cells and +-inf for unbounded range
+    # limits
+    values = np.array([np.nan if number is None else number for number in numbers], dtype=np.float64)
+    isInt = np.array([type(number) is int for number in numbers], dtype=bool)
+    values[~np.isfinite(values)] = np.nan
+    return values, isInt
+
+
+def parse_entry(required, low=None, high=None) -> Tuple[np.ndarray, np.ndarray]:
+    # Values and integer flags of one row from the texts of the line edits
+    parsed = [parse_value(text) for text in (required, low, high)]
+    values = np.array([value for value, _ in parsed], dtype=np.float64)
+    isInt = np.array([is_int for _, is_int in parsed], dtype=bool)
+    return values, isInt
+
+
+def parse_entries(entries: Dict[str, List]) -> Tuple[List[str], np.ndarray, np.ndarray]:
+    # Names, (n, 3) values and integer flags of entries in the format of read_critical_parameters: one value is a
+    # required value, two are a range. Values are numbers, or texts as typed in the line edits
+    names = list(entries)
+    columns = ([], [], [])
+    for specifiedValues in entries.values():
+        if len(specifiedValues) == 1:
+            cells = (specifiedValues[0], None, None)
+        else:
+            cells = (None, specifiedValues[0], specifiedValues[1])
+        for column, cell in zip(columns, cells):
+            column.append(cell)
+    parsed = [parse_values(["" if cell is None else cell for cell in column])
+              if any(isinstance(cell, str) for cell in column) else number_values(column) for column in columns]
+    values = np.stack([value for value, _ in parsed], axis=1).reshape(-1, 3)
+    isInt = np.stack([is_int for _, is_int in parsed], axis=1).reshape(-1, 3)
+    return names, values, isInt
+
+
+# Code points of the characters that make a number a float
+_nonIntCodes = np.array([ord(c) for c in ".eEnN"], dtype=np.uint32)
+
+
+class CriticalParamModel(QAbstractTableModel):
+    # Critical parameter table stored column by column: the names in a list, the required value and the range
+    # limits in an (n, 3) float64 array with NaN for empty cells, and an (n, 3) bool array telling which values
+    # were entered as integers so that they are shown and exported as they were typed. Rows are kept in display
+    # order, sort() reorders the columns with numpy and bulk changes are applied with a single model reset.
+    # Every cell also has the invalid_* flags of check_entries against the catalog bounds, in an (n, 4) uint8
+    # array updated with the rows, so that invalid rows are highlighted whatever added them
+
+    headers = ["Parameter Name", "Required", "Minimum", "Maximum"]
+    invalidRowColor = QColor("MistyRose")
+    invalidCellColor = QColor("Salmon")
+
+    # Number of invalid rows, emitted whenever it may have changed
+    invalidCountChanged = Signal(int)
+    # Removals of more runs of contiguous rows than this reset the model instead of removing each run
+    removalRunLimit = 16
+
+    def __init__(self, parent=None):
+        super(CriticalParamModel, self).__init__(parent)
+        self._names = []
+        self._values = np.empty((0, 3), dtype=np.float64)
+        self._isInt = np.empty((0, 3), dtype=bool)
+        self._invalid = np.empty((0, 4), dtype=np.uint8)
+        self._bounds = None
+        self._sortColumn = -1
+        self._sortOrder = Qt.AscendingOrder
+        # Parameter name -> row, rebuilt on the first lookup after the rows moved
+        self._rows = None
+
+    # ---------------- QAbstractTableModel --------------
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._names)
+
+    def columnCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.headers)
+
+    def data(self, index: QModelIndex, role: int = Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        if role == Qt.DisplayRole:
+            return self.text(index.row(), index.column())
+        if role == Qt.BackgroundRole and self._invalid[index.row()].any():
+            return self.invalidCellColor if self._invalid[index.row(), index.column()] else self.invalidRowColor
+        if role == Qt.ToolTipRole and self._invalid[index.row()].any():
+            return self.invalidText(index.row())
+        return None
+
+    def headerData(self, section: int, orientation: Qt.Orientation, role: int = Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.headers[section]
+        return super(CriticalParamModel, self).headerData(section, orientation, role)
+
+    def sort(self, column: int, order: Qt.SortOrder = Qt.AscendingOrder):
+        self._sortColumn = column
+        self._sortOrder = order
+        if column < 0 or len(self._names) < 2:
+            return
+        self.layoutAboutToBeChanged.emit()
+        permutation = self._sortPermutation(column, order)
+        oldIndexes = self.persistentIndexList()
+        self._applyPermutation(permutation)
+        newRows = np.empty_like(permutation)
+        newRows[permutation] = np.arange(len(permutation))
+        self.changePersistentIndexList(oldIndexes, [self.index(int(newRows[index.row()]), index.column())
+                                                    for index in oldIndexes])
+        self.layoutChanged.emit()
+
+    # ------------------- Row access --------------------
+    def text(self, row: int, column: int) -> str:
+        if column == 0:
+            return self._names[row]
+        value = self._values[row, column - 1]
+        if np.isnan(value):
+            return ""
+        return f"{int(value)}" if self._isInt[row, column - 1] else f"{value}"
+
+    def name(self, row: int) -> str:
+        return self._names[row]
+
+    def names(self) -> List[str]:
+        return list(self._names)
+
+    def rowOf(self, parameterName: str) -> int:
+        if self._rows is None:
+            self._rows = {name: row for row, name in enumerate(self._names)}
+        return self._rows.get(parameterName, -1)
+
+    # -------------------- Validation -------------------
+    def setBounds(self, bounds: ParamBounds) -> int:
+        # Catalog the rows are checked against, None for the validator defaults. Returns the number of invalid rows
+        self._bounds = bounds
+        return self.validate()
+
+    def validate(self) -> int:
+        # Checks every row in one pass, returns the number of invalid rows
+        self._invalid = check_entries(self._bounds, self._names, self._values)
+        if len(self._names) > 0:
+            self.dataChanged.emit(self.index(0, 0), self.index(len(self._names) - 1, len(self.headers) - 1),
+                                  [Qt.BackgroundRole, Qt.ToolTipRole])
+        return self._emitInvalidCount()
+
+    def invalidRows(self) -> np.ndarray:
+        return np.flatnonzero(self._invalid.any(axis=1))
+
+    def invalidText(self, row: int) -> str:
+        # What is wrong with a row, cell by cell
+        cells = zip(self.headers, self._invalid[row])
+        return "; ".join(f"{header}: {describe_invalid(int(flags))}" for header, flags in cells if flags)
+
+    def _emitInvalidCount(self) -> int:
+        invalidCount = int(self._invalid.any(axis=1).sum())
+        self.invalidCountChanged.emit(invalidCount)
+        return invalidCount
+
+    # -------------------- Mutations --------------------
+    def setEntry(self, parameterName: str, required, low=None, high=None) -> int:
+        # Add a parameter at its sorted position, or overwrite its row if it is already in the table
+        return self._setRow(parameterName, *parse_entry(required, low, high))
+
+    def setEntries(self, names: List[str], values: np.ndarray, isInt: np.ndarray):
+        # Rows as returned by entries(), added or overwriting the rows with the same name. A single row is inserted
+        # at its sorted position, more are applied with one model reset
+        if len(names) == 1:
+            self._setRow(names[0], values[0], isInt[0])
+        elif len(names) > 1:
+            self._replaceRows(list(names), values, isInt)
+
+    def removeNames(self, names: Iterable[str]):
+        rows = [row for row in map(self.rowOf, names) if row != -1]
+        if len(rows) == len(self._names):
+            self.clear()
+        else:
+            self.removeEntries(rows)
+
+    def _setRow(self, parameterName: str, values: np.ndarray, isInt: np.ndarray) -> int:
+        existingRow = self.rowOf(parameterName)
+        if existingRow != -1:
+            self.removeEntries([existingRow])
+        row = self._insertPosition(parameterName, values)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self._names.insert(row, parameterName)
+        self._values = np.insert(self._values, row, values, axis=0)
+        self._isInt = np.insert(self._isInt, row, isInt, axis=0)
+        self._invalid = np.insert(self._invalid, row, check_entries(self._bounds, [parameterName], values[None]),
+                                  axis=0)
+        self._rows = None
+        self.endInsertRows()
+        self._emitInvalidCount()
+        return row
+
+    def removeEntries(self, rows: Iterable[int]):
+        # Contiguous runs of rows are removed together, starting from the bottom so the other rows do not move.
+        # Beyond removalRunLimit runs the rows are removed with one model reset
+        rows = sorted(set(rows), reverse=True)
+        runs = []
+        for row in rows:
+            if len(runs) > 0 and runs[-1][0] == row + 1:
+                runs[-1][0] = row
+            else:
+                runs.append([row, row])
+        if len(runs) > self.removalRunLimit:
+            keep = np.ones(len(self._names), dtype=bool)
+            keep[rows] = False
+            self.beginResetModel()
+            self._names = [name for name, kept in zip(self._names, keep) if kept]
+            self._values = self._values[keep]
+            self._isInt = self._isInt[keep]
+            self._invalid = self._invalid[keep]
+            self._rows = None
+            self.endResetModel()
+            self._emitInvalidCount()
+            return
+        for first, last in runs:
+            self.beginRemoveRows(QModelIndex(), first, last)
+            del self._names[first:last + 1]
+            self._values = np.delete(self._values, np.s_[first:last + 1], axis=0)
+            self._isInt = np.delete(self._isInt, np.s_[first:last + 1], axis=0)
+            self._invalid = np.delete(self._invalid, np.s_[first:last + 1], axis=0)
+            self._rows = None
+            self.endRemoveRows()
+        if len(runs) > 0:
+            self._emitInvalidCount()
+
+    def clear(self):
+        self.beginResetModel()
+        self._names = []
+        self._values = np.empty((0, 3), dtype=np.float64)
+        self._isInt = np.empty((0, 3), dtype=bool)
+        self._invalid = np.empty((0, 4), dtype=np.uint8)
+        self._rows = None
+        self.endResetModel()
+        self._emitInvalidCount()
+
+    def loadEntries(self, entries: Dict[str, List]):
+        # Bulk load in the format of read_critical_parameters. Loaded parameters replace the rows with the same name,
+        # the table is reset once and the new rows are checked in one pass
+        self._replaceRows(*parse_entries(entries))
+
+    def entries(self, rows: Iterable[int]) -> Tuple[List[str], np.ndarray, np.ndarray]:
+        # Names, values and integer flags of rows, a copy that setEntries takes back
+        rows = np.fromiter(rows, dtype=np.int64)
+        return [self._names[row] for row in rows], self._values[rows], self._isInt[rows]
+
+    def _replaceRows(self, names: List[str], values: np.ndarray, isInt: np.ndarray):
+        entries = set(names)
+        self.beginResetModel()
+        keep = np.array([name not in entries for name in self._names], dtype=bool)
+        self._names = [name for name, kept in zip(self._names, keep) if kept] + names
+        self._values = np.concatenate([self._values[keep], values])
+        self._isInt = np.concatenate([self._isInt[keep], isInt])
+        self._invalid = np.concatenate([self._invalid[keep], check_entries(self._bounds, names, values)])
+        if self._sortColumn != -1:
+            self._applyPermutation(self._sortPermutation(self._sortColumn, self._sortOrder))
+        self._rows = None
+        self.endResetModel()
+        self._emitInvalidCount()
+
+    def criticalParameters(self) -> Dict[str, List]:
+        # Rows in display order in the format of write_critical_parameters: the required value if there is one,
+        # otherwise the range with -INFINITY/INFINITY for the unbounded limits
+        critParams = dict()
+        for row, parameterName in enumerate(self._names):
+            values = self._values[row]
+            isInt = self._isInt[row]
+            numbers = [int(value) if is_int else float(value) for value, is_int in zip(values, isInt)]
+            if not np.isnan(values[0]):
+                critParams[parameterName] = [numbers[0]]
+            else:
+                critParams[parameterName] = ["-INFINITY" if np.isnan(values[1]) else numbers[1],
+                                             "INFINITY" if np.isnan(values[2]) else numbers[2]]
+        return critParams
+
+    # --------------------- Sorting ---------------------
+    def sortColumn(self) -> int:
+        return self._sortColumn
+
+    def sortOrder(self) -> Qt.SortOrder:
+        return self._sortOrder
+
+    def sortKey(self, row: int):
+        if self._sortColumn == 0:
+            return self._names[row]
+        value = self._values[row, self._sortColumn - 1]
+        # Empty cells sort before any value, as empty texts did in the QTableWidget
+        return -np.inf if np.isnan(value) else value
+
+    def _insertPosition(self, parameterName: str, values: np.ndarray) -> int:
+        if self._sortColumn == -1:
+            return len(self._names)
+        if self._sortColumn == 0:
+            key = parameterName
+        else:
+            key = -np.inf if np.isnan(values[self._sortColumn - 1]) else values[self._sortColumn - 1]
+        # Binary search for the first row that sorts after the new one
+        low, high = 0, len(self._names)
+        while low < high:
+            middle = (low + high) // 2
+            rowKey = self.sortKey(middle)
+            after = rowKey > key if self._sortOrder == Qt.AscendingOrder else rowKey < key
+            if after:
+                high = middle
+            else:
+                low = middle + 1
+        return low
+
+    def _sortPermutation(self, column: int, order: Qt.SortOrder) -> np.ndarray:
+        if column == 0:
+            keys = np.array(self._names, dtype=str)
+        else:
+            keys = self._values[:, column - 1]
+            keys = np.where(np.isnan(keys), -np.inf, keys)
+        permutation = np.argsort(keys, kind="stable")
+        if order == Qt.DescendingOrder:
+            permutation = permutation[::-1]
+        return permutation
+
+    def _applyPermutation(self, permutation: np.ndarray):
+        self._names = [self._names[row] for row in permutation]
+        self._values = self._values[permutation]
+        self._isInt = self._isInt[permutation]
+        self._invalid = self._invalid[permutation]
+        self._rows = None
+
+
+class CriticalParamProxyModel(QSortFilterProxyModel):
+    # Sorting is delegated to CriticalParamModel, which reorders its columns with numpy. The proxy's own sort calls
+    # data() back into Python for every comparison, several seconds for 100k rows, so the proxy keeps the order of
+    # the source model and only maps rows between the view and the model
+
+    def sort(self, column: int, order: Qt.SortOrder = Qt.AscendingOrder):
+        self.sourceModel().sort(column, order)
+
+    def sourceRow(self, proxyRow: int) -> int:
+        return self.mapToSource(self.index(proxyRow, 0)).row()
+
+    def sourceRows(self, proxyIndexes: Iterable[QModelIndex]) -> List[int]:
+        return [self.mapToSource(index).row() for index in proxyIndexes]
@@ -1,67 +1,94 @@
 import os
-import pickle
-from typing import Iterator
+import re
+import time
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
-import pandas as pd
-import requests
-from bs4 import BeautifulSoup, element
 from numpy import nan
 
+from columnar_catalog import ColumnarCatalog
+from instrumentation import span
+from param_catalog_cache import CatalogCache, content_hash, file_hash
+from param_metadata import is_metadata_file
 
-def parse_url(url: str) -> Iterator[pd.DataFrame]:
-    response = requests.get(url)
-    soup = BeautifulSoup(response.text, 'lxml')
-    return (parse_html_table(table) for table in soup.find_all('table'))
+# Opening a cached catalog only needs numpy. lxml and pandas are imported when a catalog is built, requests when a
+# page is downloaded, so that the GUI does not pay for them at every start
+if TYPE_CHECKING:
+    import lxml.html
+    import pandas as pd
+    from px4_release_fetcher import FetchResult, ReleaseFetcher
 
 
-def parse_html_table(table: element.Tag) -> pd.DataFrame:
-    n_columns = 0
-    n_rows = 0
-    column_names = []
+def parse_url(url: str) -> Iterator["pd.DataFrame"]:
+    return parse_html(read_source(url))
+
+
+def parse_html(html: str) -> Iterator["pd.DataFrame"]:
+    # lxml is used directly, building a BeautifulSoup tree of the whole page costs more than parsing the tables
+    import lxml.html
+    with span("catalog.parse.document"):
+        document = lxml.html.document_fromstring(html)
+    return (parse_html_table(table) for table in document.iter('table'))
+
 
-    # Find number of rows and columns
-    # we also find the column titles if we can
-    for row in table.find_all('tr'):
+def cell_text(cell: "lxml.html.HtmlElement") -> str:
+    # Same text as BeautifulSoup's get_text(), which collapses whitespace-only strings to a single newline or space
+    return "".join(("\n" if "\n" in text else " ") if len(text.strip(_ascii_whitespace)) == 0 else text
+                   for text in cell.itertext())
 
-        # Determine the number of rows in the table
-        td_tags = row.find_all('td')
-        if len(td_tags) > 0:
-            n_rows += 1
-            if n_columns == 0:
-                # Set the number of columns for our table
-                n_columns = len(td_tags)
 
-        # Handle column names if we find them
-        th_tags = row.find_all('th')
-        if len(th_tags) > 0 and len(column_names) == 0:
-            for th in th_tags:
-                column_names.append(th.get_text())
+def parse_html_table(table: "lxml.html.HtmlElement") -> "pd.DataFrame":
+    import pandas as pd
+    column_names = []
+    columns = []
+
+    # Single pass over the rows: column titles come from the first row with <th> tags, the number of columns
+    # from the first row with <td> tags, and every cell is appended to the list of its column
+    n_rows = 0
+    for row in table.iter('tr'):
+        cells = list(row.iter('td', 'th'))
+        td_tags = [cell for cell in cells if cell.tag == 'td']
+        if len(td_tags) != len(cells) and len(column_names) == 0:
+            column_names = [cell_text(cell) for cell in cells if cell.tag == 'th']
+        if len(td_tags) == 0:
+            continue
+
+        if len(columns) == 0:
+            # Set the number of columns for our table
+            columns = [[nan] * n_rows for _ in range(len(td_tags))]
+        if len(td_tags) > len(columns):
+            raise IndexError("Row has more cells than the table has columns")
+        for column, td in zip(columns, td_tags):
+            column.append(cell_text(td))
+        # Cells missing from short rows are left empty
+        for column in columns[len(td_tags):]:
+            column.append(nan)
+        n_rows += 1
 
     # Safeguard on Column Titles
-    if len(column_names) > 0 and len(column_names) != n_columns:
+    if len(column_names) > 0 and len(column_names) != len(columns):
         raise Exception("Column titles do not match the number of columns")
 
-    columns = column_names if len(column_names) > 0 else range(0, n_columns)
-    df = pd.DataFrame(columns=columns, index=range(0, n_rows))
-    row_marker = 0
-    for row in table.find_all('tr'):
-        column_marker = 0
-        columns = row.find_all('td')
-        for column in columns:
-            df.iat[row_marker, column_marker] = column.get_text()
-            column_marker += 1
-        if len(columns) > 0:
-            row_marker += 1
-
+    column_index = column_names if len(column_names) > 0 else range(0, len(columns))
+    if len(columns) == 0:
+        return pd.DataFrame(columns=column_index, index=range(0, n_rows))
+    df = pd.DataFrame(dict(enumerate(columns)), index=range(0, n_rows), dtype=object)
+    df.columns = pd.Index(column_index)
     return df
 
 
-def extract_param_data():
-    param_data_df = pd.DataFrame(columns=["Name", "Type", "Min", "Max", "Incr", "Default", "Description"])
-
-    for table in parse_url(px4_param_list_url):
-        n_rows = table.shape[0]
+def build_param_df(tables: Iterable["pd.DataFrame"]) -> "pd.DataFrame":
+    # The tables are gathered first and concatenated once, growing the catalog one table at a time copies it
+    # for every parameter group
+    import pandas as pd
+    columns = ["Name", "Min > Max (Incr.)", "Default", "Description"]
+    with span("catalog.parse.tables"):
+        tables = [table[columns] for table in tables]
+        if len(tables) == 0:
+            return pd.DataFrame(columns=param_df_columns).set_index("Name", drop=False)
+        table = pd.concat(tables, axis=0, ignore_index=True)
+    n_rows = table.shape[0]
 
+    with span("catalog.regex"):
         # ----------------- Extract parameter name and type ---------------------
         # Regex breakdown:
         # (?:\s*) Non-capturing group, matches zero to unlimited whitespaces, as many times as possible,
@@ -72,12 +99,10 @@ def extract_param_data():
         # possible, giving back as needed
         # (?P<Type>(?<=\()INT32|FLOAT) Named capture group, captures either INT32 or FLOAT,
         # ONLY IF the pattern is preceded by (
-        name_type_regex = r"(?:\s*)(?P<Name>.+(?<!\s|\())(?:[ \(]*)(?P<Type>(?<=\()INT32|FLOAT)"
         name_type_df = table["Name"].str.extract(name_type_regex, expand=True)
 
         # ------------- Extract parameter min, max and increment ----------------
         # Regex pattern matches all groups of digits, ., ?, - and unstack the result to remove the MultiIndex
-        min_max_incr_regex = r"([\d.?-]+)"
         min_max_incr_df = table["Min > Max (Incr.)"].str.extractall(min_max_incr_regex).unstack(level=-1)
 
         # Populate all rows with no matches with NaN
@@ -86,42 +111,268 @@ def extract_param_data():
         # If less than three matches were found, add columns to bring the shape of the DF to (n_rows, 3)
         while min_max_incr_df.shape[1] < 3:
             min_max_incr_df[min_max_incr_df.shape[1]] = nan
-
-        # A single match refers refers to the parameter increment, which we want on the third column
-        # Find the rows with two occurrences of NaN and switch the values of the first and third column
-        two_null_subset = min_max_incr_df.isnull().sum(axis=1)[min_max_incr_df.isnull().sum(axis=1) == 2]
-        min_max_incr_df.iloc[two_null_subset.index.tolist(), [0, 2]] = \
-            min_max_incr_df.iloc[two_null_subset.index.tolist(), [2, 0]].values
         min_max_incr_df.columns = ["Min", "Max", "Incr"]
 
-        tmp_table = pd.concat([name_type_df, min_max_incr_df, table[["Default", "Description"]]], axis=1)
-        param_data_df = pd.concat([param_data_df, tmp_table], axis=0, ignore_index=True)
+        # A single match refers to the parameter increment, which we want on the third column
+        single_match = (min_max_incr_df.isnull().sum(axis=1) == 2).to_numpy()
+        min_max_incr_df.loc[single_match, "Incr"] = min_max_incr_df.loc[single_match, "Min"]
+        min_max_incr_df.loc[single_match, "Min"] = nan
+
+        param_data_df = pd.concat([name_type_df, min_max_incr_df, table[["Default", "Description"]]], axis=1)
+        param_data_df.set_index("Name", inplace=True, drop=False)
+
+    # ---------------------- Numeric conversion -----------------------------
+    # Unbounded limits are written as ?
+    with span("catalog.numeric"):
+        param_data_df[["Min", "Max"]] = param_data_df[["Min", "Max"]].replace("?", nan)
+        param_data_df[["Default", "Min", "Max", "Incr"]] = \
+            param_data_df[["Default", "Min", "Max", "Incr"]].apply(pd.to_numeric)
+    return param_data_df
+
+
+def split_tables(html: str) -> Optional[List[str]]:
+    # Markup of each <table> of a page, in one case-insensitive scan that steps over comments, scripts and styles
+    # as lxml does. None when the page does not split into whole tables, a table left unclosed or a table holding
+    # another table, a comment or a script, such a page is parsed whole
+    tables = []
+    for match in _table_pattern.finditer(html):
+        table = match.group("table")
+        if match.group("unclosed") is not None or (table is not None and _table_inner_pattern.search(table, 1)):
+            return None
+        if table is not None:
+            tables.append(table)
+    return tables
+
+
+def build_page_catalog(html: str, previous: Optional[Tuple["pd.DataFrame", List[Tuple[str, int]]]] = None) \
+        -> Tuple["pd.DataFrame", Optional[List[Tuple[str, int]]], int]:
+    # The catalog of build_param_df(parse_html(html)), built by parameter group: each <table> of the page is one
+    # group, known by the hash of its markup. previous is the catalog of an earlier version of the page and its
+    # groups, as CatalogCache.lookup_groups returns them. The rows of its groups whose markup did not change are
+    # reused, only the other tables are parsed and go through the regex extraction, all of them at once.
+    # Returns the catalog, its groups as (hash, number of rows) in page order and the number of groups reused. The
+    # groups are None for a page that split_tables does not split, its catalog is built from the whole page
+    import lxml.html
+    import numpy as np
+    import pandas as pd
+    markups = split_tables(html)
+    if markups is None:
+        return build_param_df(parse_html(html)), None, 0
+    digests = [content_hash(markup) for markup in markups]
+    reusable = dict()
+    if previous is not None:
+        start = 0
+        for digest, n_rows in previous[1]:
+            reusable.setdefault(digest, (start, n_rows))
+            start += n_rows
+    changed = [group for group, digest in enumerate(digests) if digest not in reusable]
+    with span("catalog.parse.groups"):
+        tables = [parse_html_table(lxml.html.fragment_fromstring(markups[group])) for group in changed]
+    changed_df = build_param_df(tables)
+    if len(changed) == len(markups):
+        return changed_df, [(digest, len(table)) for digest, table in zip(digests, tables)], 0
+
+    # The changed rows follow the rows of the previous catalog, the catalog takes each group from one or the other
+    previous_df = previous[0]
+    rows = dict(zip(changed, zip(np.cumsum([len(previous_df)] + [len(table) for table in tables]).tolist(),
+                                 [len(table) for table in tables])))
+    groups = []
+    positions = []
+    for group, digest in enumerate(digests):
+        start, n_rows = rows[group] if group in rows else reusable[digest]
+        groups.append((digest, n_rows))
+        positions.append(np.arange(start, start + n_rows))
+    combined = pd.concat([previous_df, changed_df]) if len(changed) > 0 else previous_df
+    positions = np.concatenate(positions) if len(positions) > 0 else np.zeros(0, dtype=np.int64)
+    return combined.iloc[positions], groups, len(markups) - len(changed)
 
-    param_data_df.set_index("Name", inplace=True, drop=False)
-    min_mask = param_data_df["Min"] == "?"
-    param_data_df.loc[min_mask, "Min"] = nan
-    max_mask = param_data_df["Max"] == "?"
-    param_data_df.loc[max_mask, "Max"] = nan
-    param_data_df[["Default", "Min", "Max", "Incr"]] = \
-        param_data_df[["Default", "Min", "Max", "Incr"]].apply(pd.to_numeric)
-    save_to_pickle(param_data_df)
 
+def read_source(source: str) -> str:
+    # Sources are either a local copy of the parameter reference page or its URL
+    if os.path.isfile(source):
+        with span("catalog.fetch"), open(source, 'r', encoding="utf-8") as f:
+            return f.read()
+    with span("catalog.fetch"):
+        result = get_release_fetcher().fetch(source)
+    if result.status == "failed":
+        raise result.error
+    return result.text
 
-def save_to_pickle(data: pd.DataFrame):
-    with open(pickle_file_name, 'wb') as f:
-        pickle.dump(data, f)
 
+def get_release_fetcher() -> "ReleaseFetcher":
+    # Every download goes through one fetcher, so that its session keeps the connections alive
+    global release_fetcher
+    if release_fetcher is None:
+        from px4_release_fetcher import ReleaseFetcher
+        release_fetcher = ReleaseFetcher()
+    return release_fetcher
 
-def load_param_df() -> pd.DataFrame:
-    pickle_f_exists = os.path.isfile(".//" + pickle_file_name)
-    if not pickle_f_exists:
-        extract_param_data()
-    with open(pickle_file_name, 'rb') as f:
-        return pickle.load(f)
 
+def extract_param_data(source: str = None) -> "pd.DataFrame":
+    # Rebuild the catalog of a source regardless of what is cached
+    source = source or px4_param_list_url
+    if os.path.isfile(source):
+        source = os.path.abspath(source)
+    with span("catalog.extract"):
+        if is_metadata_file(source):
+            from param_metadata import load_metadata_df
+            with span("catalog.parse.metadata"):
+                param_data_df = load_metadata_df(source)
+            catalog_cache.store(source, file_hash(source), param_data_df)
+            return param_data_df
+        html = read_source(source)
+        param_data_df, groups, _ = build_page_catalog(html)
+        _refreshed(source, groups, 0)
+        catalog_cache.store(source, content_hash(html), param_data_df, groups=groups)
+        return param_data_df
 
-pickle_file_name = "parameter_data_from_html.dat"
+
+def load_param_df(source: str = None, columnar: bool = False) -> Union["pd.DataFrame", ColumnarCatalog]:
+    # With columnar=True the cached catalog is opened memory-mapped instead of being unpickled. Sources are pages
+    # or their URLs, or the parameters.xml or parameters.json of a PX4 build, which are read without the page
+    source = source or px4_param_list_url
+    with span("catalog.load"):
+        if is_metadata_file(source):
+            return _catalog_of_metadata(os.path.abspath(source), columnar)
+        if os.path.isfile(source):
+            source = os.path.abspath(source)
+            html = read_source(source)
+            return _catalog_of_page(source, html, content_hash(html), columnar)
+        latest = catalog_cache.latest_entry(source)
+        if _is_fresh(latest):
+            param_data_df = catalog_cache.lookup(source, latest["content_hash"], columnar)
+            if param_data_df is not None:
+                return param_data_df
+        with span("catalog.fetch"):
+            result = get_release_fetcher().fetch(source, *_validators(latest))
+        return _catalog_of_fetch(source, latest, result, columnar)
+
+
+def load_release_catalogs(releases: Iterable[str],
+                          columnar: bool = False) -> Tuple[Dict[str, Union["pd.DataFrame", ColumnarCatalog]],
+                                                           Dict[str, Exception]]:
+    # Catalogs of several PX4 releases, given as documentation versions ("v1.9.0"), URLs or local pages. The pages
+    # to check are fetched concurrently, then the catalogs of the changed ones are built one after the other.
+    # Returns the catalogs, in the order of the releases, and for the releases that could neither be fetched nor
+    # found in the cache, the error
+    import requests
+    from px4_release_fetcher import release_url
+    releases = list(releases)
+    catalogs = dict()
+    errors = dict()
+    pending = []
+    for release in releases:
+        if os.path.isfile(release):
+            catalogs[release] = load_param_df(release, columnar)
+            continue
+        source = release_url(release)
+        latest = catalog_cache.latest_entry(source)
+        if _is_fresh(latest):
+            param_data_df = catalog_cache.lookup(source, latest["content_hash"], columnar)
+            if param_data_df is not None:
+                catalogs[release] = param_data_df
+                continue
+        pending.append((release, source, latest))
+
+    with span("catalog.fetch"):
+        results = get_release_fetcher().fetch_all([(source, *_validators(latest))
+                                                   for _, source, latest in pending])
+    for (release, source, latest), result in zip(pending, results):
+        try:
+            catalogs[release] = _catalog_of_fetch(source, latest, result, columnar)
+        except requests.RequestException as e:
+            errors[release] = e
+    # Cached and local releases were found before the ones fetched
+    return {release: catalogs[release] for release in releases if release in catalogs}, errors
+
+
+def _is_fresh(latest: Optional[dict]) -> bool:
+    return latest is not None and time.time() - latest["checked"] < revalidate_after
+
+
+def _validators(latest: Optional[dict]) -> Tuple[Optional[str], Optional[str]]:
+    if latest is None:
+        return None, None
+    return latest.get("etag"), latest.get("last_modified")
+
+
+def _catalog_of_fetch(source: str, latest: Optional[dict], result: "FetchResult",
+                      columnar: bool) -> Union["pd.DataFrame", ColumnarCatalog]:
+    if result.status == "not modified":
+        param_data_df = catalog_cache.lookup(source, latest["content_hash"], columnar) if latest else None
+        if param_data_df is not None:
+            catalog_cache.revalidated(source, latest["content_hash"], result.etag, result.last_modified)
+            return param_data_df
+        # The cached catalog went missing since it was validated, the page has to be downloaded again
+        with span("catalog.fetch"):
+            result = get_release_fetcher().fetch(source)
+    if result.status == "failed":
+        # Offline, fall back on the last catalog built from this source
+        if latest is None:
+            raise result.error
+        param_data_df = catalog_cache.lookup(source, latest["content_hash"], columnar)
+        if param_data_df is None:
+            raise result.error
+        return param_data_df
+    return _catalog_of_page(source, result.text, content_hash(result.text), columnar, result.etag,
+                            result.last_modified)
+
+
+def _catalog_of_metadata(source: str, columnar: bool) -> Union["pd.DataFrame", ColumnarCatalog]:
+    from param_metadata import load_metadata_df
+    digest = file_hash(source)
+    param_data_df = catalog_cache.lookup(source, digest, columnar)
+    if param_data_df is None:
+        with span("catalog.parse.metadata"):
+            param_data_df = load_metadata_df(source)
+        catalog_cache.store(source, digest, param_data_df)
+        param_data_df = catalog_cache.open(source, digest, columnar)
+    return param_data_df
+
+
+def _catalog_of_page(source: str, html: str, digest: str, columnar: bool, etag: Optional[str] = None,
+                     last_modified: Optional[str] = None) -> Union["pd.DataFrame", ColumnarCatalog]:
+    # The catalog is only rebuilt when the content of the source changed, then only the parameter groups that
+    # changed since the last catalog of the source are parsed
+    param_data_df = catalog_cache.lookup(source, digest, columnar)
+    if param_data_df is None:
+        param_data_df, groups, reused = build_page_catalog(html, catalog_cache.lookup_groups(source))
+        _refreshed(source, groups, reused)
+        catalog_cache.store(source, digest, param_data_df, etag, last_modified, groups)
+        param_data_df = catalog_cache.open(source, digest, columnar)
+    elif etag is not None or last_modified is not None:
+        catalog_cache.revalidated(source, digest, etag, last_modified)
+    return param_data_df
+
+
+def _refreshed(source: str, groups: Optional[List[Tuple[str, int]]], reused: int):
+    # A page built whole counts as a single group
+    global last_refresh
+    n_groups = len(groups) if groups is not None else 1
+    last_refresh = {"source": source, "groups": n_groups, "reused": reused, "parsed": n_groups - reused}
+
+
+param_df_columns = ["Name", "Type", "Min", "Max", "Incr", "Default", "Description"]
+name_type_regex = r"(?:\s*)(?P<Name>.+(?<!\s|\())(?:[ \(]*)(?P<Type>(?<=\()INT32|FLOAT)"
+min_max_incr_regex = r"([\d.?-]+)"
+# Comments, scripts and styles are matched only to be skipped, a <table with no </table> after it is unclosed
+_table_pattern = re.compile(r"<!--.*?-->|<(script|style)\b.*?</\1\s*>"
+                            r"|(?P<table><table\b[^<]*(?:<(?!/table\s*>)[^<]*)*</table\s*>)|(?P<unclosed><table\b)",
+                            re.IGNORECASE | re.DOTALL)
+_table_inner_pattern = re.compile(r"<table\b|<!--|<script\b|<style\b", re.IGNORECASE)
+_ascii_whitespace = "\x20\x0a\x09\x0c\x0d"
 px4_param_list_url = "https://docs.px4.io/v1.9.0/en/advanced_config/parameter_reference.html"
 
+# Bump catalog_schema_version whenever build_param_df changes the layout of the catalog, cached catalogs built
+# with another version are discarded. Catalogs of URL sources are trusted for revalidate_after seconds before the
+# page is fetched again to check whether it changed
+catalog_schema_version = 1
+revalidate_after = 24 * 60 * 60
+catalog_cache = CatalogCache("param_catalog_cache", catalog_schema_version)
+# Created on the first download
+release_fetcher = None
+# Groups of the last page catalog built, and how many of them were reused from the previous catalog of the source
+last_refresh = None
+
 if __name__ == "__main__":
     extract_param_data()
@@ -0,0 +1,213 @@
+import argparse
+import gc
+import json
+import multiprocessing
+import os
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+from generate_param_header import SpecError, load_records, read_spec, validate_spec
+from load_critical_parameters import file_name, write_critical_parameters
+from param_records import ParamRecord
+
+# Generates one avy_parameter_check_list.h per airframe spec, for a whole fleet of airframes at once. The catalog is
+# loaded once by the parent process and the specs are spread over a process pool: on Linux the workers are forked
+# and share the parent's catalog read-only, elsewhere each worker opens the columnar catalog cache the parent left
+# on disk, which is memory mapped and costs no parse. Like generate_param_header.py, nothing here imports PySide2
+#
+# The header of a spec goes to <output dir>/<spec name without extension>/avy_parameter_check_list.h. Headers are
+# written atomically, and only when their content changed, by write_critical_parameters
+
+spec_extensions = (".json", ".yaml", ".yml", ".csv")
+header_name = os.path.basename(file_name)
+
+# Worker state, set in the parent before the pool forks or by _init_worker
+_records: Optional[Dict[str, ParamRecord]] = None
+_allow_unknown = False
+_allow_invalid = False
+
+
+class SpecResult:
+
+    __slots__ = ("spec", "output", "status", "entries", "errors", "warnings", "seconds", "worker")
+
+    # status is "written", "unchanged" when the header already had this content, "invalid" when the spec has
+    # validation errors, or "error" when it could not be read
+    def __init__(self, spec: str, output: str):
+        self.spec = spec
+        self.output = output
+        self.status = "error"
+        self.entries = 0
+        self.errors = []
+        self.warnings = []
+        self.seconds = 0.0
+        self.worker = os.getpid()
+
+    def as_dict(self) -> dict:
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+
+def generate_header(spec: str, output: str) -> SpecResult:
+    start = time.perf_counter()
+    result = SpecResult(spec, output)
+    try:
+        entries = read_spec(spec)
+    except (OSError, SpecError) as e:
+        result.errors.append(str(e))
+    else:
+        params, result.errors, result.warnings = validate_spec(entries, _records, _allow_unknown, _allow_invalid)
+        result.entries = len(params)
+        if len(params) == 0 and len(result.errors) == 0:
+            result.errors.append(f"{spec} has no entries")
+        if len(result.errors) > 0:
+            result.status = "invalid"
+        else:
+            try:
+                result.status = "written" if write_critical_parameters(params, output) else "unchanged"
+            except OSError as e:
+                result.errors.append(f"{output}: {e}")
+    result.seconds = time.perf_counter() - start
+    return result
+
+
+def _init_worker(allow_unknown: bool, allow_invalid: bool, catalog: Optional[str], load_catalog: bool):
+    global _records, _allow_unknown, _allow_invalid
+    _allow_unknown = allow_unknown
+    _allow_invalid = allow_invalid
+    if load_catalog:
+        _records = load_records(catalog)
+
+
+def generate_headers(jobs: List[Tuple[str, str]], records: Optional[Dict[str, ParamRecord]], workers: int = None,
+                     allow_unknown: bool = False, allow_invalid: bool = False,
+                     catalog: Optional[str] = None) -> List[SpecResult]:
+    # Generates the (spec, output) jobs, in the order given. records is None when the specs are not checked against
+    # a catalog, catalog is the source it was loaded from, for workers that cannot fork
+    global _records
+    workers = min(workers or os.cpu_count() or 1, len(jobs))
+    _init_worker(allow_unknown, allow_invalid, None, False)
+    _records = records
+    if workers <= 1:
+        return [generate_header(spec, output) for spec, output in jobs]
+
+    forked = "fork" in multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context("fork" if forked else None)
+    if forked:
+        # Moves the catalog out of the collector's reach, collections in the workers would otherwise write to every
+        # object's header and copy the shared pages
+        gc.freeze()
+    try:
+        with context.Pool(workers, initializer=_init_worker,
+                          initargs=(allow_unknown, allow_invalid, catalog, records is not None and not forked)) as pool:
+            # A few chunks per worker, to balance specs of different sizes without a round trip per spec
+            return pool.starmap(generate_header, jobs, chunksize=max(1, len(jobs) // (workers * 4)))
+    finally:
+        if forked:
+            gc.unfreeze()
+
+
+def find_specs(paths: List[str]) -> List[str]:
+    # Spec files, the specs of a directory in name order
+    specs = []
+    for path in paths:
+        if os.path.isdir(path):
+            specs.extend(os.path.join(path, name) for name in sorted(os.listdir(path))
+                         if os.path.splitext(name)[1].lower() in spec_extensions)
+        else:
+            specs.append(path)
+    return specs
+
+
+def output_paths(specs: List[str], output_dir: str) -> List[str]:
+    outputs = []
+    airframes = dict()
+    for spec in specs:
+        airframe = os.path.splitext(os.path.basename(spec))[0]
+        if airframe in airframes:
+            raise SpecError(f"{spec} and {airframes[airframe]} would both write the header of airframe {airframe}")
+        airframes[airframe] = spec
+        outputs.append(os.path.join(output_dir, airframe, header_name))
+    return outputs
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Generate the critical parameter header of several airframes at "
+                                                 "once, without the GUI.")
+    parser.add_argument("specs", nargs="+", help="spec files (.json, .yaml, .yml or .csv) or directories of specs")
+    parser.add_argument("-d", "--output-dir", default="headers",
+                        help=f"directory receiving <airframe>/{header_name} for each spec (default headers)")
+    parser.add_argument("-j", "--jobs", type=int, default=None,
+                        help="number of worker processes (default: one per core)")
+    parser.add_argument("--catalog", default=None,
+                        help="parameter reference page, URL or local file, or the parameters.xml or parameters.json of "
+                             "a PX4 build, to check the specs against (default: the PX4 release the GUI uses)")
+    parser.add_argument("--no-catalog", action="store_true",
+                        help="do not check names and values against the catalog")
+    parser.add_argument("--allow-unknown", action="store_true",
+                        help="write parameters missing from the catalog instead of failing")
+    parser.add_argument("--allow-invalid", action="store_true",
+                        help="write values outside the catalog limits instead of failing")
+    parser.add_argument("--report", default=None, help="write the per-spec results and the totals to a JSON file")
+    parser.add_argument("-q", "--quiet", action="store_true", help="only print the errors and the totals")
+    args = parser.parse_args(argv)
+
+    specs = find_specs(args.specs)
+    if len(specs) == 0:
+        print("error: no spec files found", file=sys.stderr)
+        return 2
+    try:
+        outputs = output_paths(specs, args.output_dir)
+        for output in outputs:
+            os.makedirs(os.path.dirname(output), exist_ok=True)
+    except (OSError, SpecError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+
+    records = None
+    catalog_seconds = 0.0
+    if not args.no_catalog:
+        start = time.perf_counter()
+        try:
+            records = load_records(args.catalog)
+        except Exception as e:
+            print(f"error: the Full Parameter List could not be loaded ({e}), use --no-catalog to skip the checks",
+                  file=sys.stderr)
+            return 2
+        catalog_seconds = time.perf_counter() - start
+
+    workers = min(args.jobs or os.cpu_count() or 1, len(specs))
+    start = time.perf_counter()
+    results = generate_headers(list(zip(specs, outputs)), records, workers, args.allow_unknown, args.allow_invalid,
+                               args.catalog)
+    wall_seconds = time.perf_counter() - start
+
+    for result in results:
+        for warning in result.warnings:
+            print(f"warning: {warning}", file=sys.stderr)
+        for error in result.errors:
+            print(f"error: {error}", file=sys.stderr)
+        if not args.quiet:
+            print(f"{result.spec}: {result.status}, {result.entries} entries, {result.seconds * 1e3:.1f} ms")
+    written = sum(result.status == "written" for result in results)
+    unchanged = sum(result.status == "unchanged" for result in results)
+    entries = sum(result.entries for result in results if result.status in ("written", "unchanged"))
+    totals = {"specs": len(results), "written": written, "unchanged": unchanged,
+              "failed": len(results) - written - unchanged, "entries": entries,
+              "workers": workers, "catalog_seconds": catalog_seconds, "wall_seconds": wall_seconds,
+              "spec_seconds": sum(result.seconds for result in results),
+              "specs_per_second": len(results) / wall_seconds if wall_seconds > 0 else 0.0}
+    print(f"{written}/{len(results)} headers written, {unchanged} unchanged ({entries} entries) in "
+          f"{wall_seconds:.2f} s with {workers} worker(s), {totals['specs_per_second']:.0f} specs/s; catalog loaded in "
+          f"{catalog_seconds:.2f} s")
+    if args.report is not None:
+        with open(args.report, 'w') as f:
+            json.dump({"totals": totals, "specs": [result.as_dict() for result in results]}, f, indent=2)
+
+    if any(result.status == "error" for result in results):
+        return 2
+    return 0 if totals["failed"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,239 @@
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+from load_critical_parameters import file_name, write_critical_parameters
+from param_records import (ParamRecord, build_param_records, check_entry, to_numeric, validator_default_max,
+                           validator_default_min)
+
+# Generates avy_parameter_check_list.h from a spec file, without the GUI. Nothing imported here may import
+# PySide2: build machines have no display, and importing Qt alone takes longer than generating a header. The
+# catalog stack (pandas, lxml, requests) is only imported when the spec is checked against a catalog
+#
+# A spec lists entries with a name and either a required value or a min and/or max, in one of:
+# - JSON or YAML: a list of {"name": ..., "required": ..., "min": ..., "max": ...} mappings, or a mapping from
+#   names to {"required": ..., "min": ..., "max": ...}
+# - CSV: a name,required,min,max header row, then one entry per row
+# Empty, missing or null values are left unset, an unset range limit is unbounded
+
+spec_columns = ("name", "required", "min", "max")
+
+
+class SpecError(Exception):
+    pass
+
+
+class SpecEntry:
+
+    __slots__ = ("name", "required", "low", "high", "where")
+
+    def __init__(self, name: str, required, low, high, where: str):
+        self.name = name
+        self.required = required
+        self.low = low
+        self.high = high
+        # Position of the entry in the spec file, for messages
+        self.where = where
+
+
+def spec_value(value, what: str, where: str) -> Optional[int or float]:
+    if value is None:
+        return None
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value
+    text = str(value).strip()
+    if len(text.strip("- ")) == 0 or text.upper() in ("INFINITY", "-INFINITY"):
+        return None
+    try:
+        return to_numeric(text)
+    except ValueError:
+        raise SpecError(f"{where}: {what} {value!r} is not a number")
+
+
+def read_spec(path: str) -> List[SpecEntry]:
+    extension = os.path.splitext(path)[1].lower()
+    with open(path, 'r', encoding="utf-8", newline="") as f:
+        if extension == ".csv":
+            return read_csv_spec(f, path)
+        if extension in (".yaml", ".yml"):
+            try:
+                import yaml
+            except ImportError:
+                raise SpecError(f"{path}: reading YAML specs requires PyYAML (pip install pyyaml)")
+            try:
+                data = yaml.safe_load(f)
+            except yaml.YAMLError as e:
+                raise SpecError(f"{path}: {e}")
+        elif extension == ".json":
+            try:
+                data = json.load(f)
+            except ValueError as e:
+                raise SpecError(f"{path}: {e}")
+        else:
+            raise SpecError(f"{path}: unknown spec format, expected .json, .yaml, .yml or .csv")
+    return spec_entries(data, path)
+
+
+def read_csv_spec(f, path: str) -> List[SpecEntry]:
+    reader = csv.DictReader(f)
+    if reader.fieldnames is None or "name" not in [column.strip().lower() for column in reader.fieldnames]:
+        raise SpecError(f"{path}: the first row must name the columns {', '.join(spec_columns)}")
+    entries = []
+    for row in reader:
+        row = {(column or "").strip().lower(): value for column, value in row.items()}
+        where = f"{path}:{reader.line_num}"
+        if not any((value or "").strip() for value in row.values() if isinstance(value, str)):
+            continue
+        entries.append(spec_entry(row, where))
+    return entries
+
+
+def spec_entries(data, path: str) -> List[SpecEntry]:
+    if isinstance(data, dict):
+        items = []
+        for name, values in data.items():
+            if not isinstance(values, dict):
+                raise SpecError(f"{path}: entry {name!r} must be a mapping of required, min and max")
+            items.append(dict(values, name=name))
+    elif isinstance(data, list):
+        items = data
+    else:
+        raise SpecError(f"{path}: expected a list of entries or a mapping from names to entries")
+    entries = []
+    for position, item in enumerate(items):
+        if not isinstance(item, dict):
+            raise SpecError(f"{path}: entry {position + 1} is not a mapping")
+        entries.append(spec_entry(item, f"{path}: entry {position + 1}"))
+    return entries
+
+
+def spec_entry(item: dict, where: str) -> SpecEntry:
+    unknown = set(item) - set(spec_columns)
+    if len(unknown) > 0:
+        raise SpecError(f"{where}: unknown field(s) {', '.join(sorted(map(str, unknown)))}")
+    name = str(item.get("name") or "").strip()
+    if len(name) == 0:
+        raise SpecError(f"{where}: missing name")
+    return SpecEntry(name, spec_value(item.get("required"), "required value", where),
+                     spec_value(item.get("min"), "min", where), spec_value(item.get("max"), "max", where), where)
+
+
+def validate_spec(entries: List[SpecEntry], records: Optional[Dict[str, ParamRecord]], allow_unknown: bool = False,
+                  allow_invalid: bool = False) -> Tuple[Dict[str, List], List[str], List[str]]:
+    # Entries in the format of write_critical_parameters, sorted by name like the GUI table, with the errors and
+    # warnings found. records is None when the spec is not checked against a catalog
+    params = dict()
+    errors = []
+    warnings = []
+    for entry in entries:
+        if entry.name in params:
+            errors.append(f"{entry.where}: {entry.name} is specified more than once")
+            continue
+        if entry.required is None and entry.low is None and entry.high is None:
+            errors.append(f"{entry.where}: {entry.name} has no required value, min or max")
+            continue
+        low, high = entry.low, entry.high
+        if entry.required is not None and (low is not None or high is not None):
+            # As in the GUI, a required value disables the range
+            warnings.append(f"{entry.where}: {entry.name} has a required value, its range is ignored")
+            low = high = None
+
+        record = None
+        if records is not None:
+            record = records.get(entry.name)
+            if record is None:
+                message = f"{entry.where}: {entry.name} is not in the Full Parameter List, PX4 might crash"
+                (warnings if allow_unknown else errors).append(message)
+        required_valid, low_valid, high_valid = check_entry(record, entry.required, low, high)
+        if not (required_valid and low_valid and high_valid):
+            if low is not None and high is not None and low > high:
+                message = f"{entry.name}: min {low} is larger than max {high}"
+            else:
+                checked = (("required value", entry.required, required_valid), ("min", low, low_valid),
+                           ("max", high, high_valid))
+                invalid = [f"{what} {value}" for what, value, valid in checked if not valid and value is not None]
+                bounds = (validator_default_min, validator_default_max) if record is None else \
+                    (record.min_value, record.max_value)
+                message = f"{entry.name}: {', '.join(invalid)} outside the expected valid range {list(bounds)}"
+            (warnings if allow_invalid else errors).append(f"{entry.where}: {message}")
+
+        if entry.required is not None:
+            params[entry.name] = [entry.required]
+        else:
+            params[entry.name] = ["-INFINITY" if low is None else low, "INFINITY" if high is None else high]
+    return dict(sorted(params.items())), errors, warnings
+
+
+def load_records(source: Optional[str]) -> Dict[str, ParamRecord]:
+    # Imported here so that generating from an unchecked spec never loads the catalog stack
+    from full_param_list_html_parser import load_param_df
+    return build_param_records(load_param_df(source, columnar=True))
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Generate the critical parameter header from a spec file, "
+                                                 "without the GUI.")
+    parser.add_argument("spec", help="spec file (.json, .yaml, .yml or .csv)")
+    parser.add_argument("-o", "--output", default=file_name, help=f"header to write (default {file_name})")
+    parser.add_argument("--catalog", default=None,
+                        help="parameter reference page, URL or local file, or the parameters.xml or parameters.json of "
+                             "a PX4 build, to check the spec against (default: the PX4 release the GUI uses)")
+    parser.add_argument("--no-catalog", action="store_true",
+                        help="do not check names and values against the catalog")
+    parser.add_argument("--allow-unknown", action="store_true",
+                        help="write parameters missing from the catalog instead of failing")
+    parser.add_argument("--allow-invalid", action="store_true",
+                        help="write values outside the catalog limits instead of failing")
+    parser.add_argument("--timing", action="store_true", help="print the time spent in each stage")
+    args = parser.parse_args(argv)
+
+    timings = []
+    stage_start = time.perf_counter()
+    try:
+        entries = read_spec(args.spec)
+    except (OSError, SpecError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+    timings.append(("read spec", time.perf_counter() - stage_start))
+
+    records = None
+    if not args.no_catalog:
+        stage_start = time.perf_counter()
+        try:
+            records = load_records(args.catalog)
+        except Exception as e:
+            print(f"error: the Full Parameter List could not be loaded ({e}), use --no-catalog to skip the checks",
+                  file=sys.stderr)
+            return 2
+        timings.append(("load catalog", time.perf_counter() - stage_start))
+
+    stage_start = time.perf_counter()
+    params, errors, warnings = validate_spec(entries, records, args.allow_unknown, args.allow_invalid)
+    timings.append(("validate", time.perf_counter() - stage_start))
+    for warning in warnings:
+        print(f"warning: {warning}", file=sys.stderr)
+    for error in errors:
+        print(f"error: {error}", file=sys.stderr)
+    if len(errors) > 0:
+        return 1
+    if len(params) == 0:
+        print(f"error: {args.spec} has no entries", file=sys.stderr)
+        return 1
+
+    stage_start = time.perf_counter()
+    written = write_critical_parameters(params, args.output)
+    timings.append(("write header" if written else "compare header", time.perf_counter() - stage_start))
+    if not written:
+        print(f"{args.output} is up to date, left unchanged", file=sys.stderr)
+    if args.timing:
+        for stage, duration in timings:
+            print(f"{stage}: {duration * 1e3:.1f} ms", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
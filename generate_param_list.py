@@ -1,14 +1,33 @@
+import argparse
+import os
 import sys
+import threading
+from collections import Counter
+from typing import Dict, Optional
 
-from PySide2.QtCore import QStringListModel, Signal, Slot
-from PySide2.QtGui import QIcon, Qt, QFont, QIntValidator, QDoubleValidator, QPixmap
+from PySide2.QtCore import QAbstractListModel, QModelIndex, QObject, QTimer, Signal, Slot
+from PySide2.QtGui import QIcon, Qt, QFont, QIntValidator, QDoubleValidator, QKeySequence, QPixmap
 from PySide2.QtWidgets import (QDialog, QApplication, QWidget, QVBoxLayout, QPushButton, QMessageBox, QFrame, QLabel,
-                               QTextBrowser, QHBoxLayout, QLineEdit, QCompleter, QTableWidget, QSizePolicy,
-                               QHeaderView, QTableWidgetItem, QAbstractItemView)
-from numpy import isnan
-
-from full_param_list_html_parser import load_param_df
-from load_critical_parameters import read_critical_parameters, write_critical_parameters
+                               QTextBrowser, QHBoxLayout, QLineEdit, QCompleter, QTableView, QSizePolicy,
+                               QHeaderView, QAbstractItemView, QProgressBar, QFileDialog, QToolButton, QUndoStack)
+import instrumentation
+from columnar_catalog import catalog_column
+from critical_param_commands import RemoveEntriesCommand, SetEntriesCommand
+from critical_param_model import CriticalParamModel, CriticalParamProxyModel, parse_entries, parse_entry
+from load_critical_parameters import CriticalParameterFormatError, read_critical_parameters, write_critical_parameters
+from param_name_index import ParamNameIndex
+from param_records import (ParamBounds, ParamRecord, build_param_records, check_entry, to_numeric,
+                           validator_default_max, validator_default_min, validator_default_prec)
+
+
+# Full parameter list, its name -> ParamRecord index, the completion index of its names and the bounds the table is
+# checked against, set by ParamWidget.setCatalog once they have been loaded in the background. They are module
+# variables rather than class attributes of ParamWidget, reassigned class attributes of Qt classes are not always
+# seen by later lookups
+_paramList = None
+_paramRecords = dict()
+_paramNameIndex = None
+_paramBounds = None
 
 
 class App(QDialog):
@@ -142,8 +161,8 @@ class App(QDialog):
             sys.exit()
 
     def saveAndClose(self):
-        self.addEntryWidget.exportParameters()
-        sys.exit()
+        if self.addEntryWidget.exportParameters() is not None:
+            sys.exit()
 
     @Slot(bool)
     def changesMade(self, changes_made: bool):
@@ -170,9 +189,9 @@ class App(QDialog):
 
 class MyQLineEdit(QLineEdit):
 
-    validatorDefaultMin = -1e9
-    validatorDefaultMax = 1e9
-    validatorDefaultPrec = 6
+    validatorDefaultMin = validator_default_min
+    validatorDefaultMax = validator_default_max
+    validatorDefaultPrec = validator_default_prec
 
     def __init__(self):
         super(MyQLineEdit, self).__init__()
@@ -197,28 +216,120 @@ class MyQLineEdit(QLineEdit):
         self.setStyleSheet("QLineEdit { background-color : Salmon; }")
 
 
+class CatalogLoader(QObject):
+
+    # The result is kept on the loader rather than sent with the signal, PySide2 does not reliably carry Python
+    # objects through queued connections
+    finished = Signal()
+    # How often the GUI thread checks whether the worker is done, in ms
+    pollInterval = 10
+
+    def __init__(self):
+        super(CatalogLoader, self).__init__()
+        self.catalog = None
+        self.records = None
+        self.nameIndex = None
+        self.bounds = None
+        self.error = None
+        self.done = threading.Event()
+        self.pollTimer = QTimer(self)
+        self.pollTimer.setInterval(self.pollInterval)
+        self.pollTimer.timeout.connect(self.poll)
+
+    def start(self):
+        # A daemon thread rather than a QThread, closing the window must not wait for a fetch still in progress.
+        # The worker never touches a Qt object, emitting a signal from a thread Qt did not start crashes the GUI at
+        # random. The GUI thread polls for the end of the load and emits finished itself
+        threading.Thread(target=self.run, name="CatalogLoader", daemon=True).start()
+        self.pollTimer.start()
+
+    def run(self):
+        try:
+            # Imported here, the window is shown before the catalog stack is loaded
+            from full_param_list_html_parser import load_param_df
+            self.catalog = load_param_df(columnar=True)
+            self.records = build_param_records(self.catalog)
+            self.nameIndex = ParamNameIndex(catalog_column(self.catalog, "Name"))
+            self.bounds = ParamBounds(self.records)
+        except Exception as e:
+            self.error = str(e)
+        self.done.set()
+
+    @Slot()
+    def poll(self):
+        if self.done.is_set():
+            self.pollTimer.stop()
+            self.finished.emit()
+
+
+class ParamCompletionModel(QAbstractListModel):
+
+    # Completions of the text typed in paramLineEdit: the ranked and capped matches of ParamNameIndex.search, which
+    # the completer shows as they are instead of filtering the whole name list on every keystroke
+    completionLimit = 50
+
+    def __init__(self, parent=None):
+        super(ParamCompletionModel, self).__init__(parent)
+        self.nameIndex = None
+        self.completions = []
+
+    def setNameIndex(self, nameIndex: ParamNameIndex):
+        self.nameIndex = nameIndex
+
+    def setQuery(self, text: str):
+        self.beginResetModel()
+        if self.nameIndex is None:
+            self.completions = []
+        else:
+            self.completions = self.nameIndex.search(text, ParamCompletionModel.completionLimit)
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.completions)
+
+    def data(self, index: QModelIndex, role: int = Qt.DisplayRole):
+        if role in (Qt.DisplayRole, Qt.EditRole) and index.isValid():
+            return self.completions[index.row()]
+        return None
+
+
 class ParamWidget(QWidget):
 
-    _paramList = load_param_df()
+    # Delay in ms after the last keystroke in paramLineEdit before the name is resolved, coalesces fast typing
+    paramUpdateDelay = 40
+    # Invalid entries listed when asking whether to export them
+    invalidEntriesShown = 10
+    # Commands kept by the undo stack, each holds only the rows it changed
+    undoLimit = 1000
     changedStatus = Signal(bool)
+    # Slots timed when the instrumentation is on, see instrumentation.py
+    instrumentedSlots = ("updateParamName", "updateDescription", "updateSpinboxes", "checkValid", "addRow",
+                         "loadParameters", "exportParameters")
 
     def __init__(self):
         super(ParamWidget, self).__init__()
 
+        # Number of times each handler ran, lets the fan-out of a keystroke be checked
+        self.handlerCalls = Counter()
+
         # ===================================================
         # ---------------- LineEdits ------------------------
-        paramNameList = QStringListModel()
-        paramNameList.setStringList(ParamWidget._paramList["Name"])
+        self.paramNameList = ParamCompletionModel(self)
         paramCompleter = QCompleter()
-        paramCompleter.setModel(paramNameList)
-        paramCompleter.setCaseSensitivity(Qt.CaseInsensitive)
+        paramCompleter.setModel(self.paramNameList)
+        paramCompleter.setCompletionMode(QCompleter.UnfilteredPopupCompletion)
 
         self.paramLineEdit = QLineEdit()
         self.paramLineEdit.setCompleter(paramCompleter)
         self.paramLineEdit.setMinimumHeight(25)
 
-        self.paramLineEdit.textChanged.connect(self.updateDescription)
-        self.paramLineEdit.textChanged.connect(self.updateSpinboxes)
+        self.paramUpdateTimer = QTimer(self)
+        self.paramUpdateTimer.setSingleShot(True)
+        self.paramUpdateTimer.setInterval(ParamWidget.paramUpdateDelay)
+        self.paramUpdateTimer.timeout.connect(self.updateParamName)
+        self.paramLineEdit.textChanged.connect(self.scheduleParamUpdate)
+        # Only typed text is completed, not names set by editEntry or addRow
+        self.paramLineEdit.textEdited.connect(self.updateCompletions)
 
         self.reqValLineEdit = MyQLineEdit()
         self.reqValLineEdit.setMinimumHeight(25)
@@ -309,18 +420,49 @@ class ParamWidget(QWidget):
         self.descriptionBox.setAcceptRichText(True)
         self.descriptionBox.setStyleSheet("background-color: rgb(240,240,240)")
 
+        # ---------------- catalogProgress ------------------
+        self.catalogProgress = QProgressBar()
+        self.catalogProgress.setRange(0, 0)
+        self.catalogProgress.setMaximumHeight(12)
+        self.catalogProgress.setTextVisible(False)
+        self.catalogStatusLabel = QLabel("Loading the full parameter list...")
+
+        catalogProgressLayout = QHBoxLayout()
+        catalogProgressLayout.addWidget(self.catalogStatusLabel)
+        catalogProgressLayout.addWidget(self.catalogProgress)
+
         # ------------------ tableLayout --------------------
-        self.paramTable = QTableWidget(0, 4)
-        self.paramTable.setHorizontalHeaderLabels(["Parameter Name", "Required", "Minimum", "Maximum"])
+        # paramModel holds the entries and keeps its rows sorted, paramTable shows them through paramProxy. Rows
+        # of the model and of the view only differ once the proxy filters, use paramProxy.sourceRows to convert
+        self.paramModel = CriticalParamModel(self)
+        self.paramProxy = CriticalParamProxyModel(self)
+        self.paramProxy.setSourceModel(self.paramModel)
+        self.paramTable = QTableView()
+        self.paramTable.setModel(self.paramProxy)
         self.paramTable.sortByColumn(0, Qt.AscendingOrder)
         self.paramTable.setSortingEnabled(True)
         self.paramTable.setEditTriggers(QAbstractItemView.NoEditTriggers)
         self.paramTable.setShowGrid(False)
         self.paramTable.setAlternatingRowColors(True)
-        self.paramTable.setSelectionBehavior(QTableWidget.SelectRows)
+        self.paramTable.setSelectionBehavior(QAbstractItemView.SelectRows)
         self.paramTable.verticalHeader().setDefaultSectionSize(25)
         self.paramTable.setStyleSheet("alternate-background-color: LightSteelBlue")
-        self.paramTable.itemPressed.connect(self.selectRow)
+        self.paramTable.pressed.connect(self.selectRow)
+
+        # Rows that fail the checks of the whole table are highlighted, this label counts them
+        self.invalidEntriesLabel = QLabel()
+        self.invalidEntriesLabel.hide()
+        self.paramModel.invalidCountChanged.connect(self.updateInvalidEntries)
+
+        # Every edit of the table is a command on undoStack, which is clean when the table is the exported header
+        self.undoStack = QUndoStack(self)
+        self.undoStack.setUndoLimit(ParamWidget.undoLimit)
+        self.undoStack.cleanChanged.connect(self.undoCleanChanged)
+        undoAction = self.undoStack.createUndoAction(self, "Undo")
+        undoAction.setShortcut(QKeySequence.Undo)
+        redoAction = self.undoStack.createRedoAction(self, "Redo")
+        redoAction.setShortcut(QKeySequence.Redo)
+        self.addActions([undoAction, redoAction])
         self.loadParameters()
 
         self.paramTableHeader = self.paramTable.horizontalHeader()
@@ -361,17 +503,83 @@ class ParamWidget(QWidget):
         removeAllBtn.setIcon(QIcon("minus_icon.png"))
         removeAllBtn.clicked.connect(self.removeAllEntries)
 
+        # ------------ undo, redo and import ----------------
+        undoBtn = QToolButton()
+        undoBtn.setDefaultAction(undoAction)
+        redoBtn = QToolButton()
+        redoBtn.setDefaultAction(redoAction)
+        importBtn = QPushButton("Import...")
+        importBtn.setToolTip("Add the entries of another critical parameter header")
+        importBtn.clicked.connect(self.importParameters)
+
+        editBtnLayout = QHBoxLayout()
+        editBtnLayout.addWidget(undoBtn)
+        editBtnLayout.addWidget(redoBtn)
+        editBtnLayout.addWidget(importBtn)
+        editBtnLayout.addWidget(removeAllBtn, 1)
+
         # ===================================================
         layout = QVBoxLayout()
         layout.addLayout(paramInputLayout)
+        layout.addLayout(catalogProgressLayout)
         layout.addWidget(self.descriptionBox)
         layout.addLayout(tableLayout)
-        layout.addWidget(removeAllBtn)
+        layout.addWidget(self.invalidEntriesLabel)
+        layout.addLayout(editBtnLayout)
         self.setLayout(layout)
 
+        # ---------------- catalogLoader --------------------
+        if _paramList is None:
+            self.catalogLoader = CatalogLoader()
+            self.catalogLoader.finished.connect(self.catalogLoaderFinished)
+            self.catalogLoader.start()
+        else:
+            self.setCatalog(_paramList, _paramRecords, _paramNameIndex, _paramBounds)
+
+    @Slot()
+    def catalogLoaderFinished(self):
+        if self.catalogLoader.catalog is not None:
+            self.setCatalog(self.catalogLoader.catalog, self.catalogLoader.records, self.catalogLoader.nameIndex,
+                            self.catalogLoader.bounds)
+        else:
+            self.catalogProgress.hide()
+            self.catalogStatusLabel.setText(
+                f"<b>Warning</b>: The full parameter list could not be loaded ({self.catalogLoader.error})")
+
+    def setCatalog(self, catalog, records: Dict[str, ParamRecord] = None, nameIndex: ParamNameIndex = None,
+                   bounds: ParamBounds = None):
+        global _paramList, _paramRecords, _paramNameIndex, _paramBounds
+        _paramList = catalog
+        _paramRecords = records if records is not None else build_param_records(catalog)
+        _paramNameIndex = nameIndex if nameIndex is not None else ParamNameIndex(catalog_column(catalog, "Name"))
+        _paramBounds = bounds if bounds is not None else ParamBounds(_paramRecords)
+        self.paramNameList.setNameIndex(_paramNameIndex)
+        self.catalogStatusLabel.hide()
+        self.catalogProgress.hide()
+        # Entries loaded before the catalog, or written for another PX4 release, are checked against it
+        self.paramModel.setBounds(_paramBounds)
+        # Whatever was typed while loading can now be described and validated
+        self.updateParamName()
+
+    def updateCompletions(self, text: str):
+        self.handlerCalls["updateCompletions"] += 1
+        self.paramNameList.setQuery(text)
+
+    @staticmethod
+    def isKnownParameter(parameterName: str) -> bool:
+        return parameterName in _paramRecords
+
     def addEntry(self):
-        if self.paramLineEdit.text() in ParamWidget._paramList["Name"]:
+        self.flushParamUpdate()
+        if self.isKnownParameter(self.paramLineEdit.text()):
             self.addRow()
+        elif _paramList is None and len(self.paramLineEdit.text().strip()) != 0:
+            choice = QMessageBox.question(self, "Parameter list not loaded",
+                                          "The Full Parameter List is not available yet, the parameter cannot be "
+                                          "checked.\nAre you sure you want to add it?",
+                                          QMessageBox.Yes, QMessageBox.No)
+            if choice == QMessageBox.Yes:
+                self.addRow()
         elif len(self.paramLineEdit.text().strip()) != 0:
             choice = QMessageBox.question(self, "Unknown parameter",
                                           "The parameter is not in the Full Parameter List"
@@ -389,47 +597,72 @@ class ParamWidget(QWidget):
                                           QMessageBox.Yes, QMessageBox.No)
             if choice == QMessageBox.No:
                 return
-        for i in range(self.paramTable.rowCount()):
-            if self.paramLineEdit.text() == self.paramTable.item(i, 0).text():
-                choice = QMessageBox.question(self, "Warning",
-                                              f"{self.paramLineEdit.text()} has already been specified."
-                                              f"\nDo you want to overwrite it?",
-                                              QMessageBox.Yes, QMessageBox.No)
-                if choice == QMessageBox.Yes:
-                    self.paramTable.removeRow(i)
-                    break
-                else:
-                    return
+        parameterName = self.paramLineEdit.text()
+        existingRow = self.rowOf(parameterName)
+        if existingRow != -1:
+            choice = QMessageBox.question(self, "Warning",
+                                          f"{parameterName} has already been specified."
+                                          f"\nDo you want to overwrite it?",
+                                          QMessageBox.Yes, QMessageBox.No)
+            if choice == QMessageBox.No:
+                return
         if len((self.reqValLineEdit.text().strip(" -") + self.rangeLowLineEdit.text().strip(" -")
                 + self.rangeHighLineEdit.text()).strip(" -")) != 0:
-            self.paramTable.setSortingEnabled(False)
-            self.paramTable.insertRow(0)
-            self.paramTable.setItem(0, 0, QTableWidgetItem(self.paramLineEdit.text()))
-            self.paramTable.setItem(0, 1, QTableWidgetItem(self.reqValLineEdit.text()))
             if self.rangeLowLineEdit.isEnabled() and self.rangeHighLineEdit.isEnabled():
-                self.paramTable.setItem(0, 2, QTableWidgetItem(self.rangeLowLineEdit.text()))
-                self.paramTable.setItem(0, 3, QTableWidgetItem(self.rangeHighLineEdit.text()))
-            self.paramTable.setSortingEnabled(True)
+                values, isInt = parse_entry(self.reqValLineEdit.text(), self.rangeLowLineEdit.text(),
+                                            self.rangeHighLineEdit.text())
+            else:
+                values, isInt = parse_entry(self.reqValLineEdit.text())
+            action = "Overwrite" if existingRow != -1 else "Add"
+            self.undoStack.push(SetEntriesCommand(self.paramModel, [parameterName], values[None], isInt[None],
+                                                  f"{action} {parameterName}"))
             self.paramLineEdit.clear()
-        self.changedStatus.emit(True)
+        elif existingRow != -1:
+            # Overwriting with empty values removes the entry
+            self.undoStack.push(RemoveEntriesCommand(self.paramModel, [existingRow], f"Remove {parameterName}"))
+
+    def rowOf(self, parameterName: str) -> int:
+        # Row of the parameter in paramModel, -1 if it is not in the table
+        return self.paramModel.rowOf(parameterName)
 
     def editEntry(self):
-        row_index = self.paramTable.currentRow()
-        self.paramLineEdit.setText(self.paramTable.item(row_index, 0).text())
+        row_index = self.paramProxy.sourceRow(self.paramTable.currentIndex().row())
+        self.paramLineEdit.setText(self.paramModel.name(row_index))
 
     def removeEntry(self):
-        selection = self.paramTable.selectionModel().selectedRows()
-        indices = sorted([index.row() for index in selection], reverse=True)
-        for index in indices:
-            self.paramTable.removeRow(index)
-        self.changedStatus.emit(True)
+        rows = self.paramProxy.sourceRows(self.paramTable.selectionModel().selectedRows())
+        if len(rows) == 0:
+            return
+        text = f"Remove {self.paramModel.name(rows[0])}" if len(rows) == 1 else f"Remove {len(rows)} entries"
+        self.undoStack.push(RemoveEntriesCommand(self.paramModel, rows, text))
 
     def removeAllEntries(self):
         choice = QMessageBox.question(self, "Confirm Clear All", "\nClear all entries?",
                                       QMessageBox.Yes, QMessageBox.No)
-        if choice == QMessageBox.Yes:
-            self.paramTable.selectAll()
-            self.removeEntry()
+        if choice == QMessageBox.Yes and self.paramModel.rowCount() > 0:
+            self.undoStack.push(RemoveEntriesCommand(self.paramModel, range(self.paramModel.rowCount()), "Clear all"))
+
+    def importParameters(self, path: str = None):
+        # The entries of another header are added in one undoable step, replacing the entries with the same name
+        if not path:
+            path, _ = QFileDialog.getOpenFileName(self, "Import critical parameters", "",
+                                                  "C headers (*.h);;All files (*)")
+            if not path:
+                return
+        try:
+            entries = read_critical_parameters(path)
+        except (CriticalParameterFormatError, OSError) as e:
+            QMessageBox.warning(self, "Invalid header", f"The critical parameters could not be imported:\n{e}")
+            return
+        if len(entries) == 0:
+            QMessageBox.information(self, "Import", f"There are no critical parameters in {path}")
+            return
+        self.undoStack.push(SetEntriesCommand(self.paramModel, *parse_entries(entries),
+                                              f"Import {len(entries)} entries from {os.path.basename(path)}"))
+
+    @Slot(bool)
+    def undoCleanChanged(self, clean: bool):
+        self.changedStatus.emit(not clean)
 
     def selectRow(self):
         selection = self.paramTable.selectionModel().selectedRows()
@@ -439,43 +672,53 @@ class ParamWidget(QWidget):
         else:
             self.editEntryBtn.setEnabled(True)
 
-    def updateDescription(self):
-        if self.paramLineEdit.text() in ParamWidget._paramList["Name"]:
-            parameter_name = self.paramLineEdit.text()
-            self.descriptionBox.setText(ParamWidget._paramList.loc[parameter_name, "Description"])
-        elif len(self.paramLineEdit.text().strip()) != 0:
+    def scheduleParamUpdate(self):
+        self.handlerCalls["scheduleParamUpdate"] += 1
+        self.paramUpdateTimer.start()
+
+    def flushParamUpdate(self):
+        # Apply a pending update right away, e.g. when Add Entry is clicked before the timer fired
+        if self.paramUpdateTimer.isActive():
+            self.paramUpdateTimer.stop()
+            self.updateParamName()
+
+    def updateParamName(self):
+        # Single update stage for a new parameter name: the name is resolved once, the value line edits are
+        # updated with their signals blocked and validity is checked once at the end
+        self.handlerCalls["updateParamName"] += 1
+        parameterName = self.paramLineEdit.text()
+        record = _paramRecords.get(parameterName)
+        valueLineEdits = (self.reqValLineEdit, self.rangeLowLineEdit, self.rangeHighLineEdit)
+        for lineEdit_ in valueLineEdits:
+            lineEdit_.blockSignals(True)
+        try:
+            self.updateDescription(parameterName, record)
+            self.updateSpinboxes(parameterName, record)
+        finally:
+            for lineEdit_ in valueLineEdits:
+                lineEdit_.blockSignals(False)
+        self.disableRangeBoxes()
+        self.checkValid()
+
+    def updateDescription(self, parameterName: str, record: ParamRecord):
+        self.handlerCalls["updateDescription"] += 1
+        if record is not None:
+            self.descriptionBox.setText(_paramList.loc[parameterName, "Description"])
+        elif _paramList is None:
+            self.descriptionBox.setText("")
+        elif len(parameterName.strip()) != 0:
             warning_text = "<b>Warning</b>: Parameter not in Full Parameter List"
             self.descriptionBox.setText(warning_text)
         else:
             self.descriptionBox.setText("")
 
     @staticmethod
-    def setSpinboxDetails(lineEdit_: MyQLineEdit, parameterName: str, labelArgument: str):
-        min_value = MyQLineEdit.validatorDefaultMin
-        max_value = MyQLineEdit.validatorDefaultMax
-        precision = MyQLineEdit.validatorDefaultPrec
-        if not isnan(ParamWidget._paramList.loc[parameterName, "Min"]):
-            min_value = ParamWidget._paramList.loc[parameterName, "Min"]
-        if not isnan(ParamWidget._paramList.loc[parameterName, "Max"]):
-            max_value = ParamWidget._paramList.loc[parameterName, "Max"]
-        if not isnan(ParamWidget._paramList.loc[parameterName, "Incr"]):
-            try:
-                _, decimals = str(ParamWidget._paramList.loc[parameterName, "Incr"]).split(".")
-                precision = len(decimals)
-            except ValueError:
-                precision = 0
-        if ParamWidget._paramList.loc[parameterName, "Type"] == "INT32":
-            lineEdit_.setIntValidator(min_value, max_value)
-            if not isnan(ParamWidget._paramList.loc[parameterName, labelArgument]):
-                lineEdit_.setPlaceholderText(
-                    f"{labelArgument}: {round(float(ParamWidget._paramList.loc[parameterName, labelArgument]))}")
-            else:
-                lineEdit_.setPlaceholderText(
-                    f"{labelArgument}: {ParamWidget._paramList.loc[parameterName, labelArgument]}")
+    def setSpinboxDetails(lineEdit_: MyQLineEdit, record: ParamRecord, labelArgument: str):
+        if record.is_int:
+            lineEdit_.setIntValidator(record.min_value, record.max_value)
         else:
-            lineEdit_.setDoubleValidator(min_value, max_value, precision)
-            lineEdit_.setPlaceholderText(
-                f"{labelArgument}: {ParamWidget._paramList.loc[parameterName, labelArgument]}")
+            lineEdit_.setDoubleValidator(record.min_value, record.max_value, record.precision)
+        lineEdit_.setPlaceholderText(f"{labelArgument}: {record.placeholder_texts[labelArgument]}")
         lineEdit_.clear()
         lineEdit_.setReadOnly(False)
 
@@ -493,14 +736,14 @@ class ParamWidget(QWidget):
         lineEdit_.clear()
         lineEdit_.setReadOnly(False)
 
-    def updateSpinboxes(self):
-        if self.paramLineEdit.text() in ParamWidget._paramList["Name"]:
-            parameter_name = self.paramLineEdit.text()
-            self.setSpinboxDetails(self.reqValLineEdit, parameter_name, "Default")
-            self.setSpinboxDetails(self.rangeLowLineEdit, parameter_name, "Min")
-            self.setSpinboxDetails(self.rangeHighLineEdit, parameter_name, "Max")
-            self.incrLabel.setText(f"Incr: {ParamWidget._paramList.loc[parameter_name, 'Incr']}")
-        elif len(self.paramLineEdit.text().strip()) != 0:
+    def updateSpinboxes(self, parameterName: str, record: ParamRecord):
+        self.handlerCalls["updateSpinboxes"] += 1
+        if record is not None:
+            self.setSpinboxDetails(self.reqValLineEdit, record, "Default")
+            self.setSpinboxDetails(self.rangeLowLineEdit, record, "Min")
+            self.setSpinboxDetails(self.rangeHighLineEdit, record, "Max")
+            self.incrLabel.setText(f"Incr: {record.incr_text}")
+        elif len(parameterName.strip()) != 0:
             self.setUnknownSpinboxDetails(self.reqValLineEdit)
             self.setUnknownSpinboxDetails(self.rangeLowLineEdit)
             self.setUnknownSpinboxDetails(self.rangeHighLineEdit)
@@ -510,17 +753,14 @@ class ParamWidget(QWidget):
             self.clearSpinboxDetails(self.rangeLowLineEdit)
             self.clearSpinboxDetails(self.rangeHighLineEdit)
             self.incrLabel.setText("Incr:")
-        for i in range(self.paramTable.rowCount()):
-            if self.paramLineEdit.text() == self.paramTable.item(i, 0).text():
-                if self.paramTable.item(i, 1) is not None:
-                    self.reqValLineEdit.setText(self.paramTable.item(i, 1).text())
-                if self.paramTable.item(i, 2) is not None:
-                    self.rangeLowLineEdit.setText(self.paramTable.item(i, 2).text())
-                if self.paramTable.item(i, 3) is not None:
-                    self.rangeHighLineEdit.setText(self.paramTable.item(i, 3).text())
-                return
+        i = self.rowOf(parameterName)
+        if i != -1:
+            self.reqValLineEdit.setText(self.paramModel.text(i, 1))
+            self.rangeLowLineEdit.setText(self.paramModel.text(i, 2))
+            self.rangeHighLineEdit.setText(self.paramModel.text(i, 3))
 
     def disableRangeBoxes(self):
+        self.handlerCalls["disableRangeBoxes"] += 1
         if self.reqValLineEdit.text() != "":
             self.rangeLowLineEdit.setDisabled(True)
             self.rangeHighLineEdit.setDisabled(True)
@@ -529,91 +769,90 @@ class ParamWidget(QWidget):
             self.rangeHighLineEdit.setDisabled(False)
 
     def checkValid(self):
-        minVal = MyQLineEdit.validatorDefaultMin
-        maxVal = MyQLineEdit.validatorDefaultMax
-        if self.paramLineEdit.text() in ParamWidget._paramList["Name"]:
-            parameterName = self.paramLineEdit.text()
-            if not isnan(ParamWidget._paramList.loc[parameterName, "Min"]):
-                minVal = ParamWidget._paramList.loc[parameterName, "Min"]
-            if not isnan(ParamWidget._paramList.loc[parameterName, "Max"]):
-                maxVal = ParamWidget._paramList.loc[parameterName, "Max"]
-
-        if len(self.reqValLineEdit.text().strip("- ")) != 0:
-            reqVal = self._toNumeric(self.reqValLineEdit.text())
-            if reqVal < minVal or reqVal > maxVal:
-                self.reqValLineEdit.inputIsInvalid()
+        self.handlerCalls["checkValid"] += 1
+        record = _paramRecords.get(self.paramLineEdit.text())
+        valueLineEdits = (self.reqValLineEdit, self.rangeLowLineEdit, self.rangeHighLineEdit)
+        values = [None if len(lineEdit_.text().strip("- ")) == 0 else self._toNumeric(lineEdit_.text())
+                  for lineEdit_ in valueLineEdits]
+        for lineEdit_, valid in zip(valueLineEdits, check_entry(record, *values)):
+            if valid:
+                lineEdit_.inputIsValid()
             else:
-                self.reqValLineEdit.inputIsValid()
-        else:
-            self.reqValLineEdit.inputIsValid()
-
-        lowVal = minVal
-        uppVal = maxVal
-        if len(self.rangeLowLineEdit.text().strip(" -")) != 0:
-            lowVal = self._toNumeric(self.rangeLowLineEdit.text())
-        if len(self.rangeHighLineEdit.text().strip(" -")) != 0:
-            uppVal = self._toNumeric(self.rangeHighLineEdit.text())
-
-        if lowVal < minVal or lowVal > maxVal or lowVal > uppVal:
-            self.rangeLowLineEdit.inputIsInvalid()
-        else:
-            self.rangeLowLineEdit.inputIsValid()
-        if uppVal < minVal or uppVal > maxVal or uppVal < lowVal:
-            self.rangeHighLineEdit.inputIsInvalid()
-        else:
-            self.rangeHighLineEdit.inputIsValid()
+                lineEdit_.inputIsInvalid()
+
+    @Slot(int)
+    def updateInvalidEntries(self, invalidCount: int):
+        if invalidCount == 0:
+            self.invalidEntriesLabel.hide()
+            return
+        against = "the Full Parameter List" if _paramBounds is not None else "the default limits"
+        self.invalidEntriesLabel.setText(f"<b>Warning</b>: {invalidCount} of the entries are not valid for {against}, "
+                                         f"they are highlighted")
+        self.invalidEntriesLabel.show()
+
+    def confirmInvalidEntries(self) -> bool:
+        # Whether to export even though some rows are invalid, they are listed up to invalidEntriesShown
+        invalidRows = self.paramModel.invalidRows()
+        if len(invalidRows) == 0:
+            return True
+        lines = [f"{self.paramModel.name(row)}: {self.paramModel.invalidText(row)}"
+                 for row in invalidRows[:self.invalidEntriesShown]]
+        if len(invalidRows) > self.invalidEntriesShown:
+            lines.append(f"... and {len(invalidRows) - self.invalidEntriesShown} more")
+        choice = QMessageBox.question(self, "Invalid entries",
+                                      f"{len(invalidRows)} of the entries are not valid:\n" + "\n".join(lines)
+                                      + "\n\nAre you sure you want to export them? PX4 might crash",
+                                      QMessageBox.Yes, QMessageBox.No)
+        return choice == QMessageBox.Yes
 
     def loadParameters(self):
-        hFileParameters = read_critical_parameters()
-        self.paramTable.setSortingEnabled(False)
-        for paramName, specifiedValues in hFileParameters.items():
-            self.paramTable.insertRow(0)
-            self.paramTable.setItem(0, 0, QTableWidgetItem(paramName))
-            if len(specifiedValues) == 1:
-                self.paramTable.setItem(0, 1, QTableWidgetItem(specifiedValues[0]))
-            else:
-                self.paramTable.setItem(0, 1, QTableWidgetItem(""))
-                if "-INFINITY" not in specifiedValues[0]:
-                    self.paramTable.setItem(0, 2, QTableWidgetItem(specifiedValues[0]))
-                else:
-                    self.paramTable.setItem(0, 2, QTableWidgetItem(""))
-                if "INFINITY" not in specifiedValues[1]:
-                    self.paramTable.setItem(0, 3, QTableWidgetItem(specifiedValues[1]))
-                else:
-                    self.paramTable.setItem(0, 3, QTableWidgetItem(""))
-        self.paramTable.setSortingEnabled(True)
-
-    def exportParameters(self):
-        critParams = dict()
-        for i in range(self.paramTable.rowCount()):
-            values = []
-            if len(self.paramTable.item(i, 1).text().strip()) != 0:
-                values.append(self._toNumeric(self.paramTable.item(i, 1).text()))
-                critParams[self.paramTable.item(i, 0).text()] = values
-                continue
-            if len(self.paramTable.item(i, 2).text().strip()) == 0:
-                values.append("-INFINITY")
-            else:
-                values.append(self._toNumeric(self.paramTable.item(i, 2).text()))
-            if len(self.paramTable.item(i, 3).text().strip()) == 0:
-                values.append("INFINITY")
-            else:
-                values.append(self._toNumeric(self.paramTable.item(i, 3).text()))
-            critParams[self.paramTable.item(i, 0).text()] = values
-
-        write_critical_parameters(critParams)
+        # The loaded header is where the history starts, it cannot be undone
+        try:
+            self.paramModel.loadEntries(read_critical_parameters())
+        except CriticalParameterFormatError as e:
+            QMessageBox.warning(self, "Invalid header", f"The critical parameters could not be loaded:\n{e}\n\n"
+                                                        f"Applying changes will overwrite the header.")
+        self.undoStack.clear()
+
+    def exportParameters(self) -> Optional[bool]:
+        # The whole table is checked again first, None if the export was cancelled or failed. The header is left
+        # untouched, mtime included, when Apply would not change it. A header needs at least one entry
+        self.paramModel.validate()
+        if not self.confirmInvalidEntries():
+            return None
+        try:
+            written = write_critical_parameters(self.paramModel.criticalParameters())
+        except (ValueError, OSError) as e:
+            QMessageBox.warning(self, "Export failed", f"The critical parameters could not be exported:\n{e}")
+            return None
+        self.undoStack.setClean()
         self.changedStatus.emit(False)
+        return written
 
     @staticmethod
     def _toNumeric(s: str) -> int or float:
-        try:
-            num = int(s)
-        except ValueError:
-            num = float(s)
-        return num
+        return to_numeric(s)
+
+
+# Only wraps the slots when the instrumentation was turned on by PARAM_CHECK_PROFILE
+instrumentation.instrument_methods(ParamWidget, ParamWidget.instrumentedSlots)
 
 
 if __name__ == "__main__":
-    app = QApplication(sys.argv)
+    # The remaining arguments are left to Qt
+    parser = argparse.ArgumentParser(description="Edit the critical parameter header.")
+    parser.add_argument("--profile", default=None, metavar="PATH",
+                        help="time the catalog load and the slots of the editor, the report is written to PATH on "
+                             "exit (same as PARAM_CHECK_PROFILE=PATH)")
+    parser.add_argument("--profile-format", choices=instrumentation.output_formats, default="json",
+                        help="json histograms, or a Chrome trace (chrome://tracing) that also holds them")
+    parser.add_argument("--profile-slot", choices=ParamWidget.instrumentedSlots, default=None,
+                        help="also run this slot under cProfile, its stats are written to PATH.prof")
+    args, qtArgs = parser.parse_known_args()
+    if args.profile is not None:
+        instrumentation.configure(args.profile, args.profile_format, args.profile_slot)
+        instrumentation.instrument_methods(ParamWidget, ParamWidget.instrumentedSlots)
+
+    app = QApplication(sys.argv[:1] + qtArgs)
     ex = App()
     sys.exit(app.exec_())
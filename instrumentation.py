@@ -0,0 +1,221 @@
+import atexit
+import functools
+import inspect
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, List, Optional
+
+# Opt-in timing of the catalog build phases and of the GUI slots, to find out where a sluggish session spends its
+# time. Off unless PARAM_CHECK_PROFILE names an output file, or configure() is called (generate_param_list.py
+# --profile). When off:
+# - the slots are the plain methods, instrument_methods does not wrap them
+# - span() returns one shared no-op context, it is only used around the phases of a catalog load, never per row
+# When on, every span and slot call goes to a histogram of its durations in power of two buckets, and to a Chrome
+# trace (chrome://tracing, Perfetto) of at most max_trace_events events. The report is written on exit, as JSON
+# with the histograms or, with PARAM_CHECK_PROFILE_FORMAT=chrome, as a trace that also holds the histograms.
+# PARAM_CHECK_PROFILE_SLOT names one slot to run under cProfile, its stats go to <output>.prof for pstats
+#
+#   PARAM_CHECK_PROFILE=profile.json PARAM_CHECK_PROFILE_SLOT=updateParamName python generate_param_list.py
+
+if TYPE_CHECKING:
+    import cProfile
+
+output_formats = ("json", "chrome")
+max_trace_events = 200000
+# Bucket i holds the durations from 2 ** (i - 1) to 2 ** i microseconds, the last one everything longer
+histogram_buckets = 32
+
+enabled = False
+output_path: Optional[str] = None
+output_format = "json"
+profiled_slot: Optional[str] = None
+
+_lock = threading.Lock()
+_histograms: Dict[str, "Histogram"] = dict()
+_trace_events: List[dict] = []
+_dropped_events = 0
+_profile: Optional["cProfile.Profile"] = None
+_origin = time.perf_counter()
+_exit_registered = False
+
+
+class Histogram:
+
+    __slots__ = ("count", "total", "minimum", "maximum", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.minimum = math.inf
+        self.maximum = 0.0
+        self.buckets = [0] * histogram_buckets
+
+    def add(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        self.minimum = min(self.minimum, seconds)
+        self.maximum = max(self.maximum, seconds)
+        microseconds = seconds * 1e6
+        bucket = 0 if microseconds < 1 else min(histogram_buckets - 1, math.frexp(microseconds)[1])
+        self.buckets[bucket] += 1
+
+    def percentile(self, fraction: float) -> float:
+        # Upper edge of the bucket holding the fraction-th duration, in seconds, capped by the longest one
+        rank = fraction * self.count
+        seen = 0
+        for bucket, count in enumerate(self.buckets):
+            seen += count
+            if count > 0 and seen >= rank:
+                return min(self.maximum, 2.0 ** bucket * 1e-6)
+        return self.maximum
+
+    def as_dict(self) -> dict:
+        return {"count": self.count, "total_ms": self.total * 1e3, "mean_ms": self.total / self.count * 1e3,
+                "min_ms": self.minimum * 1e3, "max_ms": self.maximum * 1e3,
+                "p50_ms": self.percentile(0.5) * 1e3, "p90_ms": self.percentile(0.9) * 1e3,
+                "p99_ms": self.percentile(0.99) * 1e3,
+                "buckets_us": {f"<{2 ** bucket}": count for bucket, count in enumerate(self.buckets) if count > 0}}
+
+
+def configure(path: Optional[str], fmt: str = "json", slot: Optional[str] = None):
+    # Turns the instrumentation on, the report goes to path on exit. path None turns it off
+    global enabled, output_path, output_format, profiled_slot, _exit_registered
+    if fmt not in output_formats:
+        raise ValueError(f"unknown profile format {fmt!r}, expected one of {', '.join(output_formats)}")
+    enabled = path is not None
+    output_path = path
+    output_format = fmt
+    profiled_slot = slot
+    if enabled and not _exit_registered:
+        atexit.register(_write_on_exit)
+        _exit_registered = True
+
+
+def configure_from_environment():
+    path = os.environ.get("PARAM_CHECK_PROFILE")
+    if path:
+        configure(path, os.environ.get("PARAM_CHECK_PROFILE_FORMAT", "json"),
+                  os.environ.get("PARAM_CHECK_PROFILE_SLOT") or None)
+
+
+def record(name: str, start: float, seconds: float):
+    global _dropped_events
+    with _lock:
+        histogram = _histograms.get(name)
+        if histogram is None:
+            histogram = _histograms[name] = Histogram()
+        histogram.add(seconds)
+        if len(_trace_events) < max_trace_events:
+            _trace_events.append({"name": name, "cat": name.split(".", 1)[0], "ph": "X",
+                                  "ts": (start - _origin) * 1e6, "dur": seconds * 1e6, "pid": os.getpid(),
+                                  "tid": threading.get_ident()})
+        else:
+            _dropped_events += 1
+
+
+def span(name: str):
+    # with span("catalog.parse"): times the block. A shared no-op context when the instrumentation is off
+    if not enabled:
+        return _null_span
+    return _span(name)
+
+
+@contextmanager
+def _span(name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, start, time.perf_counter() - start)
+
+
+def timed(name: str, profiled: bool = False) -> Callable[[Callable], Callable]:
+    # Decorator recording each call of a function, under cProfile too if profiled. PySide2 passes a slot as many
+    # signal arguments as the slot's code takes, *args takes them all: the arguments past the positional parameters
+    # of func are dropped, as they are when func itself is connected
+    def decorator(func: Callable) -> Callable:
+        kinds = [parameter.kind for parameter in inspect.signature(func).parameters.values()]
+        n_positional = None if inspect.Parameter.VAR_POSITIONAL in kinds else \
+            sum(kind in (inspect.Parameter.POSITIONAL_ONLY, inspect.Parameter.POSITIONAL_OR_KEYWORD) for kind in kinds)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if n_positional is not None:
+                args = args[:n_positional]
+            if profiled:
+                _profiler().enable()
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(name, start, time.perf_counter() - start)
+                if profiled:
+                    _profile.disable()
+        wrapper.instrumented = True
+        return wrapper
+    return decorator
+
+
+def instrument_methods(cls: type, names: Iterable[str], prefix: str = "slot."):
+    # Wraps the methods of cls with timed, only when the instrumentation is on. Instances connect their signals to
+    # the wrapped methods, so this has to run before they are created
+    if not enabled:
+        return
+    for name in names:
+        method = getattr(cls, name)
+        if not getattr(method, "instrumented", False):
+            setattr(cls, name, timed(prefix + name, profiled=name == profiled_slot)(method))
+
+
+def _profiler() -> "cProfile.Profile":
+    global _profile
+    if _profile is None:
+        import cProfile
+        _profile = cProfile.Profile()
+    return _profile
+
+
+def histograms() -> Dict[str, dict]:
+    with _lock:
+        return {name: histogram.as_dict() for name, histogram in sorted(_histograms.items())}
+
+
+def report(fmt: str = "json") -> dict:
+    if fmt == "chrome":
+        with _lock:
+            events = list(_trace_events)
+        return {"traceEvents": events, "displayTimeUnit": "ms",
+                "otherData": {"histograms": histograms(), "dropped_events": _dropped_events}}
+    return {"histograms": histograms(), "trace_events": len(_trace_events), "dropped_events": _dropped_events,
+            "profiled_slot": profiled_slot}
+
+
+def write_report(path: Optional[str] = None, fmt: Optional[str] = None):
+    # The report, and the cProfile stats of the profiled slot to <path>.prof
+    path = path or output_path
+    with open(path, 'w') as f:
+        json.dump(report(fmt or output_format), f, indent=1)
+    if _profile is not None:
+        _profile.dump_stats(path + ".prof")
+
+
+def reset():
+    global _dropped_events, _profile
+    with _lock:
+        _histograms.clear()
+        _trace_events.clear()
+        _dropped_events = 0
+    _profile = None
+
+
+def _write_on_exit():
+    if enabled and output_path is not None:
+        write_report()
+
+
+_null_span = nullcontext()
+configure_from_environment()
@@ -1,48 +1,183 @@
+import hashlib
+import os
 import re
+import stat
+import tempfile
+from math import isinf
 from typing import Dict, List
 
 
-def read_critical_parameters() -> Dict[str, List[str]]:
-    params = dict()
+class CriticalParameterFormatError(ValueError):
+
+    def __init__(self, path: str, line: int, message: str):
+        super(CriticalParameterFormatError, self).__init__(f"{path}:{line}: {message}")
+        self.path = path
+        self.line = line
+
+
+def read_critical_parameters(path: str = None) -> Dict[str, List[int or float]]:
+    # Entries of the header, {} if there is none. Required values and range limits are ints or floats as they were
+    # written, an unbounded range limit is -inf or inf. Raises CriticalParameterFormatError for a malformed list
+    path = path or file_name
     try:
-        with open(file_name, 'r') as f:
-            list_begin_found = False
-            for line in f:
-                if not list_begin_found:
-                    if re.search(r"#define PCHK_CRIT_PARAM_LIST", line):
-                        list_begin_found = True
-                else:  # So that the first element is not skipped
-                    pattern = r"(?:.*{)(.*)(?:}.*)"
-                    try:
-                        match = re.match(pattern, line)[1].split(',')
-                        match[0] = match[0][12:].strip("\") ")
-                        params[match[0]] = match[1:]
-                    except TypeError:
-                        break
+        with open(path, 'r') as f:
+            text = f.read()
     except FileNotFoundError:
-        pass
+        return dict()
+    return parse_critical_parameters(text, path)
+
+
+def parse_critical_parameters(text: str, path: str = "<header>") -> Dict[str, List[int or float]]:
+    # The PCHK_CRIT_PARAM_LIST macro is read entry by entry, each entry with one match of _entry_pattern. Between
+    # tokens the patterns skip whitespace, line continuations and comments as the C preprocessor does, so an entry
+    # can be wrapped or commented anywhere. The macro ends at the first line that does not end with a continuation
+    define = _define_pattern.search(text)
+    if define is None:
+        return dict()
+    params = dict()
+    position = _space_pattern.match(text, define.end()).end()
+    while True:
+        match = _written_entry_pattern.match(text, position) or _entry_pattern.match(text, position)
+        if match is None:
+            # An empty list, or a ',' after the last entry
+            if _end_pattern.match(text, position) is not None:
+                break
+            raise _entry_error(text, position, path)
+        name, sign, number, high_sign, high_number, comma = match.groups()
+        if high_number is None:
+            params[name] = [_value(sign, number)]
+        else:
+            params[name] = [_value(sign, number), _value(high_sign, high_number)]
+        position = match.end()
+        if len(comma) == 0:
+            if _end_pattern.match(text, position) is None:
+                raise _entry_error(text, position, path, f"expected ',' after the entry of {name}")
+            break
+
+    # An entry after the end of the macro is one a missing continuation or a blank line cut off, PX4 would not
+    # build. Not reading it would silently drop the rest of the list
+    stray = _stray_entry_pattern.search(text, position)
+    if stray is not None:
+        raise CriticalParameterFormatError(
+            path, _line_of(text, stray.start()), f"entry outside PCHK_CRIT_PARAM_LIST, the macro ends on line "
+                                                 f"{_line_of(text, position)} without a line continuation")
     return params
 
 
-def write_critical_parameters(params: Dict[str, List[float]]):
-    with open(file_name, 'w') as f:
-        f.write("//=========================================================="
-                "\n// THIS FILE WAS AUTO-GENERATED BY generate_param_list.py"
-                "\n// Do not edit this file as incorrect format will crash PX4"
-                "\n//==========================================================")
-        f.write("\n\n#ifndef PX4_AVY_PARAMETER_CHECK_LIST_H"
-                "\n#define PX4_AVY_PARAMETER_CHECK_LIST_H")
+def _value(sign: str, number: str) -> int or float:
+    # float() reads INFINITY as inf
+    value = int(number) if number.isdigit() else float(number.rstrip("fF"))
+    return -value if sign == "-" else value
+
+
+def _line_of(text: str, position: int) -> int:
+    return text.count("\n", 0, position) + 1
+
 
-        f.write("\n\n#define PCHK_CRIT_PARAM_LIST \\")
-        params_items = iter(params.items())
+def _entry_error(text: str, position: int, path: str, message: str = None) -> CriticalParameterFormatError:
+    # Replays the pieces of _entry_pattern one at a time to name the first token that is wrong
+    if message is None:
+        for piece, expected in _entry_pieces:
+            match = piece.match(text, position)
+            if match is None:
+                message = f"expected {expected}"
+                break
+            position = match.end()
+    position = _space_pattern.match(text, position).end()
+    found = text[position:].split("\n", 1)[0].strip()
+    found = "the end of the macro" if len(found) == 0 else repr(found[:40])
+    return CriticalParameterFormatError(path, _line_of(text, position), f"{message}, found {found}")
+
+
+def render_critical_parameters(params: Dict[str, List[float]]) -> str:
+    lines = ["//==========================================================",
+             "// THIS FILE WAS AUTO-GENERATED BY generate_param_list.py",
+             "// Do not edit this file as incorrect format will crash PX4",
+             "//==========================================================",
+             "",
+             "#ifndef PX4_AVY_PARAMETER_CHECK_LIST_H",
+             "#define PX4_AVY_PARAMETER_CHECK_LIST_H",
+             "",
+             "#define PCHK_CRIT_PARAM_LIST \\"]
+    params_items = iter(params.items())
+    try:
         first_name, first_value = next(params_items)
-        for name, value in params_items:
-            f.write("\n" + " " * 29 + f"paramInfo {{param_find(\"{name}\"), {', '.join(map(str, value))}}}, \\")
-        else:
-            f.write("\n" + " " * 29 + f"paramInfo {{param_find(\"{first_name}\"), {', '.join(map(str, first_value))}}}")
-        f.write("\n\n#endif //PX4_AVY_PARAMETER_CHECK_LIST_H")
+    except StopIteration:
+        raise ValueError("there are no critical parameters to write")
+    # The first entry goes last, it is the one without a line continuation
+    for name, value in params_items:
+        lines.append(" " * 29 + f"paramInfo {{param_find(\"{name}\"), {', '.join(map(_value_text, value))}}}, \\")
+    lines.append(" " * 29 + f"paramInfo {{param_find(\"{first_name}\"), {', '.join(map(_value_text, first_value))}}}")
+    lines += ["", "#endif //PX4_AVY_PARAMETER_CHECK_LIST_H"]
+    return "\n".join(lines)
 
 
+def _value_text(value) -> str:
+    # Unbounded range limits read back as -inf and inf are written as PX4 expects them
+    if isinstance(value, float) and isinf(value):
+        return "INFINITY" if value > 0 else "-INFINITY"
+    return str(value)
+
+
+def write_critical_parameters(params: Dict[str, List[float]], path: str = None) -> bool:
+    # Writes the header only if its content changes, so that the mtime is left alone and PX4 does not rebuild the
+    # Commander module for nothing. The content goes to a temporary file in the same directory, which is renamed over
+    # the header: a crash leaves either the old header or the new one, never a truncated one. Returns whether the
+    # header was written
+    path = path or file_name
+    content = render_critical_parameters(params).replace("\n", os.linesep).encode("utf-8")
+    try:
+        if os.path.getsize(path) == len(content):
+            with open(path, 'rb') as f:
+                if hashlib.sha256(f.read()).digest() == hashlib.sha256(content).digest():
+                    return False
+    except OSError:
+        pass
+
+    directory, name = os.path.split(os.path.abspath(path))
+    try:
+        mode = stat.S_IMODE(os.stat(path).st_mode)
+    except OSError:
+        umask = os.umask(0)
+        os.umask(umask)
+        mode = 0o666 & ~umask
+    descriptor, temporary = tempfile.mkstemp(prefix=f".{name}.", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(descriptor, 'wb') as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(temporary, mode)
+        os.replace(temporary, path)
+    except BaseException:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise
+    return True
+
 file_name = ".//avy_parameter_check_list.h"
+
+# Whitespace, line continuations, block comments and line comments continued on the next line, which all stay
+# inside the macro. Written as blanks, then any number of (separator, blanks), so that a run of blanks can only be
+# matched one way and a failed match does not backtrack through it
+_space = r"[ \t\f\v]*(?:(?:\\[ \t]*\r?\n|/\*(?s:.*?)\*/|//[^\n]*\\[ \t]*\r?\n)[ \t\f\v]*)*"
+_number = r"INFINITY|(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?[fF]?"
+_entry_pieces = [(re.compile(_space + piece), expected) for piece, expected in (
+    (r"(?:paramInfo" + _space + r")?\{", "'paramInfo {'"),
+    (r"param_find" + _space + r"\(" + _space + r"\"([^\"\\\n]*)\"" + _space + r"\)", "'param_find(\"NAME\")'"),
+    (r"," + _space + r"([+-]?)" + _space + r"(" + _number + r")", "a required value or a minimum"),
+    (r"(?:," + _space + r"([+-]?)" + _space + r"(" + _number + r"))?", "a maximum"),
+    (r"\}", "'}' after one or two values"),
+    (r"(,?)" + _space, "','"))]
+_entry_pattern = re.compile("".join(piece.pattern for piece, _ in _entry_pieces))
+# An entry as write_critical_parameters lays it out, with the same groups as _entry_pattern. Tried first, it matches
+# in a fraction of the time
+_written_entry_pattern = re.compile(r"paramInfo \{param_find\(\"([^\"\\\n]*)\"\), ([+-]?)(" + _number
+                                    + r")(?:, ([+-]?)(" + _number + r"))?\}(,?)[ \t]*(?:\\\r?\n[ \t]*)?")
+_space_pattern = re.compile(_space)
+_define_pattern = re.compile(r"^[ \t]*#[ \t]*define[ \t]+PCHK_CRIT_PARAM_LIST(?![\w(])", re.M)
+# What follows the last token of the macro: the end of its last line, after an optional line comment
+_end_pattern = re.compile(r"(?://[^\n]*)?(?:\r?\n|\Z)")
+_stray_entry_pattern = re.compile(r"^[ \t]*(?:paramInfo\b|\{[ \t]*param_find\b)", re.M)
 if __name__ == "__main__":
     print(read_critical_parameters())
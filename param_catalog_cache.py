@@ -0,0 +1,255 @@
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import IO, TYPE_CHECKING, Callable, Dict, List, Optional, Tuple, Union
+
+from columnar_catalog import ColumnarCatalog, write_columnar_catalog
+from instrumentation import span
+
+if TYPE_CHECKING:
+    # pandas is only needed for the pickled catalogs, pickle imports it when one is loaded
+    import pandas as pd
+
+
+def content_hash(content: str) -> str:
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def file_hash(path: str, chunk_size: int = 1 << 20) -> str:
+    # Hash of the bytes of a file, read a chunk at a time
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class CatalogCache:
+    # Catalogs built by build_param_df, one entry per (schema version, source, content hash) so that several PX4
+    # releases can be kept side by side. Each entry is stored both as a pickle and as a memory-mappable columnar
+    # catalog directory. index.json records the entries and when they were last used, the least recently used
+    # ones are evicted once more than max_entries are stored. The catalog of a page can be stored with its
+    # parameter groups, the hash and number of rows of each table in page order, so that the next version of the
+    # page only parses the groups that changed
+    #
+    # Several processes can share a cache directory, the GUI and the header CLIs run side by side. Every file is
+    # written under a unique temporary name and renamed into place. The index is rewritten under index.json.lock,
+    # merged with the entries other processes stored or evicted since it was read
+
+    index_file_name = "index.json"
+    # A hit moves its entry up the LRU order on disk at most once per lru_touch_interval seconds, a warm cache is
+    # read without rewriting the index
+    lru_touch_interval = 60 * 60
+    # Seconds to wait for the index lock, and the age past which a lock was left by a process that died holding it.
+    # The lock is only held while the index is rewritten, a waiter breaks a stale lock before it gives up
+    lock_timeout = 15
+    stale_lock_age = 10
+
+    def __init__(self, directory: str, schema_version: int, max_entries: int = 8):
+        self.directory = directory
+        self.schema_version = schema_version
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = self._read_index()
+        # Keys stored, revalidated or used, and keys dropped, since the index was last written
+        self._changed = set()
+        self._removed = set()
+
+    def _read_index(self) -> Dict[str, dict]:
+        try:
+            with open(os.path.join(self.directory, self.index_file_name), 'r') as f:
+                index = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return dict()
+        if index.get("schema_version") != self.schema_version:
+            # Entries written with another schema are never looked up again, drop their files
+            for entry in index.get("entries", dict()).values():
+                self._remove_entry_files(entry)
+            return dict()
+        return index["entries"]
+
+    def _write_index(self):
+        # The index is only a cache of what is stored: when it cannot be written the catalog that was loaded or
+        # built is still returned, the next run misses it and builds it again
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with self._index_lock():
+                entries = self._read_index()
+                for key in self._removed:
+                    entries.pop(key, None)
+                for key in self._changed & self._entries.keys():
+                    entry = dict(self._entries[key])
+                    if key in entries:
+                        for field in ("last_used", "checked"):
+                            entry[field] = max(entry[field], entries[key][field])
+                    entries[key] = entry
+                while len(entries) > self.max_entries:
+                    lru_key = min(entries, key=lambda k: entries[k]["last_used"])
+                    self._remove_entry_files(entries.pop(lru_key))
+                self._replace_file(self.index_file_name, 'w', lambda f: json.dump(
+                    {"schema_version": self.schema_version, "entries": entries}, f, indent=1))
+        except OSError:
+            return
+        self._entries = entries
+        self._changed.clear()
+        self._removed.clear()
+
+    @contextmanager
+    def _index_lock(self):
+        # Created exclusively, which works the same on every platform and file system. Raises TimeoutError, an
+        # OSError, when another process holds it for longer than lock_timeout
+        lock_path = os.path.join(self.directory, self.index_file_name + ".lock")
+        deadline = time.monotonic() + self.lock_timeout
+        while True:
+            try:
+                os.close(os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                break
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(lock_path) > self.stale_lock_age:
+                        os.remove(lock_path)
+                        continue
+                except FileNotFoundError:
+                    continue
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"{lock_path} is held by another process")
+                time.sleep(0.005)
+        try:
+            yield
+        finally:
+            try:
+                os.remove(lock_path)
+            except FileNotFoundError:
+                pass
+
+    def _replace_file(self, file_name: str, mode: str, write: Callable[[IO], None]):
+        # Written to a temporary file of its own and renamed over file_name, so that concurrent writers of the same
+        # file each rename a whole file
+        descriptor, temporary = tempfile.mkstemp(prefix=f".{file_name}.", suffix=".tmp", dir=self.directory)
+        try:
+            with os.fdopen(descriptor, mode) as f:
+                write(f)
+            os.replace(temporary, os.path.join(self.directory, file_name))
+        except BaseException:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            raise
+
+    def _remove_entry_files(self, entry: dict):
+        try:
+            os.remove(os.path.join(self.directory, entry["file"]))
+        except FileNotFoundError:
+            pass
+        if "columnar" in entry:
+            shutil.rmtree(os.path.join(self.directory, entry["columnar"]), ignore_errors=True)
+        if entry.get("groups") is not None:
+            try:
+                os.remove(os.path.join(self.directory, entry["groups"]))
+            except FileNotFoundError:
+                pass
+
+    def _key(self, source: str, digest: str) -> str:
+        return hashlib.sha256(f"{self.schema_version}|{source}|{digest}".encode("utf-8")).hexdigest()[:20]
+
+    def latest_entry(self, source: str) -> Optional[dict]:
+        # Most recently validated entry of a source, used to skip refetching it or when it cannot be fetched
+        entries = [entry for entry in self._entries.values() if entry["source"] == source]
+        if len(entries) == 0:
+            return None
+        return max(entries, key=lambda entry: entry["checked"])
+
+    def open(self, source: str, digest: str, columnar: bool = False) -> Union["pd.DataFrame", ColumnarCatalog]:
+        # Load an entry without touching the counters or the LRU order, raises KeyError if it is not stored
+        entry = self._entries[self._key(source, digest)]
+        if columnar:
+            return ColumnarCatalog(os.path.join(self.directory, entry["columnar"]))
+        with open(os.path.join(self.directory, entry["file"]), 'rb') as f:
+            return pickle.load(f)
+
+    def lookup(self, source: str, digest: str,
+               columnar: bool = False) -> Optional[Union["pd.DataFrame", ColumnarCatalog]]:
+        key = self._key(source, digest)
+        with span("catalog.cache.lookup"):
+            if key in self._entries:
+                try:
+                    data = self.open(source, digest, columnar)
+                except (OSError, ValueError, pickle.UnpicklingError, EOFError):
+                    self._remove_entry_files(self._entries.pop(key))
+                    self._removed.add(key)
+                else:
+                    self.hits += 1
+                    entry = self._entries[key]
+                    now = time.time()
+                    stale = now - entry["last_used"] >= self.lru_touch_interval
+                    entry["last_used"] = now
+                    self._changed.add(key)
+                    if stale:
+                        self._write_index()
+                    return data
+            self.misses += 1
+            return None
+
+    def store(self, source: str, digest: str, data: "pd.DataFrame", etag: Optional[str] = None,
+              last_modified: Optional[str] = None, groups: Optional[List[Tuple[str, int]]] = None):
+        # etag and last_modified are the validators of the download the catalog was built from, for conditional
+        # requests when the source is revalidated. groups are the (hash, number of rows) of the parameter groups
+        # of a page, in the order of their rows in data
+        key = self._key(source, digest)
+        file_name = key + ".pkl"
+        groups_file_name = key + ".groups.json" if groups is not None else None
+        os.makedirs(self.directory, exist_ok=True)
+        with span("catalog.cache.store"):
+            self._replace_file(file_name, 'wb', lambda f: pickle.dump(data, f))
+            write_columnar_catalog(data, os.path.join(self.directory, key + ".columnar"))
+            if groups is not None:
+                self._replace_file(groups_file_name, 'w', lambda f: json.dump(groups, f))
+
+        # The least recently used entries past max_entries are evicted when the index is written
+        now = time.time()
+        self._entries[key] = {"source": source, "content_hash": digest, "file": file_name,
+                              "columnar": key + ".columnar", "groups": groups_file_name, "created": now,
+                              "last_used": now, "checked": now, "etag": etag, "last_modified": last_modified}
+        self._changed.add(key)
+        self._removed.discard(key)
+        self._write_index()
+
+    def lookup_groups(self, source: str) -> Optional[Tuple["pd.DataFrame", List[Tuple[str, int]]]]:
+        # The last catalog built from a version of source that was stored with its groups, and the groups. Does not
+        # count as a hit or a miss, the catalog of the current version was not found when this is asked for
+        entries = [entry for entry in self._entries.values()
+                   if entry["source"] == source and entry.get("groups") is not None]
+        if len(entries) == 0:
+            return None
+        entry = max(entries, key=lambda entry: entry["created"])
+        with span("catalog.cache.groups"):
+            try:
+                with open(os.path.join(self.directory, entry["groups"]), 'r') as f:
+                    groups = [(digest, n_rows) for digest, n_rows in json.load(f)]
+                data = self.open(source, entry["content_hash"])
+            except (OSError, ValueError, pickle.UnpicklingError, EOFError):
+                return None
+        if sum(n_rows for _, n_rows in groups) != len(data):
+            return None
+        return data, groups
+
+    def revalidated(self, source: str, digest: str, etag: Optional[str] = None, last_modified: Optional[str] = None):
+        # The source was found unchanged: the entry counts as checked now, with the validators of the last response
+        entry = self._entries.get(self._key(source, digest))
+        if entry is None:
+            return
+        entry["checked"] = time.time()
+        if etag is not None:
+            entry["etag"] = etag
+        if last_modified is not None:
+            entry["last_modified"] = last_modified
+        self._changed.add(self._key(source, digest))
+        self._write_index()
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
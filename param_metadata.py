@@ -0,0 +1,255 @@
+import codecs
+import gzip
+import json
+import lzma
+import os
+import re
+from html import escape, unescape
+from typing import IO, TYPE_CHECKING, Iterator
+
+# Catalogs built from the parameter metadata PX4 builds emit next to the firmware, parameters.xml and
+# parameters.json (optionally compressed, as parameters.json.xz), instead of the rendered reference page. The
+# metadata already has the type, limits and default of every parameter in their own fields, so nothing is read back
+# from text. Both formats are parsed incrementally, one parameter at a time, and give the catalog build_param_df
+# builds from the page of the same release:
+# - Name, Type (INT32 or FLOAT), Min, Max, Incr and Default, NaN where the metadata has no value
+# - Description, the text of the description cell the reference page renders from the same metadata
+#
+# lxml and pandas are only imported when a catalog is built
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+metadata_extensions = (".xml", ".json")
+compressed_extensions = {".xz": lzma.open, ".gz": gzip.open}
+
+
+def is_metadata_file(source: str) -> bool:
+    # parameters.xml, parameters.json and their .xz or .gz versions
+    root, extension = os.path.splitext(source.lower())
+    if extension in compressed_extensions:
+        extension = os.path.splitext(root)[1]
+    return extension in metadata_extensions and os.path.isfile(source)
+
+
+def open_metadata(path: str) -> IO[bytes]:
+    opener = compressed_extensions.get(os.path.splitext(path.lower())[1], open)
+    return opener(path, 'rb')
+
+
+class MetadataParam:
+
+    __slots__ = ("name", "type", "min", "max", "increment", "default", "short_desc", "long_desc", "values",
+                 "bitmask", "reboot_required")
+
+    # Fields of a parameter as they are in the metadata: numbers are texts in parameters.xml and numbers in
+    # parameters.json, values and bitmask are (code or bit, description) pairs
+    def __init__(self, name: str, param_type: str):
+        self.name = name
+        self.type = param_type
+        self.min = None
+        self.max = None
+        self.increment = None
+        self.default = None
+        self.short_desc = ""
+        self.long_desc = ""
+        self.values = []
+        self.bitmask = []
+        self.reboot_required = None
+
+
+def iter_xml_params(f: IO[bytes]) -> Iterator[MetadataParam]:
+    # Each <parameter> is read when its end tag is parsed, then dropped with what precedes it, so that the tree
+    # never holds more than one parameter
+    from lxml import etree
+    for _, element in etree.iterparse(f, events=("end",), tag="parameter"):
+        param = MetadataParam(element.get("name"), element.get("type", ""))
+        param.default = element.get("default")
+        for child in element:
+            if child.tag in _xml_text_fields:
+                setattr(param, child.tag, (child.text or "").strip())
+            elif child.tag == "values":
+                param.values = [(value.get("code"), (value.text or "").strip()) for value in child]
+            elif child.tag == "bitmask":
+                param.bitmask = [(bit.get("index"), (bit.text or "").strip()) for bit in child]
+        yield param
+        element.clear()
+        parent = element.getparent()
+        while element.getprevious() is not None:
+            del parent[0]
+
+
+def iter_json_params(f: IO[bytes], chunk_size: int = 1 << 20) -> Iterator[MetadataParam]:
+    for item in iter_json_array(f, "parameters", chunk_size):
+        param = MetadataParam(item.get("name"), item.get("type", ""))
+        param.default = item.get("default")
+        param.min = item.get("min")
+        param.max = item.get("max")
+        param.increment = item.get("increment")
+        param.short_desc = item.get("shortDesc") or ""
+        param.long_desc = item.get("longDesc") or ""
+        param.values = [(value.get("value"), value.get("description", "")) for value in item.get("values") or []]
+        param.bitmask = [(bit.get("index"), bit.get("description", "")) for bit in item.get("bitmask") or []]
+        # Only written when a reboot is required, like <reboot_required> in parameters.xml
+        if item.get("rebootRequired"):
+            param.reboot_required = "true"
+        yield param
+
+
+def iter_json_array(f: IO[bytes], key: str, chunk_size: int = 1 << 20) -> Iterator:
+    # Items of the array under key in the top-level object of a JSON document, decoded one at a time from chunks of
+    # the file with raw_decode. The other top-level values are decoded and skipped
+    reader = _JsonChunkReader(f, chunk_size)
+    reader.expect("{")
+    if reader.peek() == "}":
+        return
+    while True:
+        name = reader.decode()
+        reader.expect(":")
+        if name == key:
+            reader.expect("[")
+            if reader.peek() == "]":
+                reader.expect("]")
+            else:
+                while True:
+                    yield reader.decode()
+                    if reader.expect(",]") == "]":
+                        break
+        else:
+            reader.decode()
+        if reader.expect(",}") == "}":
+            return
+
+
+class _JsonChunkReader:
+
+    def __init__(self, f: IO[bytes], chunk_size: int):
+        self._f = f
+        self._chunk_size = chunk_size
+        self._decoder = json.JSONDecoder()
+        # UTF-8 bytes cut in the middle of a character are completed by the next chunk
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        self._position = 0
+        self._eof = False
+
+    def _read(self) -> bool:
+        if self._eof:
+            return False
+        chunk = self._f.read(self._chunk_size)
+        self._eof = len(chunk) == 0
+        # What was decoded is dropped before the buffer grows, it is never copied again
+        self._buffer = self._buffer[self._position:] + self._utf8.decode(chunk, final=self._eof)
+        self._position = 0
+        return True
+
+    def peek(self) -> str:
+        # Next character that is not whitespace, "" at the end of the file
+        while True:
+            match = _json_space.match(self._buffer, self._position)
+            self._position = match.end()
+            if self._position < len(self._buffer) or not self._read():
+                return self._buffer[self._position:self._position + 1]
+
+    def expect(self, characters: str) -> str:
+        character = self.peek()
+        if len(character) == 0 or character not in characters:
+            raise json.JSONDecodeError(f"Expecting one of {characters!r}", self._buffer, self._position)
+        self._position += 1
+        return character
+
+    def decode(self):
+        # A value is only taken once the delimiter that follows it is in the buffer: a number cut by the end of a
+        # chunk, 1. of 1.5, decodes too
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._position)
+            except json.JSONDecodeError:
+                if not self._read():
+                    raise
+                continue
+            if (end < len(self._buffer) and self._buffer[end] in _json_delimiters) or not self._read():
+                self._position = end
+                return value
+
+
+def iter_metadata_params(path: str) -> Iterator[MetadataParam]:
+    root = path.lower()
+    if os.path.splitext(root)[1] in compressed_extensions:
+        root = os.path.splitext(root)[0]
+    with open_metadata(path) as f:
+        if root.endswith(".json"):
+            yield from iter_json_params(f)
+        else:
+            yield from iter_xml_params(f)
+
+
+def build_metadata_df(params: Iterator[MetadataParam]) -> "pd.DataFrame":
+    # The catalog of build_param_df, filled column by column as the parameters are parsed
+    import numpy as np
+    import pandas as pd
+    from full_param_list_html_parser import param_df_columns
+    columns = {column: [] for column in param_df_columns}
+    for param in params:
+        columns["Name"].append(param.name)
+        columns["Type"].append(param.type.upper())
+        columns["Min"].append(_number(param.min))
+        columns["Max"].append(_number(param.max))
+        columns["Incr"].append(_number(param.increment))
+        columns["Default"].append(_number(param.default))
+        columns["Description"].append(description_text(param))
+    param_data_df = pd.DataFrame({column: np.array(values, dtype=np.float64 if column in _numeric_columns else object)
+                                  for column, values in columns.items()})
+    param_data_df.set_index("Name", inplace=True, drop=False)
+    return param_data_df
+
+
+def load_metadata_df(path: str) -> "pd.DataFrame":
+    return build_metadata_df(iter_metadata_params(path))
+
+
+def _number(value) -> float:
+    if value is None or (isinstance(value, str) and len(value.strip()) == 0):
+        return float("nan")
+    return float(value)
+
+
+def description_text(param: MetadataParam) -> str:
+    # Text of the description cell of the reference page, as cell_text reads it: the markup the page generator
+    # writes, with whitespace-only strings between tags collapsed to a newline or a space and entities decoded
+    from full_param_list_html_parser import _ascii_whitespace
+    return "".join(("\n" if "\n" in text else " ") if len(text.strip(_ascii_whitespace)) == 0 else unescape(text)
+                   for text in _tag_pattern.split(description_markup(param)) if len(text) > 0)
+
+
+def description_markup(param: MetadataParam) -> str:
+    # The fields are escaped, a < in a description is text and not the start of a tag
+    long_desc = f"<p><strong>Comment:</strong> {escape(param.long_desc)}</p>" if param.long_desc else ""
+    values = ""
+    if len(param.values) > 0:
+        values = "<strong>Values:</strong><ul>" + "".join(
+            f"\n<li><strong>{escape(_code_text(code))}:</strong> {escape(text)}</li> \n"
+            for code, text in sorted(param.values, key=lambda value: float(value[0]))) + "</ul>\n"
+    bitmask = ""
+    if len(param.bitmask) > 0:
+        bitmask = "<strong>Bitmask:</strong><ul>" + "".join(
+            f"  <li><strong>{escape(_code_text(bit))}:</strong> {escape(text)}</li> \n"
+            for bit, text in param.bitmask) + "</ul>\n"
+    reboot_required = f"<p><b>Reboot required:</b> {escape(param.reboot_required)}</p>\n" \
+        if param.reboot_required else ""
+    return f"<p>{escape(param.short_desc)}</p>{long_desc} {values} {bitmask} {reboot_required}"
+
+
+def _code_text(code) -> str:
+    # Codes are texts in parameters.xml, numbers in parameters.json
+    if isinstance(code, float) and code.is_integer():
+        return str(int(code))
+    return str(code)
+
+
+_numeric_columns = ("Min", "Max", "Incr", "Default")
+_xml_text_fields = ("min", "max", "increment", "short_desc", "long_desc", "reboot_required")
+_tag_pattern = re.compile(r"<[^>]*>")
+_json_space = re.compile(r"[ \t\n\r]*")
+_json_delimiters = ",:]} \t\n\r"
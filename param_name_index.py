@@ -0,0 +1,135 @@
+import bisect
+import heapq
+from collections import defaultdict
+from typing import Iterable, List
+
+import numpy as np
+
+# Match tiers, a lower tier ranks first. Within a tier shorter names rank first, then names in alphabetical order
+tier_exact = 0
+tier_prefix = 1
+tier_word = 2
+tier_substring = 3
+tier_fuzzy = 4
+
+
+class ParamNameIndex:
+    # Completion index over the parameter names, built once when the catalog is loaded. Matching ignores case:
+    # - prefixes are found by bisecting the sorted upper-case names
+    # - substrings by intersecting the trigram (bigram for two characters) posting lists of the query, the
+    #   candidates are then checked with str.find
+    # - fuzzy matches, for queries with a typo, are the names sharing at least fuzzy_min_shared of the query's
+    #   trigrams, ranked by the number of shared trigrams
+    # Names where the query follows a "_" rank before the other substring matches, operators tend to type whole
+    # name parts. A single character only matches prefixes
+
+    fuzzy_min_shared = 0.5
+
+    def __init__(self, names: Iterable[str]):
+        names = sorted(set(name for name in names if isinstance(name, str)), key=lambda name: (name.upper(), name))
+        self.names = names
+        self._keys = [name.upper() for name in names]
+        self._lengths = np.array([len(name) for name in names], dtype=np.int32)
+        # Rank of each name when sorted by length, then alphabetically
+        self._ranks = np.empty(len(names), dtype=np.int64)
+        self._ranks[np.argsort(self._lengths, kind="stable")] = np.arange(len(names))
+        grams = defaultdict(list)
+        for position, key in enumerate(self._keys):
+            for gram in set(_ngrams(key, 2)) | set(_ngrams(key, 3)):
+                grams[gram].append(position)
+        # Positions are appended in increasing order, the posting lists are sorted
+        self._postings = {gram: np.array(positions, dtype=np.int32) for gram, positions in grams.items()}
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def search(self, query: str, limit: int = 50, fuzzy: bool = True) -> List[str]:
+        # Best matches for query, at most limit of them
+        key = query.strip().upper()
+        if len(key) == 0 or limit <= 0:
+            return []
+        ranked = []
+
+        # Prefix matches are a contiguous run of the sorted keys
+        first = bisect.bisect_left(self._keys, key)
+        last = bisect.bisect_left(self._keys, key + "\uffff", lo=first)
+        if last - first > 0:
+            prefix = np.arange(first, last)
+            # Keys can only be prefix matches if they are at least as long, exact matches are the shortest
+            tiers = np.where(self._lengths[prefix] == len(key), tier_exact, tier_prefix)
+            ranked.extend(self._best(prefix, tiers, limit))
+        if len(key) < 2:
+            return [self.names[position] for _, _, _, position in ranked]
+
+        # Substring matches, the query's grams narrow the candidates down before the actual check. Matches after a
+        # "_" are looked up first, as matches of "_" + query
+        prefix_range = range(first, last)
+        word = self._first_matches("_" + key, limit, prefix_range)
+        ranked.extend((tier_word, int(self._lengths[position]), self._keys[position], position) for position in word)
+        substring = self._first_matches(key, limit, prefix_range, set(word))
+        ranked.extend((tier_substring, int(self._lengths[position]), self._keys[position], position)
+                      for position in substring)
+
+        if fuzzy and len(ranked) < limit and len(key) >= 4:
+            matched = set(position for _, _, _, position in ranked)
+            ranked.extend(self._fuzzy(key, matched, limit - len(ranked)))
+        ranked = heapq.nsmallest(limit, ranked)
+        return [self.names[position] for _, _, _, position in ranked]
+
+    def _candidates(self, key: str) -> np.ndarray:
+        grams = set(_ngrams(key, 3 if len(key) >= 3 else 2))
+        postings = [self._postings.get(gram) for gram in grams]
+        if any(posting is None for posting in postings):
+            return np.empty(0, dtype=np.int32)
+        postings.sort(key=len)
+        candidates = postings[0]
+        for posting in postings[1:]:
+            if len(candidates) == 0:
+                break
+            candidates = np.intersect1d(candidates, posting, assume_unique=True)
+        return candidates
+
+    def _first_matches(self, needle: str, limit: int, prefix: range, exclude: set = frozenset()) -> List[int]:
+        # The limit shortest names containing needle, outside the prefix matches and exclude. Candidates are
+        # checked in (length, name) order, so the search stops at the limit-th match
+        candidates = self._candidates(needle)
+        candidates = candidates[(candidates < prefix.start) | (candidates >= prefix.stop)]
+        matches = []
+        for position in candidates[np.argsort(self._ranks[candidates])].tolist():
+            if needle in self._keys[position] and position not in exclude:
+                matches.append(position)
+                if len(matches) == limit:
+                    break
+        return matches
+
+    def _fuzzy(self, key: str, matched: set, limit: int) -> list:
+        grams = set(_ngrams(key, 3))
+        postings = [self._postings[gram] for gram in grams if gram in self._postings]
+        if len(postings) == 0:
+            return []
+        # Number of the query's trigrams each name shares
+        shared = np.bincount(np.concatenate(postings), minlength=len(self.names))
+        if len(matched) > 0:
+            shared[np.fromiter(matched, dtype=np.int64)] = 0
+        positions = np.flatnonzero(shared >= max(2, int(np.ceil(self.fuzzy_min_shared * len(grams)))))
+        shared = shared[positions]
+        if len(positions) == 0:
+            return []
+        # More shared trigrams first, then closer in length to the query
+        order = np.lexsort((np.abs(self._lengths[positions] - len(key)), -shared))[:limit]
+        return [(tier_fuzzy, rank, "", int(position)) for rank, position in enumerate(positions[order])]
+
+    def _best(self, positions: np.ndarray, tiers: np.ndarray, limit: int) -> list:
+        # The limit best (tier, length, name) of the positions, partitioned out before the few kept are sorted
+        keys = tiers.astype(np.int64) * len(self.names) + self._ranks[positions]
+        if len(keys) > limit:
+            kept = np.argpartition(keys, limit - 1)[:limit]
+            order = kept[np.argsort(keys[kept])]
+        else:
+            order = np.argsort(keys)
+        return [(int(tiers[i]), int(self._lengths[positions[i]]), self._keys[positions[i]], int(positions[i]))
+                for i in order]
+
+
+def _ngrams(key: str, n: int) -> List[str]:
+    return [key[i:i + n] for i in range(len(key) - n + 1)]
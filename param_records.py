@@ -0,0 +1,154 @@
+from typing import Dict, List, Optional, Tuple
+
+from math import isnan
+
+import numpy as np
+
+from columnar_catalog import catalog_column
+
+# Validator bounds used when the catalog gives no limit for a parameter
+validator_default_min = -1e9
+validator_default_max = 1e9
+validator_default_prec = 6
+
+# Problems check_entries reports, as bits of one uint8 per cell
+invalid_range = 1
+invalid_inverted = 2
+invalid_type = 4
+invalid_precision = 8
+invalid_unknown = 16
+invalid_reasons = {invalid_range: "outside the valid range", invalid_inverted: "minimum larger than the maximum",
+                   invalid_type: "not an integer", invalid_precision: "more decimals than the increment",
+                   invalid_unknown: "not in the Full Parameter List"}
+
+
+class ParamRecord:
+    # Everything the parameter name slots need about one parameter, resolved once when the catalog is loaded so
+    # that a keystroke costs a dict lookup instead of a dozen DataFrame .loc calls
+
+    __slots__ = ("name", "is_int", "min_value", "max_value", "precision", "incr_text", "placeholder_texts")
+
+    def __init__(self, name: str, param_type: str, min_: float, max_: float, incr: float, default: float):
+        self.name = name
+        self.is_int = param_type == "INT32"
+        self.min_value = validator_default_min if isnan(min_) else min_
+        self.max_value = validator_default_max if isnan(max_) else max_
+        self.precision = validator_default_prec
+        if not isnan(incr):
+            try:
+                _, decimals = str(incr).split(".")
+                self.precision = len(decimals)
+            except ValueError:
+                self.precision = 0
+        self.incr_text = f"{incr}"
+
+        # Text shown after "Default: ", "Min: " and "Max: " in the line edits, INT32 values are rounded
+        self.placeholder_texts = dict()
+        for label, value in (("Default", default), ("Min", min_), ("Max", max_)):
+            if self.is_int and not isnan(value):
+                self.placeholder_texts[label] = f"{round(float(value))}"
+            else:
+                self.placeholder_texts[label] = f"{value}"
+
+
+def to_numeric(text: str) -> int or float:
+    try:
+        num = int(text)
+    except ValueError:
+        num = float(text)
+    return num
+
+
+def check_entry(record: Optional[ParamRecord], required: float = None, low: float = None,
+                high: float = None) -> Tuple[bool, bool, bool]:
+    # Whether the required value, the lower and the upper range limit of a critical entry are valid. None is an
+    # empty value, an unknown parameter (record None) is checked against the validator defaults. These are the
+    # rules ParamWidget.checkValid shows while an entry is typed, outside Qt so batch generation applies them too
+    min_value = validator_default_min if record is None else record.min_value
+    max_value = validator_default_max if record is None else record.max_value
+    required_valid = required is None or min_value <= required <= max_value
+    low_value = min_value if low is None else low
+    high_value = max_value if high is None else high
+    low_valid = min_value <= low_value <= max_value and low_value <= high_value
+    high_valid = min_value <= high_value <= max_value and high_value >= low_value
+    return required_valid, low_valid, high_valid
+
+
+class ParamBounds:
+    # The limits of the ParamRecords as arrays in the order of the sorted names, so that check_entries looks up
+    # every parameter of a table with one np.searchsorted call
+
+    __slots__ = ("names", "min_values", "max_values", "is_int", "precisions")
+
+    def __init__(self, records: Dict[str, ParamRecord]):
+        names = np.array(list(records), dtype=str)
+        order = np.argsort(names)
+        self.names = names[order]
+        n_records = len(records)
+        self.min_values = np.fromiter((record.min_value for record in records.values()), np.float64, n_records)[order]
+        self.max_values = np.fromiter((record.max_value for record in records.values()), np.float64, n_records)[order]
+        self.is_int = np.fromiter((record.is_int for record in records.values()), bool, n_records)[order]
+        self.precisions = np.fromiter((record.precision for record in records.values()), np.int64, n_records)[order]
+
+    def positions(self, names: List[str]) -> np.ndarray:
+        # Position of each name in the bounds, -1 for the names that are not in the catalog
+        names = np.array(names, dtype=str)
+        if len(self.names) == 0:
+            return np.full(len(names), -1)
+        positions = np.minimum(np.searchsorted(self.names, names), len(self.names) - 1)
+        return np.where(self.names[positions] == names, positions, -1)
+
+
+def check_entries(bounds: Optional[ParamBounds], names: List[str], values: np.ndarray) -> np.ndarray:
+    # check_entry over a whole table: values is (n, 3) with the required value and the range limits, NaN for empty
+    # cells. Returns (n, 4) invalid_* flags, one column for the name and one per value. The range of a row with a
+    # required value is ignored. INT32 parameters must have integer values and the others no more decimals than
+    # their increment, as the line edit validators enforce while typing. Without bounds, when the catalog is not
+    # loaded, the values are checked against the validator defaults only
+    n_rows = len(names)
+    flags = np.zeros((n_rows, 4), dtype=np.uint8)
+    if n_rows == 0:
+        return flags
+    if bounds is None:
+        positions = np.full(n_rows, -1)
+    else:
+        positions = bounds.positions(names)
+    known = positions >= 0
+    if bounds is not None:
+        flags[~known, 0] = invalid_unknown
+    known_positions = positions[known]
+    min_values = np.full(n_rows, validator_default_min)
+    max_values = np.full(n_rows, validator_default_max)
+    is_int = np.zeros(n_rows, dtype=bool)
+    precisions = np.full(n_rows, validator_default_prec)
+    if bounds is not None:
+        min_values[known] = bounds.min_values[known_positions]
+        max_values[known] = bounds.max_values[known_positions]
+        is_int[known] = bounds.is_int[known_positions]
+        precisions[known] = bounds.precisions[known_positions]
+
+    # Comparisons with NaN are False, empty cells are never flagged
+    checked = np.isfinite(values)
+    checked[:, 1:] &= np.isnan(values[:, :1])
+    cells = flags[:, 1:]
+    cells[checked & ((values < min_values[:, None]) | (values > max_values[:, None]))] |= invalid_range
+    # An empty limit stands for the catalog limit on its side
+    low = np.where(np.isnan(values[:, 1]), min_values, values[:, 1])
+    high = np.where(np.isnan(values[:, 2]), max_values, values[:, 2])
+    cells[np.isnan(values[:, 0]) & (low > high), 1:] |= invalid_inverted
+    with np.errstate(invalid="ignore", over="ignore"):
+        cells[checked & is_int[:, None] & (values != np.floor(values))] |= invalid_type
+        scaled = values * 10.0 ** precisions[:, None]
+        too_precise = np.abs(scaled - np.rint(scaled)) > 1e-6 * np.maximum(1.0, np.abs(scaled))
+    cells[checked & known[:, None] & ~is_int[:, None] & too_precise] |= invalid_precision
+    return flags
+
+
+def describe_invalid(flags: int) -> str:
+    return ", ".join(reason for flag, reason in invalid_reasons.items() if flags & flag)
+
+
+def build_param_records(catalog) -> Dict[str, ParamRecord]:
+    # catalog is a DataFrame from build_param_df or a ColumnarCatalog, both give whole columns by name
+    columns = [catalog_column(catalog, column) for column in ("Name", "Type", "Min", "Max", "Incr", "Default")]
+    return {name: ParamRecord(name, *values) for name, *values in zip(*columns) if isinstance(name, str)}
@@ -0,0 +1,387 @@
+import gzip
+import hashlib
+import json
+import random
+import threading
+import time
+from email.utils import formatdate, parsedate_to_datetime
+from html import escape
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterable, List, Tuple
+
+# Synthetic pages shaped like the PX4 parameter reference (docs.px4.io/<release>/en/advanced_config/
+# parameter_reference.html), so the catalog build can be exercised and benchmarked offline, synthetic critical
+# parameter lists for the header I/O, vehicle parameter dumps for the compliance checks, the parameters.xml and
+# parameters.json metadata of a release with the page rendered from it, and a local stand-in for docs.px4.io
+# serving the pages over HTTP
+
+_table_header = ("<table style=\"width: 100%; table-layout:fixed; font-size:1.5rem; overflow: auto; display:block;\">"
+                 "\n <colgroup><col style=\"width: 23%\"><col style=\"width: 46%\"><col style=\"width: 11%\">"
+                 "<col style=\"width: 11%\"><col style=\"width: 9%\"></colgroup>"
+                 "\n <thead>"
+                 "\n   <tr><th>Name</th><th>Description</th><th>Min > Max (Incr.)</th><th>Default</th>"
+                 "<th>Units</th></tr>"
+                 "\n </thead>"
+                 "\n<tbody>")
+_cell = " <td style=\"vertical-align: top;\">{}</td>"
+
+
+def _min_max_incr(rng: random.Random, param_type: str) -> (str, str):
+    kind = rng.randrange(6)
+    if param_type == "INT32":
+        low = rng.randrange(-10, 10)
+        high = low + rng.randrange(1, 1000)
+        incr = "1"
+        default = str(rng.randrange(low, high))
+    else:
+        low = round(rng.uniform(-10, 10), 2)
+        high = round(low + rng.uniform(0.1, 100), 2)
+        incr = rng.choice(["0.01", "0.1", "0.5", "0.005"])
+        default = str(round(rng.uniform(low, high), 3))
+    if kind == 0:
+        return "", default
+    if kind == 1:
+        return f"{low} > {high} ({incr})", default
+    if kind == 2:
+        return f"{low} > {high}", default
+    if kind == 3:
+        return f"({incr})", default
+    if kind == 4:
+        return f"? > {high} ({incr})", default
+    return f"{low} > ? ({incr})", default
+
+
+def _description(rng: random.Random, name: str) -> str:
+    words = ["estimator", "gain", "rate", "controller", "limit", "filter", "sensor", "timeout", "threshold", "mode"]
+    text = f"<p>{name.replace('_', ' ').capitalize()} "
+    text += " ".join(rng.choice(words) for _ in range(rng.randrange(3, 12))) + "</p>   "
+    if rng.random() < 0.4:
+        text += "<p><strong>Comment:</strong> " + " ".join(rng.choice(words) for _ in range(rng.randrange(5, 40)))
+        text += "</p>"
+    if rng.random() < 0.3:
+        text += "<strong>Values:</strong><ul>"
+        for code in range(rng.randrange(2, 6)):
+            text += f"\n<li><strong>{code}:</strong> {rng.choice(words)}</li>"
+        text += "\n</ul>\n"
+    if rng.random() < 0.2:
+        text += "<p><b>Reboot required:</b> true</p>\n"
+    return text
+
+
+def make_param_rows(group_index: int, params_per_group: int, rng: random.Random) -> List[str]:
+    rows = []
+    for param_index in range(params_per_group):
+        name = f"G{group_index:04d}_P{param_index:03d}_{rng.choice(['RATE', 'GAIN', 'MAX', 'EN', 'TAU', 'P', 'I'])}"
+        param_type = rng.choice(["INT32", "FLOAT"])
+        min_max_incr, default = _min_max_incr(rng, param_type)
+        units = rng.choice(["", "m", "s", "rad/s", "%"])
+        rows.append("<tr>\n"
+                    + _cell.format(f"<strong id=\"{name}\">{name}</strong> ({param_type})") + "\n"
+                    + _cell.format(_description(rng, name)) + "\n"
+                    + _cell.format(min_max_incr) + "\n"
+                    + _cell.format(default) + "\n"
+                    + _cell.format(units) + "\n"
+                    + "</tr>")
+    return rows
+
+
+def make_param_reference_html(n_groups: int = 60, params_per_group: int = 25, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    page = ["<!DOCTYPE HTML>\n<html lang=\"en\">\n<head><meta charset=\"UTF-8\"><title>Parameter Reference</title>"
+            "</head>\n<body>\n<h1 id=\"parameter-reference\">Parameter Reference</h1>"]
+    for group_index in range(n_groups):
+        page.append(f"<h2 id=\"group-{group_index}\">Group {group_index}</h2>")
+        page.append(_table_header)
+        page.extend(make_param_rows(group_index, params_per_group, rng))
+        page.append("</tbody></table>")
+    page.append("</body>\n</html>\n")
+    return "\n".join(page)
+
+
+def change_param_groups(html: str, groups: Iterable[int], seed: int = 1) -> str:
+    # The page of make_param_reference_html with the parameters of the given groups generated again, one more in
+    # each group, as when a release changes some groups and leaves the others as they were
+    rng = random.Random(seed)
+    for group_index in groups:
+        start = html.index(_table_header, html.index(f"<h2 id=\"group-{group_index}\">")) + len(_table_header)
+        end = html.index("</tbody></table>", start)
+        n_params = html.count("<tr>\n", start, end) + 1
+        html = html[:start] + "\n" + "\n".join(make_param_rows(group_index, n_params, rng)) + "\n" + html[end:]
+    return html
+
+
+def make_param_metadata(n_groups: int = 60, params_per_group: int = 25, seed: int = 0) -> List[dict]:
+    # Parameters as PX4 builds list them in parameters.json, from which the metadata files and the reference page
+    # of the same release are rendered
+    rng = random.Random(seed)
+    words = ["estimator", "gain", "rate", "controller", "limit", "filter", "sensor", "timeout", "threshold", "mode"]
+    params = []
+    for group_index in range(n_groups):
+        for param_index in range(params_per_group):
+            name = f"G{group_index:04d}_P{param_index:03d}_{rng.choice(['RATE', 'GAIN', 'MAX', 'EN', 'TAU', 'P'])}"
+            param = {"name": name, "type": rng.choice(["Int32", "Float"]), "group": f"Group {group_index}",
+                     "shortDesc": f"{name.replace('_', ' ').capitalize()} "
+                                  + " ".join(rng.choice(words) for _ in range(rng.randrange(3, 12)))}
+            if param["type"] == "Int32":
+                low = rng.randrange(-10, 10)
+                high = low + rng.randrange(1, 1000)
+                param["default"] = rng.randrange(low, high)
+                increment = 1
+            else:
+                low = round(rng.uniform(-10, 10), 2)
+                high = round(low + rng.uniform(0.1, 100), 2)
+                param["default"] = round(rng.uniform(low, high), 3)
+                increment = rng.choice([0.01, 0.1, 0.5, 0.005])
+            kind = rng.randrange(6)
+            if kind in (1, 2, 5):
+                param["min"] = low
+            if kind in (1, 2, 4):
+                param["max"] = high
+            if kind in (1, 3, 4, 5):
+                param["increment"] = increment
+            if rng.random() < 0.4:
+                param["longDesc"] = " ".join(rng.choice(words) for _ in range(rng.randrange(5, 40)))
+            if rng.random() < 0.3:
+                param["values"] = [{"value": code, "description": rng.choice(words)}
+                                   for code in range(rng.randrange(2, 6))]
+            if rng.random() < 0.1:
+                param["bitmask"] = [{"index": bit, "description": rng.choice(words)}
+                                    for bit in range(rng.randrange(2, 5))]
+            if rng.random() < 0.2:
+                param["rebootRequired"] = True
+            param["units"] = rng.choice(["", "m", "s", "rad/s", "%"])
+            params.append(param)
+    return params
+
+
+def make_parameters_json(metadata: List[dict]) -> str:
+    return json.dumps({"version": 1, "uid": 1, "scope": "Firmware", "parameters": metadata}, indent=2)
+
+
+def make_parameters_xml(metadata: List[dict]) -> str:
+    lines = ["<?xml version='1.0' encoding='UTF-8'?>", "<parameters>", "  <version>3</version>"]
+    for group, params in _metadata_groups(metadata):
+        lines.append(f"  <group name=\"{group}\" no_code_generation=\"false\">")
+        for param in params:
+            lines.append(f"    <parameter default=\"{param['default']}\" name=\"{param['name']}\" "
+                         f"type=\"{param['type'].upper()}\">")
+            lines.append(f"      <short_desc>{escape(param['shortDesc'])}</short_desc>")
+            if "longDesc" in param:
+                lines.append(f"      <long_desc>{escape(param['longDesc'])}</long_desc>")
+            for field, tag in (("min", "min"), ("max", "max"), ("increment", "increment"), ("units", "unit")):
+                if param.get(field, "") != "":
+                    lines.append(f"      <{tag}>{param[field]}</{tag}>")
+            if param.get("rebootRequired"):
+                lines.append("      <reboot_required>true</reboot_required>")
+            if "values" in param:
+                lines.append("      <values>")
+                lines.extend(f"        <value code=\"{value['value']}\">{escape(value['description'])}</value>"
+                             for value in param["values"])
+                lines.append("      </values>")
+            if "bitmask" in param:
+                lines.append("      <bitmask>")
+                lines.extend(f"        <bit index=\"{bit['index']}\">{escape(bit['description'])}</bit>"
+                             for bit in param["bitmask"])
+                lines.append("      </bitmask>")
+            lines.append("    </parameter>")
+        lines.append("  </group>")
+    lines.append("</parameters>")
+    return "\n".join(lines) + "\n"
+
+
+def make_metadata_reference_html(metadata: List[dict]) -> str:
+    # The reference page of the release, laid out as PX4's page generator renders the metadata
+    page = ["<!DOCTYPE HTML>\n<html lang=\"en\">\n<head><meta charset=\"UTF-8\"><title>Parameter Reference</title>"
+            "</head>\n<body>\n<h1 id=\"parameter-reference\">Parameter Reference</h1>"]
+    for group, params in _metadata_groups(metadata):
+        page.append(f"<h2 id=\"{group.lower().replace(' ', '-')}\">{group}</h2>")
+        page.append(_table_header)
+        for param in params:
+            long_desc = f"<p><strong>Comment:</strong> {escape(param['longDesc'])}</p>" if "longDesc" in param else ""
+            values = ""
+            if "values" in param:
+                values = "<strong>Values:</strong><ul>" + "".join(
+                    f"\n<li><strong>{value['value']}:</strong> {escape(value['description'])}</li> \n"
+                    for value in sorted(param["values"], key=lambda value: float(value["value"]))) + "</ul>\n"
+            bitmask = ""
+            if "bitmask" in param:
+                bitmask = "<strong>Bitmask:</strong><ul>" + "".join(
+                    f"  <li><strong>{bit['index']}:</strong> {escape(bit['description'])}</li> \n"
+                    for bit in param["bitmask"]) + "</ul>\n"
+            reboot_required = "<p><b>Reboot required:</b> true</p>\n" if param.get("rebootRequired") else ""
+            min_max_incr = ""
+            if "min" in param or "max" in param:
+                min_max_incr += f"{param.get('min', '?')} > {param.get('max', '?')} "
+            if "increment" in param:
+                min_max_incr += f"({param['increment']})"
+            page.append("<tr>\n"
+                        + _cell.format(f"<strong id=\"{param['name']}\">{param['name']}</strong> "
+                                       f"({param['type'].upper()})") + "\n"
+                        + _cell.format(f"<p>{escape(param['shortDesc'])}</p>{long_desc} {values} {bitmask} "
+                                       f"{reboot_required}") + "\n"
+                        + _cell.format(min_max_incr) + "\n"
+                        + _cell.format(param["default"]) + "\n"
+                        + _cell.format(param["units"]) + "\n"
+                        + "</tr>")
+        page.append("</tbody></table>")
+    page.append("</body>\n</html>\n")
+    return "\n".join(page)
+
+
+def _metadata_groups(metadata: List[dict]) -> List[Tuple[str, List[dict]]]:
+    groups = dict()
+    for param in metadata:
+        groups.setdefault(param["group"], []).append(param)
+    return list(groups.items())
+
+
+def make_critical_parameters(n_entries: int, seed: int = 0) -> Dict[str, List]:
+    # Entries in the format of write_critical_parameters: required values, bounded ranges and half-open ranges
+    rng = random.Random(seed)
+    params = dict()
+    for i in range(n_entries):
+        choice = rng.random()
+        if choice < 0.4:
+            params[f"PARAM_{i:06d}"] = [rng.randint(-100, 100)]
+        elif choice < 0.8:
+            params[f"PARAM_{i:06d}"] = [round(rng.uniform(-10, 0), 3), round(rng.uniform(0, 10), 3)]
+        else:
+            params[f"PARAM_{i:06d}"] = ["-INFINITY", rng.randint(0, 1000)]
+    return params
+
+
+def make_param_dump(values: Dict[str, int or float], vehicle_id: int = 1, component_id: int = 1) -> str:
+    # A parameter file as QGroundControl saves it: ints are INT32 parameters (type 6), floats REAL32 (type 9)
+    # written with the digits of the double QGroundControl converts them to
+    lines = [f"# Onboard parameters for Vehicle {vehicle_id}",
+             "#",
+             "# Stack: PX4 Pro",
+             "# Vehicle: Multi-Rotor",
+             "# Version: 1.9.0 dev",
+             "# Git Revision: 0000000000000000",
+             "#",
+             "# Vehicle-Id Component-Id Name Value Type"]
+    for name, value in values.items():
+        if isinstance(value, int):
+            lines.append(f"{vehicle_id}\t{component_id}\t{name}\t{value}\t6")
+        else:
+            lines.append(f"{vehicle_id}\t{component_id}\t{name}\t{value:.18g}\t9")
+    return "\n".join(lines) + "\n"
+
+
+class FixtureServer:
+    # Serves pages at http://127.0.0.1:<port>/<release>/en/advanced_config/parameter_reference.html like
+    # docs.px4.io: with an ETag and a Last-Modified date, answering conditional requests with 304, gzip-compressed
+    # for clients that accept it. latency is added to every response, the first fail_first requests of each page
+    # are answered with 503 to exercise retries. counts records the responses sent by status
+    #
+    #   with FixtureServer({"v1.9.0": make_param_reference_html()}) as server:
+    #       requests.get(server.url("v1.9.0"))
+
+    def __init__(self, pages: Dict[str, str], latency: float = 0.0, fail_first: int = 0):
+        self.latency = latency
+        self.fail_first = fail_first
+        self.counts = {200: 0, 304: 0, 404: 0, 503: 0}
+        self._pages = dict()
+        self._failures = dict()
+        self._lock = threading.Lock()
+        for release, html in pages.items():
+            self.set_page(release, html)
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), _FixtureRequestHandler)
+        self._server.daemon_threads = True
+        self._server.fixture = self
+        self._thread = None
+
+    def url(self, release: str) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/{release}/en/advanced_config/parameter_reference.html"
+
+    def url_template(self) -> str:
+        # In the format of px4_release_fetcher.release_url_template
+        return self.url("{release}")
+
+    def set_page(self, release: str, html: str):
+        # A new page gets a new ETag and Last-Modified date
+        body = html.encode("utf-8")
+        with self._lock:
+            self._pages[release] = {"body": body, "gzip": gzip.compress(body, compresslevel=6),
+                                    "etag": '"' + hashlib.sha1(body).hexdigest() + '"',
+                                    "last_modified": formatdate(time.time(), usegmt=True)}
+            self._failures[release] = self.fail_first
+
+    def start(self) -> "FixtureServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "FixtureServer":
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _respond(self, path: str, headers) -> (int, dict, bytes):
+        parts = path.strip("/").split("/")
+        with self._lock:
+            page = self._pages.get(parts[0]) if parts[1:] == ["en", "advanced_config", "parameter_reference.html"] \
+                else None
+            if page is None:
+                status = 404
+            elif self._failures[parts[0]] > 0:
+                self._failures[parts[0]] -= 1
+                status = 503
+            else:
+                status = 200
+            self.counts[status] += 1
+        if status != 200:
+            return status, dict(), b""
+        validators = {"ETag": page["etag"], "Last-Modified": page["last_modified"]}
+        if_none_match = headers.get("If-None-Match")
+        if_modified_since = headers.get("If-Modified-Since")
+        if if_none_match is not None:
+            not_modified = page["etag"] in [tag.strip() for tag in if_none_match.split(",")]
+        elif if_modified_since is not None:
+            try:
+                not_modified = parsedate_to_datetime(page["last_modified"]) <= parsedate_to_datetime(if_modified_since)
+            except (TypeError, ValueError):
+                not_modified = False
+        else:
+            not_modified = False
+        if not_modified:
+            with self._lock:
+                self.counts[200] -= 1
+                self.counts[304] += 1
+            return 304, validators, b""
+        if "gzip" in headers.get("Accept-Encoding", ""):
+            return 200, dict(validators, **{"Content-Encoding": "gzip"}), page["gzip"]
+        return 200, validators, page["body"]
+
+
+class _FixtureRequestHandler(BaseHTTPRequestHandler):
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        fixture = self.server.fixture
+        if fixture.latency > 0:
+            time.sleep(fixture.latency)
+        status, headers, body = fixture._respond(self.path, self.headers)
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        if status != 304:
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+if __name__ == "__main__":
+    print(make_param_reference_html(n_groups=1, params_per_group=5))
@@ -0,0 +1,91 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Downloads of the PX4 parameter reference pages. One requests.Session is shared by every download so connections
+# to docs.px4.io are kept alive and reused, pages of several releases are downloaded concurrently from a thread
+# pool. Pages already in the catalog cache are revalidated with a conditional request (If-None-Match with the ETag,
+# If-Modified-Since with the Last-Modified date of the previous download), an unchanged page costs a 304 response
+# without a body. Connection errors, read errors and 429/5xx responses are retried with exponential backoff
+
+release_url_template = "https://docs.px4.io/{release}/en/advanced_config/parameter_reference.html"
+
+
+def release_url(release: str) -> str:
+    # release is a PX4 documentation version such as "v1.9.0", or already a URL
+    if "://" in release:
+        return release
+    return release_url_template.format(release=release)
+
+
+class FetchResult:
+
+    __slots__ = ("url", "status", "text", "etag", "last_modified", "seconds", "error")
+
+    # status is "downloaded", "not modified" when the conditional request found the cached page current, or
+    # "failed" with the exception in error
+    def __init__(self, url: str, status: str, text: Optional[str] = None, etag: Optional[str] = None,
+                 last_modified: Optional[str] = None, seconds: float = 0.0, error: Optional[Exception] = None):
+        self.url = url
+        self.status = status
+        self.text = text
+        self.etag = etag
+        self.last_modified = last_modified
+        self.seconds = seconds
+        self.error = error
+
+
+class ReleaseFetcher:
+
+    retry_statuses = (429, 500, 502, 503, 504)
+
+    def __init__(self, max_workers: int = 8, timeout: Tuple[float, float] = (5, 30), retries: int = 3,
+                 backoff: float = 0.5):
+        # timeout is (connect, read) in seconds, the wait before retry n is backoff * 2 ** (n - 1) seconds
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.session = requests.Session()
+        retry = Retry(total=retries, backoff_factor=backoff, status_forcelist=self.retry_statuses,
+                      allowed_methods=frozenset(["GET", "HEAD"]), raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers, max_retries=retry)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def fetch(self, url: str, etag: Optional[str] = None, last_modified: Optional[str] = None) -> FetchResult:
+        headers = dict()
+        if etag is not None:
+            headers["If-None-Match"] = etag
+        if last_modified is not None:
+            headers["If-Modified-Since"] = last_modified
+        start = time.perf_counter()
+        try:
+            response = self.session.get(url, headers=headers, timeout=self.timeout)
+            if response.status_code == 304:
+                return FetchResult(url, "not modified", etag=response.headers.get("ETag", etag),
+                                   last_modified=response.headers.get("Last-Modified", last_modified),
+                                   seconds=time.perf_counter() - start)
+            response.raise_for_status()
+        except requests.RequestException as e:
+            return FetchResult(url, "failed", seconds=time.perf_counter() - start, error=e)
+        return FetchResult(url, "downloaded", response.text, response.headers.get("ETag"),
+                           response.headers.get("Last-Modified"), time.perf_counter() - start)
+
+    def fetch_all(self, fetches: List[Tuple[str, Optional[str], Optional[str]]]) -> List[FetchResult]:
+        # (url, etag, last_modified) of each page, the results are in the same order
+        if len(fetches) <= 1:
+            return [self.fetch(*fetch) for fetch in fetches]
+        with ThreadPoolExecutor(min(self.max_workers, len(fetches))) as executor:
+            return list(executor.map(lambda fetch: self.fetch(*fetch), fetches))
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()